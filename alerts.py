@@ -0,0 +1,326 @@
+"""Aturan peringatan deklaratif atas pembacaan, lintasan TMA dan arsip.
+
+Aturan ditulis sebagai daftar dict (atau file JSON) dan dikompilasi sekali
+menjadi RuleSet: setiap jenis aturan menjadi ambang pada satu besaran (TMA,
+debit keluar total atau beban unit), dan ambang tampungan diubah ke TMA
+lewat lengkung elevasi-kapasitas saat kompilasi. Pemeriksaan berupa
+perbandingan array untuk semua aturan sejenis sekaligus, jadi sama cepatnya
+untuk satu pembacaan, lintasan simulasi, ensemble jutaan titik atau arsip
+pembacaan bertahun-tahun.
+
+Jenis aturan (``jam`` opsional: hanya untuk lintasan, batas horizon):
+
+- ``tma_dekat_mercu``: TMA dalam ``jarak_cm`` dari mercu spillway
+- ``tma_minimum``: TMA di bawah ``batas`` mdpl
+- ``tampungan_minimum``: tampungan di bawah ``batas`` juta m³
+- ``debit_keluar_maks``: debit keluar total mencapai ``batas`` m³/det
+- ``beban_rendah``: unit jalan di bawah ``batas`` MW (pita efisiensi rendah)
+
+Aturan aplikasi dibaca dari RULES_PATH bila ada, selain itu DEFAULT_RULES.
+
+Contoh:
+    python alerts.py --dari 2024-01-01 --sampai 2024-02-01
+    python alerts.py --csv log_2023.csv --kolom-waktu waktu --aturan aturan.json
+
+Isi aturan.json:
+    [{"nama": "mercu", "jenis": "tma_dekat_mercu", "jarak_cm": 30, "jam": 24},
+     {"nama": "hilir", "jenis": "debit_keluar_maks", "batas": 250},
+     {"nama": "tampungan", "jenis": "tampungan_minimum", "batas": 500, "pesan": "Tampungan kritis"}]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from debit_engine import LOW_BEBAN_LIMIT, N_UNITS, SPILLWAY_CREST, current_tables
+from reading_store import get_store
+from recompute_debit import INPUT_COLUMNS, compute_chunk, iter_chunks, parse_dates, parse_numeric
+from report import WIB_OFFSET
+
+RULES_PATH = os.environ.get(
+    "DJUANDA_ATURAN", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "aturan.json"))
+DEFAULT_RULES = (
+    {"nama": "dekat_mercu", "jenis": "tma_dekat_mercu", "jarak_cm": 50, "jam": 24},
+    {"nama": "beban_rendah", "jenis": "beban_rendah", "batas": LOW_BEBAN_LIMIT},
+    # sama dengan batas bawah simulasi aturan operasi (policy.py)
+    {"nama": "tma_minimum", "jenis": "tma_minimum", "batas": 75.0},
+)
+# jenis -> (besaran yang diperiksa, True = alarm di atas ambang)
+KINDS = {
+    "tma_dekat_mercu": ("tma", True),
+    "tma_minimum": ("tma", False),
+    "tampungan_minimum": ("tma", False),
+    "debit_keluar_maks": ("debit_total", True),
+    "beban_rendah": ("beban", False),
+}
+STORE_COLUMNS = ["waktu", "tma", "debit_total"] + [f"beban_{i + 1}" for i in range(N_UNITS)]
+
+
+def _compile_rule(rule, curve):
+    """(threshold, message) of one rule specification"""
+    kind = rule["jenis"]
+    if kind == "tma_dekat_mercu":
+        jarak = rule.get("jarak_cm", 50)
+        return SPILLWAY_CREST - jarak / 100, f"TMA dalam {jarak:g} cm dari mercu spillway ({SPILLWAY_CREST} m)"
+    batas = float(rule["batas"])
+    if kind == "tma_minimum":
+        return batas, f"TMA di bawah {batas:.2f} mdpl"
+    if kind == "tampungan_minimum":
+        threshold = float(curve.cap_to_el(batas))
+        return threshold, f"Tampungan di bawah {batas:,.0f} juta m³ (TMA {threshold:.2f} mdpl)"
+    if kind == "debit_keluar_maks":
+        return batas, f"Debit keluar total mencapai batas hilir {batas:,.1f} m³/det"
+    return batas, f"Unit beroperasi di bawah {batas:g} MW (efisiensi rendah)"
+
+
+class RuleSet:
+    """Compiled alert rules, checked for all rules of one quantity at once"""
+
+    def __init__(self, rules, tables=None):
+        tables = tables or current_tables()
+        self.rules = tuple(dict(rule) for rule in rules)
+        self.names = [rule["nama"] for rule in self.rules]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("nama aturan harus unik")
+        self.messages = []
+        self._horizon_text = []
+        compiled = {}
+        for index, rule in enumerate(self.rules):
+            if rule.get("jenis") not in KINDS:
+                raise ValueError(f"jenis aturan tidak dikenal: {rule.get('jenis')!r}, pilih dari {tuple(KINDS)}")
+            try:
+                threshold, message = _compile_rule(rule, tables.curve)
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"aturan {rule['nama']!r}: batas tidak valid")
+            jam = rule.get("jam")
+            try:
+                horizon = np.inf if jam is None else float(jam)
+            except (TypeError, ValueError):
+                horizon = np.nan
+            if not horizon >= 0:
+                raise ValueError(f"aturan {rule['nama']!r}: jam harus angka >= 0")
+            self.messages.append(rule.get("pesan", message))
+            # horizon hanya berarti untuk lintasan, disebut di pesan lintasan saja
+            self._horizon_text.append(f" dalam {horizon:g} jam" if jam is not None and "pesan" not in rule else "")
+            compiled.setdefault(KINDS[rule["jenis"]], []).append((index, threshold, horizon))
+        # per (besaran, arah): indeks aturan, ambang dan horizon sebagai array
+        self._groups = [(column, above, np.array([c[0] for c in items]), np.array([c[1] for c in items]),
+                         np.array([c[2] for c in items]))
+                        for (column, above), items in compiled.items()]
+        self._key = (json.dumps(self.rules, sort_keys=True), tables.version)
+
+    def __repr__(self):
+        return f"RuleSet({self.names})"
+
+    def cache_key(self):
+        """Key for result_cache: the same rules on the same table version"""
+        return self._key
+
+    def check_readings(self, data):
+        """Which readings trigger which rule
+
+        ``data`` holds arrays (N,) or scalars of ``tma`` and ``debit_total``
+        and the loads as ``beban`` (N, 6) or ``beban_1`` ... ``beban_6``.
+        Rules on an absent quantity (and NaN readings) do not trigger.
+        Returns ``{"nama": [...], "picu": (N, rules) bool}``.
+        """
+        values = {name: np.atleast_1d(np.asarray(data[name], dtype=float))
+                  for name in ("tma", "debit_total") if name in data}
+        if "beban" in data:
+            loads = list(np.atleast_2d(np.asarray(data["beban"], dtype=float)).T)
+        elif "beban_1" in data:
+            loads = [np.atleast_1d(np.asarray(data[f"beban_{i + 1}"], dtype=float)) for i in range(N_UNITS)]
+        else:
+            loads = None
+        if loads is not None:
+            # beban terkecil dari unit yang jalan (inf bila tidak ada), per kolom: jauh lebih cepat dari min(axis=1)
+            smallest = np.full(len(loads[0]), np.inf)
+            for column in loads:
+                np.minimum(smallest, column, out=smallest, where=column > 0)
+            values["beban"] = smallest
+        n = max((len(v) for v in values.values()), default=0)
+        picu = np.zeros((n, len(self.rules)), dtype=bool)
+        for column, above, index, threshold, _ in self._groups:
+            if column not in values:
+                continue
+            series = values[column]
+            for rule, limit in zip(index, threshold):
+                picu[:, rule] = series >= limit if above else series < limit
+        return {"nama": self.names, "picu": picu}
+
+    def check_trajectories(self, tma, time_hours, outflow=None):
+        """Which scenarios trigger which rule within each rule's horizon
+
+        The horizon counts ``jam`` hours from the start ``time_hours[0]``.
+        ``tma`` (S, T + 1) or (T + 1,) at ``time_hours`` (T + 1,), and the
+        optional total outflow (S, T) per step, like route_reservoir. Load
+        rules never trigger here. Returns ``{"nama", "picu": (S, rules)
+        bool, "jam_pertama": (S, rules)}`` with the hour of the first
+        crossing (NaN when not triggered); the S axis is dropped for a
+        single trajectory.
+        """
+        single = np.ndim(tma) == 1
+        series = {"tma": (np.atleast_2d(np.asarray(tma, dtype=float)), np.asarray(time_hours, dtype=float))}
+        if outflow is not None:
+            series["debit_total"] = (np.atleast_2d(np.asarray(outflow, dtype=float)), series["tma"][1][:-1])
+        n_scen = series["tma"][0].shape[0]
+        picu = np.zeros((n_scen, len(self.rules)), dtype=bool)
+        jam_pertama = np.full((n_scen, len(self.rules)), np.nan)
+        for column, above, index, threshold, horizon in self._groups:
+            if column not in series:
+                continue
+            values, times = series[column]
+            # jumlah titik di dalam horizon tiap aturan, dihitung dari awal lintasan
+            ends = np.searchsorted(times, times[0] + horizon, side="right")
+            for rule, limit, end in zip(index, threshold, ends):
+                window = values[:, :end]
+                extreme = window.max(axis=1) if above else window.min(axis=1)
+                hit = extreme >= limit if above else extreme < limit
+                picu[:, rule] = hit
+                if hit.any():
+                    crossed = window >= limit if above else window < limit
+                    jam_pertama[:, rule] = np.where(hit, times[crossed.argmax(axis=1)], np.nan)
+        hasil = {"nama": self.names, "picu": picu, "jam_pertama": jam_pertama}
+        if single:
+            hasil["picu"], hasil["jam_pertama"] = picu[0], jam_pertama[0]
+        return hasil
+
+    def summarize(self, hasil):
+        """Triggered rules of a check result, as dicts with the message and counts
+
+        ``jumlah``/``fraksi`` count the readings or scenarios that trigger;
+        trajectory results also give the earliest ``jam_pertama``.
+        """
+        picu = np.atleast_2d(hasil["picu"])
+        jumlah = picu.sum(axis=0)
+        ringkasan = []
+        for i in np.flatnonzero(jumlah):
+            item = {"nama": self.names[i], "pesan": self.messages[i], "jumlah": int(jumlah[i]),
+                    "fraksi": float(jumlah[i] / len(picu))}
+            if "jam_pertama" in hasil:
+                item["pesan"] += self._horizon_text[i]
+                item["jam_pertama"] = float(np.nanmin(np.atleast_2d(hasil["jam_pertama"])[:, i]))
+            ringkasan.append(item)
+        return ringkasan
+
+
+def load_rules(path, tables=None):
+    """RuleSet from a JSON file with a list of rules"""
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path} harus berisi daftar aturan")
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"{path}: aturan ke-{index + 1} harus berupa objek JSON")
+        missing = [key for key in ("nama", "jenis") if key not in rule]
+        if missing:
+            raise ValueError(f"{path}: aturan ke-{index + 1} tidak punya {', '.join(missing)}")
+    return RuleSet(rules, tables)
+
+
+@lru_cache(maxsize=8)
+def _compiled(path, mtime, versi):
+    """RuleSet of ``path`` (None: DEFAULT_RULES) with the current tables
+
+    ``mtime`` and ``versi`` are not used in the body: they are only part of
+    the cache key, so an edited rule file or a new table version (which
+    moves storage thresholds) compiles a fresh RuleSet.
+    """
+    return RuleSet(DEFAULT_RULES) if path is None else load_rules(path)
+
+
+def get_rules(path=RULES_PATH):
+    """The application's rules: ``path`` when it exists, otherwise DEFAULT_RULES
+
+    Compiled once per file version and table version.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        path, mtime = None, None
+    return _compiled(path, mtime, current_tables().version)
+
+
+def _events(rules, picu, waktu, events):
+    """Add counts and first/last reading time per rule of one block to ``events``"""
+    for i in np.flatnonzero(picu.any(axis=0)):
+        rows = np.flatnonzero(picu[:, i])
+        event = events.setdefault(rules.names[i], {"pesan": rules.messages[i], "jumlah": 0, "pertama": waktu[rows[0]]})
+        event["jumlah"] += len(rows)
+        event["terakhir"] = waktu[rows[-1]]
+
+
+def check_store(rules, start=None, end=None, store=None):
+    """(readings, events per rule) of the stored readings with start <= waktu < end"""
+    data = (store or get_store()).query(start, end, STORE_COLUMNS)
+    waktu = [datetime.fromtimestamp(t + WIB_OFFSET, timezone.utc).strftime("%Y-%m-%d %H:%M") for t in data["waktu"]]
+    events = {}
+    _events(rules, rules.check_readings(data)["picu"], waktu, events)
+    return len(waktu), events
+
+
+def check_csv(rules, path, time_column=None, chunk_size=100_000, delimiter=","):
+    """(readings, events per rule) of a reading log CSV, discharges computed per chunk"""
+    n = 0
+    events = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader([f.readline()], delimiter=delimiter))
+        needed = INPUT_COLUMNS + ([time_column] if time_column else [])
+        missing = [name for name in needed if name not in header]
+        if missing:
+            raise ValueError(f"Kolom {missing} tidak ditemukan di {path}")
+        numeric = [header.index(name) for name in INPUT_COLUMNS]
+        for lines in iter_chunks(f, chunk_size):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            values = parse_numeric(lines, numeric, delimiter)
+            columns = compute_chunk(values)
+            picu = rules.check_readings({"tma": values[:, 0], "debit_total": columns["debit_total"],
+                                         "beban": values[:, 4:]})["picu"]
+            if time_column:
+                waktu = parse_dates(lines, header.index(time_column), delimiter)
+            else:
+                waktu = [f"baris {n + i + 2}" for i in range(len(lines))]
+            _events(rules, picu, waktu, events)
+            n += len(lines)
+    return n, events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Periksa aturan peringatan pada arsip pembacaan")
+    parser.add_argument("--aturan", help="file JSON aturan (default: data/aturan.json bila ada, "
+                                         "selain itu aturan bawaan)")
+    parser.add_argument("--csv", help="log pembacaan CSV (tanpa ini: penyimpanan pembacaan)")
+    parser.add_argument("--kolom-waktu", help="kolom waktu di CSV untuk menampilkan kejadian")
+    parser.add_argument("--dari", help="tanggal awal penyimpanan (ISO, UTC)")
+    parser.add_argument("--sampai", help="tanggal akhir penyimpanan, eksklusif (ISO, UTC)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="jumlah baris per chunk")
+    parser.add_argument("--delimiter", default=",")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.aturan) if args.aturan else get_rules()
+        if args.csv:
+            n, events = check_csv(rules, args.csv, args.kolom_waktu, args.chunk_size, args.delimiter)
+        else:
+            start, end = (datetime.fromisoformat(t) if t else None for t in (args.dari, args.sampai))
+            n, events = check_store(rules, start, end)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{n:,} pembacaan, {len(rules.names)} aturan, {len(events)} terpicu")
+    for nama, event in events.items():
+        print(f"  {nama:<20} {event['jumlah']:>9,} kali  {event['pertama']} s/d {event['terakhir']}  "
+              f"{event['pesan']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
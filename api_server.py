@@ -0,0 +1,295 @@
+"""Layanan HTTP/JSON lokal untuk perhitungan debit (tanpa dependensi tambahan).
+
+Dipakai oleh historian SCADA dan skrip laporan yang butuh angka Debit
+Turbin, Limpasan, HJV dan Total yang sama dengan halaman Streamlit.
+Hanya memakai asyncio dari pustaka standar; tabel dan interpolator dimuat
+sekali per proses (lihat tables.py) dan batch dihitung dalam satu
+panggilan vektor calculate_debit.
+
+Endpoint:
+    GET  /health         status dan versi tabel
+    POST /debit          satu pembacaan
+    POST /debit/batch    banyak pembacaan sekaligus
+
+Contoh:
+    python api_server.py --port 8502
+    curl -s localhost:8502/debit -d '{"tma": 105.5, "trc": 35, "hjv_kiri": 30, "beban": [25, 26, 0, 0, 0, 0]}'
+    curl -s localhost:8502/debit/batch -d '{"tma": [105.5, 105.6], "trc": [35, 35], "beban": [[25, 26, 0, 0, 0, 0], [25, 0, 0, 0, 0, 0]]}'
+
+Field yang kosong (tidak ada atau null) diperlakukan seperti isian kosong
+di form. ``tanggal`` (YYYY-MM-DD, opsional) memilih versi tabel. Angka
+harus berhingga: NaN, Infinity dan angka di luar jangkauan float (misal
+1e400) ditolak dengan 400.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+
+import numpy as np
+
+from debit_engine import N_UNITS, current_tables
+from recompute_debit import INPUT_COLUMNS, OUTPUT_COLUMNS, compute_chunk
+
+# Batas ukuran body request (byte)
+MAX_BODY = 32 * 1024 * 1024
+# Body batch sebesar ini (byte, kira-kira 20 ribu pembacaan) dihitung di
+# thread supaya request lain tetap dilayani
+THREAD_MIN_BYTES = 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+# Tipe JSON yang boleh untuk isian angka (bool sengaja tidak termasuk)
+_NUMBER_TYPES = {int, float, type(None)}
+
+
+class RequestError(Exception):
+    """Invalid request, answered with ``status`` and the message as JSON"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _number(value, name):
+    if value is None:
+        return np.nan
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RequestError(f"{name} harus berupa angka atau null, dapat: {value!r}")
+    try:
+        value = float(value)
+    except OverflowError:
+        value = math.inf
+    if not math.isfinite(value):
+        raise RequestError(f"{name} harus berupa angka berhingga")
+    return value
+
+
+def _column(values, name, n):
+    """Batch column of ``n`` numbers or nulls, checked with the same rule as _number"""
+    if not isinstance(values, list) or len(values) != n:
+        raise RequestError(f"{name} harus berupa list dengan {n} nilai")
+    if not set(map(type, values)) <= _NUMBER_TYPES:
+        raise RequestError(f"{name} harus berisi angka atau null")
+    return values
+
+
+def _reject_constant(name):
+    raise RequestError(f"{name} bukan angka yang valid, gunakan angka berhingga atau null")
+
+
+def _beban_row(reading):
+    """The six unit loads of one reading, from 'beban' or 'beban_1'..'beban_6'"""
+    if "beban" in reading:
+        beban = reading["beban"]
+        if not isinstance(beban, list) or len(beban) != N_UNITS:
+            raise RequestError(f"beban harus berupa list {N_UNITS} angka")
+        return [_number(b, "beban") for b in beban]
+    return [_number(reading.get(f"beban_{i + 1}"), f"beban_{i + 1}") for i in range(N_UNITS)]
+
+
+def parse_reading(reading):
+    """One reading (dict) -> row of INPUT_COLUMNS"""
+    if not isinstance(reading, dict):
+        raise RequestError("setiap pembacaan harus berupa objek JSON")
+    row = [_number(reading.get(name), name) for name in INPUT_COLUMNS[:4]]
+    return row + _beban_row(reading)
+
+
+def parse_batch(body):
+    """Batch body -> (n, 10) matrix
+
+    Either ``{"readings": [{...}, ...]}`` with one object per reading, or
+    column-wise lists ``{"tma": [...], "trc": [...], "beban": [[...], ...]}``.
+    """
+    if "readings" in body:
+        readings = body["readings"]
+        if not isinstance(readings, list):
+            raise RequestError("readings harus berupa list")
+        return np.array([parse_reading(r) for r in readings], dtype=float).reshape(-1, len(INPUT_COLUMNS))
+
+    n = None
+    for name in ("tma", "trc", "hjv_kiri", "hjv_kanan", "beban"):
+        if isinstance(body.get(name), list):
+            n = len(body[name])
+            break
+    if n is None:
+        raise RequestError("batch harus berisi 'readings' atau kolom berupa list (tma, trc, ...)")
+
+    values = np.full((n, len(INPUT_COLUMNS)), np.nan)
+    try:
+        for j, name in enumerate(INPUT_COLUMNS[:4]):
+            column = body.get(name)
+            if column is not None:
+                values[:, j] = _column(column, name, n)
+        if "beban" in body:
+            beban = body["beban"]
+            if not (isinstance(beban, list) and len(beban) == n
+                    and all(isinstance(row, list) and len(row) == N_UNITS for row in beban)):
+                raise RequestError(f"beban harus berbentuk {n} x {N_UNITS}")
+            flat = _column(list(itertools.chain.from_iterable(beban)), "beban", n * N_UNITS)
+            values[:, 4:] = np.array(flat, dtype=float).reshape(n, N_UNITS)
+        else:
+            for i in range(N_UNITS):
+                column = body.get(f"beban_{i + 1}")
+                if column is not None:
+                    values[:, 4 + i] = _column(column, f"beban_{i + 1}", n)
+    except OverflowError:
+        raise RequestError("kolom batch harus berisi angka berhingga")
+    if np.isinf(values).any():
+        raise RequestError("kolom batch harus berisi angka berhingga")
+    return values
+
+
+def _tables(body):
+    tanggal = body.get("tanggal")
+    try:
+        if tanggal is not None and not isinstance(tanggal, str):
+            raise ValueError(tanggal)
+        return current_tables(tanggal)
+    except ValueError:
+        raise RequestError(f"tanggal tidak valid: {tanggal!r}, gunakan YYYY-MM-DD")
+
+
+def handle_single(body):
+    tables = _tables(body)
+    columns = compute_chunk(np.array([parse_reading(body)]), tables)
+    hasil = {name: columns[name][0].item() for name in OUTPUT_COLUMNS}
+    hasil["beban_rendah"] = bool(hasil["beban_rendah"])
+    hasil["versi_tabel"] = tables.version
+    return hasil
+
+
+def handle_batch(body):
+    tables = _tables(body)
+    values = parse_batch(body)
+    columns = compute_chunk(values, tables) if len(values) else {name: np.empty(0) for name in OUTPUT_COLUMNS}
+    hasil = {name: columns[name].tolist() for name in OUTPUT_COLUMNS}
+    hasil["beban_rendah"] = [bool(b) for b in hasil["beban_rendah"]]
+    hasil["n"] = len(values)
+    hasil["versi_tabel"] = tables.version
+    return hasil
+
+
+def handle_health(body):
+    tables = current_tables()
+    return {"status": "ok", "versi_tabel": tables.version}
+
+
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("POST", "/debit"): handle_single,
+    ("POST", "/debit/batch"): handle_batch,
+}
+
+
+async def dispatch(method, path, raw_body):
+    """Route one request, returns (status, payload)"""
+    path = path.split("?", 1)[0].rstrip("/") or "/"
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if any(p == path for _, p in ROUTES):
+            raise RequestError(f"method {method} tidak didukung untuk {path}", 405)
+        raise RequestError(f"endpoint tidak ada: {path}", 404)
+    body = {}
+    if raw_body:
+        try:
+            # NaN/Infinity bukan JSON standar dan tidak bisa dihitung
+            body = json.loads(raw_body, parse_constant=_reject_constant)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(f"body bukan JSON yang valid: {e}")
+        if not isinstance(body, dict):
+            raise RequestError("body harus berupa objek JSON")
+    if handler is handle_batch and len(raw_body) >= THREAD_MIN_BYTES:
+        return 200, await asyncio.to_thread(handler, body)
+    return 200, handler(body)
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin1") + body
+
+
+async def handle_connection(reader, writer):
+    """Serve HTTP/1.1 requests on one connection (keep-alive)"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            lines = head.decode("latin1").split("\r\n")
+            try:
+                method, path, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "request line tidak valid"}, False))
+                return
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            body_read = False
+            try:
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    raise RequestError("Transfer-Encoding chunked tidak didukung, kirim Content-Length", 411)
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    raise RequestError("Content-Length tidak valid")
+                if length < 0:
+                    raise RequestError("Content-Length tidak boleh negatif")
+                if length > MAX_BODY:
+                    raise RequestError(f"body lebih dari {MAX_BODY} byte", 413)
+                raw_body = await reader.readexactly(length) if length else b""
+                body_read = True
+                status, payload = await dispatch(method.upper(), path, raw_body)
+            except RequestError as e:
+                status, payload = e.status, {"error": str(e)}
+                # body tidak terbaca: sisa stream tidak bisa dipakai untuk request berikutnya
+                if not body_read:
+                    keep_alive = False
+            except asyncio.IncompleteReadError:
+                return
+            except Exception as e:  # satu request yang gagal tidak boleh menjatuhkan server
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                return
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8502):
+    current_tables()  # muat tabel sebelum request pertama
+    server = await asyncio.start_server(handle_connection, host, port, limit=64 * 1024)
+    addresses = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+    print(f"API debit berjalan di {addresses}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Layanan HTTP/JSON perhitungan debit Bendungan Ir. H. Djuanda")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,176 +1,81 @@
 import streamlit as st
+import uuid
+
+import profiling
+
+# Profil waktu per fase setiap rerun (profiling.py), aktif dengan DJUANDA_PROFIL=1
+# atau dari panel "Profil Waktu" di sidebar
+if "sesi_profil" not in st.session_state:
+    st.session_state.sesi_profil = uuid.uuid4().hex[:8]
+profiling.set_session_source(lambda: st.session_state.get("sesi_profil"))
+profiling.begin_run(st.session_state.sesi_profil)
+profiling.mark("impor")
+
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator, interp1d
+import time
 import urllib.parse  
 from datetime import datetime, timedelta, timezone
 import pytz
 
-# Move interpolation setup to top
-def setup_hjv_interpolator():
-    x_vals = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 60, 70, 80, 90, 100]
-    y_vals = list(range(80, 111))
-    
-    # Full z_matrix with 31 rows (y_vals) x 15 columns (x_vals)
-    z_matrix = np.array([
-    [0, 15.90, 26.50, 35.60, 43.80, 51.50, 59.00, 65.70, 72.40, 79.10, 85.60, 98.80, 111.70, 123.60, 134.20, 142.90],
-    [0, 16.15, 26.90, 36.15, 44.50, 52.30, 59.90, 66.70, 73.50, 80.30, 86.95, 100.35, 113.45, 125.50, 136.30, 145.10],
-    [0, 16.40, 27.35, 36.70, 45.15, 53.10, 60.75, 67.75, 74.60, 81.55, 88.30, 101.90, 115.20, 127.45, 138.35, 147.35],
-    [0, 16.60, 27.75, 37.30, 45.85, 53.90, 61.75, 68.75, 75.75, 82.75, 89.60, 103.40, 116.90, 129.35, 140.45, 149.55],
-    [0, 16.85, 28.00, 37.85, 46.50, 54.70, 62.70, 69.80, 76.90, 84.00, 90.95, 104.95, 118.65, 131.30, 142.50, 151.80],
-    [0, 17.10, 28.60, 38.40, 47.20, 55.50, 63.60, 70.80, 78.00, 85.20, 92.30, 106.50, 120.40, 133.20, 144.60, 154.00],
-    [0, 17.30, 29.00, 38.90, 47.80, 56.25, 64.45, 71.75, 79.05, 86.35, 93.55, 107.95, 122.00, 135.00, 146.55, 156.05],
-    [0, 17.55, 29.35, 39.45, 48.45, 57.00, 65.30, 72.70, 80.10, 87.50, 94.80, 109.40, 123.60, 136.75, 148.50, 158.10],
-    [0, 17.75, 29.75, 39.95, 49.05, 57.70, 66.20, 73.70, 81.10, 88.60, 96.00, 110.80, 125.20, 138.55, 150.40, 160.20],
-    [0, 18.00, 30.10, 40.50, 49.70, 58.45, 67.05, 74.65, 82.15, 89.75, 97.25, 112.25, 126.80, 140.30, 152.35, 162.23],
-    [0, 18.20, 30.50, 41.00, 50.30, 59.20, 67.90, 75.60, 83.20, 90.90, 98.50, 113.70, 128.40, 142.10, 154.30, 164.30],
-    [0, 18.40, 30.85, 41.50, 50.90, 59.90, 68.70, 76.50, 84.20, 92.00, 99.65, 115.05, 129.95, 143.80, 156.15, 166.25],
-    [0, 18.65, 31.20, 41.95, 51.50, 60.60, 69.50, 77.35, 86.20, 93.05, 100.80, 116.40, 131.50, 145.50, 158.00, 168.20],
-    [0, 18.85, 31.60, 42.45, 52.10, 61.30, 70.30, 78.50, 87.20, 94.15, 102.00, 117.70, 133.00, 147.20, 159.80, 170.10],
-    [0, 19.10, 31.95, 42.90, 52.70, 62.00, 71.10, 79.10, 88.20, 95.20, 103.15, 119.05, 134.55, 148.90, 161.65, 172.05],
-    [0, 19.30, 32.30, 43.40, 53.30, 62.70, 71.90, 80.00, 89.10, 96.30, 104.30, 120.40, 136.10, 150.60, 163.50, 174.00],
-    [0, 19.50, 32.65, 43.85, 53.85, 63.40, 72.65, 80.85, 90.05, 97.30, 105.40, 121.70, 137.55, 152.20, 165.20, 175.05],
-    [0, 19.75, 33.00, 44.30, 54.40, 64.05, 73.40, 81.70, 90.95, 98.35, 106.50, 122.95, 139.00, 153.75, 166.95, 177.70],
-    [0, 19.95, 33.30, 44.80, 55.40, 64.75, 74.20, 82.60, 91.90, 99.35, 107.60, 124.25, 140.40, 155.35, 168.65, 179.50],
-    [0, 20.20, 33.65, 45.25, 55.55, 65.40, 74.95, 83.45, 91.90, 100.40, 108.70, 125.50, 141.85, 156.90, 170.40, 181.35],
-    [0, 20.40, 34.00, 45.70, 56.10, 66.10, 75.70, 84.30, 92.80, 101.40, 109.80, 126.80, 143.30, 158.50, 172.10, 183.20],
-    [0, 20.60, 34.30, 46.15, 56.65, 66.70, 76.40, 85.10, 93.70, 102.40, 110.85, 128.00, 144.65, 160.00, 173.75, 184.95],
-    [0, 20.75, 34.65, 46.60, 57.20, 67.35, 77.10, 85.90, 94.50, 103.35, 111.90, 129.20, 146.00, 161.55, 175.40, 186.70],
-    [0, 20.95, 34.95, 47.00, 57.70, 67.95, 77.85, 86.70, 95.50, 104.35, 113.00, 130.40, 147.40, 163.05, 177.00, 188.50],
-    [0, 21.10, 35.30, 47.45, 58.50, 68.60, 78.60, 87.50, 96.40, 105.30, 114.05, 131.60, 148.75, 164.60, 178.65, 190.50],
-    [0, 21.30, 35.60, 47.90, 58.80, 69.20, 79.30, 88.30, 97.30, 106.30, 115.10, 132.80, 150.10, 166.10, 180.30, 192.00],
-    [0, 21.50, 35.80, 48.30, 59.30, 69.80, 80.00, 89.10, 98.15, 107.20, 116.10, 133.95, 151.40, 167.56, 181.90, 193.70],
-    [0, 21.70, 36.25, 48.75, 59.85, 70.40, 80.70, 89.85, 99.00, 108.15, 117.10, 135.10, 152.75, 169.00, 183.45, 195.35],
-    [0, 21.90, 36.56, 49.16, 60.35, 71.00, 81.40, 90.66, 99.80, 109.05, 118.10, 136.30, 154.05, 170.50, 185.05, 197.05],
-    [0, 22.10, 36.90, 49.60, 60.90, 71.60, 82.10, 91.40, 100.65, 110.00, 119.10, 137.45, 155.40, 171.95, 186.60, 198.70],
-    [0, 22.30, 37.20, 50.00, 61.40, 72.20, 82.80, 92.20, 101.50, 110.90, 120.10, 138.60, 156.70, 173.40, 188.20, 200.00],
-])
-
-    
-    return RegularGridInterpolator((y_vals, x_vals), z_matrix)
-
-def setup_el_interpolators():
-    # Data EL, CAP, and AREA
-    el = np.array([
-        75.00, 76.00, 77.00, 78.00, 79.00, 80.00, 81.00, 82.00, 83.00, 84.00,
-        85.00, 86.00, 87.00, 88.00, 89.00, 90.00, 91.00, 92.00, 93.00, 94.00,
-        95.00, 96.00, 97.00, 98.00, 99.00, 100.00, 101.00, 102.00, 103.00,
-        104.00, 105.00, 106.00, 107.00, 108.00, 109.00, 110.00, 111.00
-    ])
-
-    cap = np.array([
-        579, 614, 650, 688, 727, 768, 810, 854, 899, 946,
-        995, 1045, 1096, 1149, 1204, 1260, 1317, 1377, 1437, 1500,
-        1563, 1629, 1695, 1764, 1834, 1905, 1978, 2053, 2129,
-        2206, 2285, 2366, 2448, 2531, 2617, 2703, 2792
-    ])
-
-    area = np.array([
-        36.82, 38.08, 39.34, 40.62, 41.90, 43.19, 44.49, 45.80, 47.12, 48.45,
-        49.78, 51.13, 52.48, 53.84, 55.21, 56.59, 57.97, 59.37, 60.77, 62.18,
-        63.60, 65.03, 66.47, 67.92, 69.37, 70.84, 72.31, 73.79, 75.28,
-        76.78, 78.29, 79.80, 81.33, 82.86, 84.40, 85.95, 87.51
-    ])
-
-    # Create interpolators
-    el_to_cap_interpolator = interp1d(el, cap, kind='linear', fill_value="extrapolate")
-    cap_to_el_interpolator = interp1d(cap, el, kind='linear', fill_value="extrapolate")
-    el_to_area_interpolator = interp1d(el, area, kind='linear', fill_value="extrapolate")
-
-    return el_to_cap_interpolator, cap_to_el_interpolator, el_to_area_interpolator
-
-# Initialize interpolators
-interpolator = setup_hjv_interpolator()
-el_to_cap_interpolator, cap_to_el_interpolator, el_to_area_interpolator = setup_el_interpolators()
-
-def calculate_hjv_debit(opening_percent, res_level):
-    """Calculate HJV debit based on opening percentage and reservoir level"""
-    try:
-        return float(interpolator([[res_level, opening_percent]])[0])
-    except ValueError:
-        return 0.0
-
+from alerts import get_rules
+from consumption import specific_consumption
+from debit_engine import calculate_hjv_debit, calculate_turbine_debit, current_tables
+from graph import debit_graph
+from inflow import estimate_inflow
+from live_feed import get_feed, stop_feed
+from reading_store import get_store
+from report import BULAN, HARI, daily_report, load_store, monthly_report, render_daily, render_monthly
+from result_cache import amplop_operasi, cache_stats, ensemble_tma, simulasi_bertahap, simulasi_harian
+from dispatch import optimize_dispatch
+from solver import solve_hcv_opening, solve_release_for_tma, solve_total_load
+from sweep import default_axes
+
+profiling.mark("setup")
 st.set_page_config(page_title="Perhitungan Debit Sesaat Bendungan Ir. H. Djuanda", layout="wide")
 
-st.markdown("""
-<script>
-    // Fungsi untuk menyimpan data form
-    function simpanDataForm() {
-        const inputs = {
-            'tma': document.querySelector('input[aria-label="Tinggi Muka Air Waduk (mdpl)"]')?.value,
-            'trc': document.querySelector('input[aria-label="Tailrace (mdpl)"]')?.value,
-            'hjv_kiri': document.querySelector('input[aria-label="HCV Kiri (%)"]')?.value,
-            'hjv_kanan': document.querySelector('input[aria-label="HCV Kanan (%)"]')?.value,
-            'beban_1': document.querySelector('input[aria-label="Beban Unit I (mW)"]')?.value,
-            'beban_2': document.querySelector('input[aria-label="Beban Unit II (mW)"]')?.value,
-            'beban_3': document.querySelector('input[aria-label="Beban Unit III (mW)"]')?.value,
-            'beban_4': document.querySelector('input[aria-label="Beban Unit IV (mW)"]')?.value,
-            'beban_5': document.querySelector('input[aria-label="Beban Unit V (mW)"]')?.value,
-            'beban_6': document.querySelector('input[aria-label="Beban Unit VI (mW)"]')?.value,
-        };
-        localStorage.setItem('formData', JSON.stringify(inputs));
-    }
-
-    // Fungsi untuk memulihkan data form
-    function pulihkanDataForm() {
-        const saved = localStorage.getItem('formData');
-        if (saved) {
-            const inputs = JSON.parse(saved);
-            Object.entries(inputs).forEach(([key, value]) => {
-                if (value) {
-                    const input = document.querySelector(`input[aria-label="${getLabel(key)}"]`);
-                    if (input) {
-                        input.value = value;
-                        // Trigger change event
-                        const event = new Event('change', { bubbles: true });
-                        input.dispatchEvent(event);
-                    }
-                }
-            });
-        }
-    }
+# Pembacaan terakhir yang tersimpan di server (reading_store.py) mengisi form
+# saat sesi baru dibuka, menggantikan autosave localStorage di browser
+reading_store = get_store()
+if "form_dipulihkan" not in st.session_state:
+    st.session_state.form_dipulihkan = True
+    terakhir = reading_store.latest()
+    if terakhir is not None:
+        for key in ("tma", "trc"):
+            st.session_state[key] = terakhir[key]
+        for key in ("hjv_kiri", "hjv_kanan"):
+            if terakhir[key] is not None:
+                st.session_state[key] = int(round(terakhir[key]))
+        for i in range(6):
+            st.session_state[f"beban_{i}"] = terakhir[f"beban_{i + 1}"]
+
+# Tambahkan tombol untuk mengosongkan form (riwayat di server tetap tersimpan)
+if st.button("Kosongkan Form"):
+    for key in ["tma", "trc", "hjv_kiri", "hjv_kanan"] + [f"beban_{i}" for i in range(6)]:
+        st.session_state[key] = None
+    st.rerun()
 
-    // Helper function untuk mendapatkan label input
-    function getLabel(key) {
-        const labels = {
-            'tma': 'Tinggi Muka Air Waduk (mdpl)',
-            'trc': 'Tailrace (mdpl)',
-            'hjv_kiri': 'HCV Kiri (%)',
-            'hjv_kanan': 'HCV Kanan (%)',
-            'beban_1': 'Beban Unit I (mW)',
-            'beban_2': 'Beban Unit II (mW)',
-            'beban_3': 'Beban Unit III (mW)',
-            'beban_4': 'Beban Unit IV (mW)', 
-            'beban_5': 'Beban Unit V (mW)',
-            'beban_6': 'Beban Unit VI (mW)'
-        };
-        return labels[key];
-    }
+st.title("Perhitungan Debit Sesaat Bendungan Ir. H. Djuanda")
 
-    // Auto-save setiap 30 detik
-    setInterval(simpanDataForm, 30000);
-    
-    // Pulihkan data saat halaman dimuat
-    document.addEventListener('DOMContentLoaded', pulihkanDataForm);
-    
-    // Simpan data sebelum halaman ditutup
-    window.addEventListener('beforeunload', simpanDataForm);
-</script>
-""", unsafe_allow_html=True)
-
-# Tambahkan tombol untuk menghapus data tersimpan
-if st.button("Hapus Data Tersimpan"):
-    st.markdown("""
-    <script>
-        localStorage.removeItem('formData');
-        window.location.reload();
-    </script>
-    """, unsafe_allow_html=True)
+# Tanggal/jam sekarang dan nama hari/bulan, dipakai di tab 2 dan 3
+# Get current date and time in WIB timezone
+jakarta_tz = pytz.timezone('Asia/Jakarta')
+current_time = datetime.now(jakarta_tz)
 
-st.title("Perhitungan Debit Sesaat Bendungan Ir. H. Djuanda")
+# Nama hari dan bulan Indonesia (bersama dengan laporan harian/bulanan, report.py)
+hari, bulan = HARI, BULAN
 
 # Create tabs for navigation
-tab1, tab2, tab3 = st.tabs(["Input Data", "Hasil Perhitungan", "Simulasi Harian"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Input Data", "Hasil Perhitungan", "Simulasi Harian", "Hitung Balik",
+                                              "Pemantauan Langsung", "Amplop Operasi"])
 
+# Graf perhitungan per sesi: hanya node yang inputnya berubah dihitung ulang
+if "debit_graph" not in st.session_state:
+    st.session_state.debit_graph = debit_graph()
+graph = st.session_state.debit_graph
+graph.reset_log()
+graph.set(tabel=current_tables())  # versi tabel terbaru, berganti bila file tabel diperbarui
+
+profiling.mark("tab1")
 with tab1:
     st.markdown('''<span style="color:yellow; background-color:black; font-weight:bold">
                 Beban di bawah 15 Mw\nTinggi jatuh head\nlihat tabel\n(debit turbin input manual)</span>''', 
@@ -182,15 +87,18 @@ with tab1:
         tma = st.number_input("Tinggi Muka Air Waduk (mdpl)", 
                              value=None,
                              step=0.01, 
-                             format="%.2f")
+                             format="%.2f",
+                             key="tma")
     with col2:
         trc = st.number_input("Tailrace (mdpl)", 
                              value=None,
                              step=0.01, 
-                             format="%.2f")
+                             format="%.2f",
+                             key="trc")
     
-    # Calculate head automatically with None check
-    tinggi_jatuh = (tma or 0) - (trc or 0)  # Use 0 if None for calculations
+    # Calculate head automatically (kosong dihitung 0)
+    graph.set(tma=tma, trc=trc)
+    tinggi_jatuh = graph["tinggi_jatuh"]
     st.info(f"Tinggi Jatuh (head) = {tinggi_jatuh:.2f} m")
 
     st.subheader("Data Hollow Cone Valve")
@@ -198,19 +106,23 @@ with tab1:
     with col1:
         hjv_kiri = st.number_input("HCV Kiri (%)", 
                                   value=None,
-                                  step=1)
-        debit_hjv_kiri = calculate_hjv_debit(hjv_kiri, tma)
+                                  step=1,
+                                  key="hjv_kiri")
+        graph.set(hjv_kiri=hjv_kiri)
+        debit_hjv_kiri = graph["debit_hjv_kiri"]
         st.write(f"Debit HCV Kiri: {debit_hjv_kiri:.2f} m³/det")
 
     with col2:
         hjv_kanan = st.number_input("HCV Kanan (%)", 
                                    value=None,
-                                   step=1)
-        debit_hjv_kanan = calculate_hjv_debit(hjv_kanan, tma)
+                                   step=1,
+                                   key="hjv_kanan")
+        graph.set(hjv_kanan=hjv_kanan)
+        debit_hjv_kanan = graph["debit_hjv_kanan"]
         st.write(f"Debit HCV Kanan: {debit_hjv_kanan:.2f} m³/det")
 
-    # Display total HJV debit with None check
-    total_hjv = (debit_hjv_kiri or 0) + (debit_hjv_kanan or 0)  # Use 0 if None
+    # Display total HJV debit (L14)
+    total_hjv = graph["L14"]
     st.info(f"Total Debit HCV = {total_hjv:.2f} m³/det")
 
     # Input Beban per Unit section
@@ -227,109 +139,43 @@ with tab1:
                                  format="%.2f",
                                  key=f"beban_{i}")
         beban.append(beban_i or 0.0)  # Use 0.0 if None for calculations
+        graph.set(**{f"beban_{i + 1}": beban_i})
     
     # Display total beban
-    total_beban = sum(beban)
+    total_beban = graph["total_beban"]
     st.info(f"Total Beban = {total_beban:.2f} MW")
 
     
-# Rumus R5
-R5 = -0.32675 + 3.5945*tinggi_jatuh - 0.0463189*tinggi_jatuh**2 + 0.0001975*tinggi_jatuh**3
-
-# Rumus R6-R11
-R = []
-for i in range(6):
-    denominator = -30857 + 1292.71*tinggi_jatuh - 8.9741*tinggi_jatuh**2 + 0.03682*tinggi_jatuh**3
-    if denominator != 0:
-        R_i = beban[i]*100*1000/denominator
-    else:
-        R_i = 0
-    R.append(R_i)
-
-# Rumus L6-L11
-L = []
-for i in range(6):
-    poly = -4.532068452 + 0.31155337*R[i] - 0.006520552181*R[i]**2 + 0.0000597737436*R[i]**3 - 0.0000002019124*R[i]**4
-    denominator = 9.8 * tinggi_jatuh * R5 * (poly/100)
-    if denominator != 0:
-        L_i = beban[i]/denominator*1000
-    else:
-        L_i = 0
-    L.append(L_i)
+profiling.mark("hitung")
+# Rumus R5, R6-R11, L6-L11, L13 (node graph.debit_graph, lihat debit_engine.py)
+R5 = graph["R5"]
+R = [graph[f"unit_{i + 1}"][0] for i in range(6)]
+L = [graph[f"unit_{i + 1}"][1] for i in range(6)]
 
 # L12 calculation with modified check
-has_low_beban = any(b < 15 and b > 0 for b in beban)  # Only check active units
+has_low_beban = graph["has_low_beban"]  # Only check active units
 
 if has_low_beban:
     st.warning("Ada beban di bawah 15 MW. Silakan input Debit Turbin secara manual.")
     L12 = st.number_input("Input Debit Turbin m³/det", 
-                        value=sum(L), 
+                        value=graph["L12"], 
                         step=0.001,
                         format="%.3f")
 else:
-    L12 = sum(L)
+    L12 = graph["L12"]
 
 # L13 calculation with None check
-if tma is None or tma <= 106.9:
-    L13 = 0
-else:
-    L13 = 231.2*((tma-106.9)**1.5) + 15.8*((tma-106.9)**2.5)
+L13 = graph["L13"]
 
 # L14
 L14 = total_hjv  # Use the total HJV debit
 # L15
 L15 = L12 + L13 + L14
 
-with tab2:
-    st.subheader("Hasil Perhitungan Debit")
-    
-    # Display unit debits vertically
-    for i in range(6):
-        st.metric(f"Debit Unit {unit_list[i]}", f"{L[i]:,.3f} m³/det")
-    
-    st.divider()
-    
-    # Display summary debits vertically
-    st.metric("Debit Turbin", f"{L12:,.3f} m³/det")
-    st.metric("Debit Limpasan", f"{L13:,.3f} m³/det")
-    st.metric("Debit HJV Total", f"{L14:,.3f} m³/det")
-    
-    st.divider()
-    st.metric("Debit Total", f"{L15:,.3f} m³/det", delta=f"{L15-L12:,.3f} m³/det")
-
-    st.divider()
-    
-    # Get current date and time in WIB timezone
-    jakarta_tz = pytz.timezone('Asia/Jakarta')
-    current_time = datetime.now(jakarta_tz)
-    
-    # Indonesian day names mapping
-    hari = {
-        'Monday': 'Senin',
-        'Tuesday': 'Selasa',
-        'Wednesday': 'Rabu',
-        'Thursday': 'Kamis',
-        'Friday': 'Jumat',
-        'Saturday': 'Sabtu',
-        'Sunday': 'Minggu'
-    }
-    
-    # Indonesian month names mapping
-    bulan = {
-        'January': 'Januari',
-        'February': 'Februari',
-        'March': 'Maret',
-        'April': 'April',
-        'May': 'Mei',
-        'June': 'Juni',
-        'July': 'Juli',
-        'August': 'Agustus',
-        'September': 'September',
-        'October': 'Oktober',
-        'November': 'November',
-        'December': 'Desember'
-    }
-    
+# Pesan WhatsApp sebagai fragment: mengubah tanggal/jam hanya menjalankan bagian ini
+@st.fragment
+@profiling.profiled("pesan_whatsapp")
+def pesan_whatsapp():
     # Manual date and time input
     st.subheader("Waktu Pengiriman")
     col1, col2, col3 = st.columns(3)
@@ -379,7 +225,7 @@ Debit total Sesaat : {L15:.3f} m³/s"""
     st.divider()
     col1, col2, col3 = st.columns([1,2,1])
     
-    with col2:
+    with col2, profiling.phase("tombol_whatsapp"):
         st.markdown(f'''
         <a href="{whatsapp_url}" target="_blank">
             <button style="
@@ -408,7 +254,122 @@ Debit total Sesaat : {L15:.3f} m³/s"""
     with st.expander("Preview Pesan"):
         st.code(whatsapp_message)
 
-with tab3:
+    # Simpan pembacaan + hasil ke riwayat di server (ditulis di thread terpisah)
+    if st.button("Simpan Pembacaan"):
+        waktu_baca = jakarta_tz.localize(datetime.combine(selected_date, datetime.min.time())
+                                         + timedelta(hours=jam, minutes=menit))
+        pembacaan = {"tma": tma, "trc": trc, "hjv_kiri": hjv_kiri, "hjv_kanan": hjv_kanan,
+                     "tinggi_jatuh": tinggi_jatuh,
+                     "debit_turbin": L12, "debit_limpasan": L13,
+                     "debit_hjv_kiri": debit_hjv_kiri, "debit_hjv_kanan": debit_hjv_kanan,
+                     "debit_hjv": L14, "debit_total": L15, "beban_rendah": has_low_beban,
+                     "versi_tabel": current_tables().version}
+        for i in range(6):
+            pembacaan[f"beban_{i + 1}"] = beban[i]
+            pembacaan[f"debit_unit_{i + 1}"] = L[i]
+        reading_store.add(waktu_baca, pembacaan)
+        st.success(f"Pembacaan {waktu_baca.strftime('%d/%m/%Y %H:%M')} WIB disimpan")
+
+
+# Riwayat pembacaan dari penyimpanan server, query rentang waktu pada indeks waktu
+RENTANG_RIWAYAT = {
+    "Shift terakhir (8 jam)": timedelta(hours=8),
+    "24 jam terakhir": timedelta(days=1),
+    "7 hari terakhir": timedelta(days=7),
+    "30 hari terakhir": timedelta(days=30),
+}
+
+
+@st.fragment
+@profiling.profiled("riwayat_pembacaan")
+def riwayat_pembacaan():
+    with st.expander("Riwayat Pembacaan"):
+        rentang = st.radio("Rentang", list(RENTANG_RIWAYAT), horizontal=True, key="rentang_riwayat")
+        sekarang = datetime.now(jakarta_tz)
+        riwayat = reading_store.query(sekarang - RENTANG_RIWAYAT[rentang], None,
+                                      ["waktu", "tma", "trc", "debit_turbin", "debit_limpasan",
+                                       "debit_hjv", "debit_total"])
+        if len(riwayat["waktu"]) == 0:
+            st.info("Belum ada pembacaan tersimpan pada rentang ini")
+            return
+        # waktu WIB tanpa zona supaya tabel dan grafik tidak mengubahnya ke UTC
+        riwayat["waktu"] = [datetime.fromtimestamp(w, jakarta_tz).replace(tzinfo=None) for w in riwayat["waktu"]]
+        st.dataframe(riwayat, hide_index=True)
+        st.line_chart(riwayat, x="waktu", y=["debit_turbin", "debit_limpasan", "debit_hjv", "debit_total"])
+
+
+# Laporan volume harian/bulanan dari pembacaan tersimpan (integrasi trapesium, report.py)
+@st.fragment
+@profiling.profiled("laporan_volume")
+def laporan_volume():
+    with st.expander("Laporan Volume Harian dan Bulanan"):
+        col1, col2 = st.columns(2)
+        with col1:
+            dari = st.date_input("Dari tanggal", value=current_time.date().replace(day=1), format="DD/MM/YYYY",
+                                 key="laporan_dari")
+        with col2:
+            sampai = st.date_input("Sampai tanggal", value=current_time.date(), format="DD/MM/YYYY",
+                                   key="laporan_sampai")
+        data = load_store(dari, sampai + timedelta(days=1), reading_store)
+        if len(data["waktu"]) == 0:
+            st.info("Belum ada pembacaan tersimpan pada rentang ini")
+            return
+        harian = daily_report(data)
+        bulanan = monthly_report(harian)
+        st.dataframe({
+            "tanggal": harian["tanggal"],
+            "volume total (juta m³)": harian["volume_total"] / 1e6,
+            "rata-rata (m³/det)": harian["rata_total"],
+            "puncak (m³/det)": harian["puncak_total"],
+            "TMA min": harian["tma_min"],
+            "TMA maks": harian["tma_maks"],
+            "jam data": harian["jam_data"],
+        }, hide_index=True)
+        laporan = "\n\n".join(render_monthly(bulanan) + render_daily(harian)) + "\n"
+        st.download_button("Unduh Laporan (.txt)", laporan, file_name=f"laporan_{dari:%Y%m%d}_{sampai:%Y%m%d}.txt",
+                           mime="text/plain")
+
+
+profiling.mark("tab2")
+with tab2:
+    st.subheader("Hasil Perhitungan Debit")
+
+    # Aturan peringatan (alerts.py) pada pembacaan saat ini
+    aturan = get_rules()
+    for item in aturan.summarize(aturan.check_readings({"tma": np.nan if tma is None else tma,
+                                                        "debit_total": L15, "beban": beban})):
+        st.warning(item["pesan"])
+    
+    # Display unit debits vertically
+    konsumsi_unit, _ = specific_consumption(L, beban)
+    for i in range(6):
+        st.metric(f"Debit Unit {unit_list[i]}", f"{L[i]:,.3f} m³/det",
+                  help=f"Konsumsi air spesifik {konsumsi_unit[i]:,.0f} m³/MWh" if beban[i] > 0 else None)
+    
+    st.divider()
+    
+    # Display summary debits vertically
+    st.metric("Debit Turbin", f"{L12:,.3f} m³/det")
+    if total_beban > 0:
+        # dari Debit Turbin yang ditampilkan (termasuk input manual saat beban rendah)
+        st.metric("Konsumsi Air Spesifik", f"{3600 * L12 / total_beban:,.0f} m³/MWh")
+    st.metric("Debit Limpasan", f"{L13:,.3f} m³/det")
+    st.metric("Debit HJV Total", f"{L14:,.3f} m³/det")
+    
+    st.divider()
+    st.metric("Debit Total", f"{L15:,.3f} m³/det", delta=f"{L15-L12:,.3f} m³/det")
+
+    st.divider()
+
+    pesan_whatsapp()
+    riwayat_pembacaan()
+    laporan_volume()
+
+# Tab Simulasi Harian tidak bergantung pada tab Input Data, jadi dijalankan
+# sebagai fragment: perubahan input di sini tidak menjalankan ulang tab lain
+@st.fragment
+@profiling.profiled("simulasi_harian")
+def tab_simulasi_harian():
     st.subheader("Simulasi TMA")
     
     # Add time input section first
@@ -428,7 +389,36 @@ with tab3:
         menit_sim = st.number_input("Menit", min_value=0, max_value=59, value=current_time.minute, key="menit_sim")
     
     st.divider()  # Add divider between time input and simulation inputs
-    
+
+    # AM Total tidak diukur langsung: diperkirakan dari perubahan TMA pada
+    # pembacaan tersimpan dan debit keluarnya (neraca air dibalik, inflow.py)
+    with st.expander("Perkiraan AM Total dari Riwayat TMA"):
+        col1, col2 = st.columns(2)
+        with col1:
+            rentang_inflow = st.selectbox("Rentang riwayat", list(RENTANG_RIWAYAT), index=1, key="rentang_inflow")
+        with col2:
+            jendela_inflow = st.number_input("Jendela penghalusan (jumlah pembacaan)", min_value=1, max_value=1440,
+                                             value=3, step=1, key="jendela_inflow")
+        riwayat = reading_store.query(datetime.now(jakarta_tz) - RENTANG_RIWAYAT[rentang_inflow], None,
+                                      ["waktu", "tma", "debit_total"])
+        perkiraan = estimate_inflow(riwayat["waktu"], riwayat["tma"], riwayat["debit_total"], jendela_inflow)
+        if len(perkiraan["inflow"]) == 0:
+            st.info("Butuh minimal dua pembacaan tersimpan dengan TMA pada rentang ini")
+        else:
+            am_perkiraan = float(perkiraan["inflow"][-1])
+            st.metric("AM Total terakhir (dihaluskan)", f"{am_perkiraan:,.2f} m³/det")
+            st.line_chart({"waktu": [datetime.fromtimestamp(w, jakarta_tz).replace(tzinfo=None)
+                                     for w in perkiraan["waktu"]],
+                           "AM Total (dihaluskan)": perkiraan["inflow"],
+                           "AM Total per selang": perkiraan["inflow_sesaat"],
+                           "Debit keluar": perkiraan["debit_keluar"]},
+                          x="waktu")
+
+            def pakai_am_total():
+                st.session_state.am_total_sim = round(am_perkiraan, 2)
+
+            st.button("Pakai sebagai AM Total", on_click=pakai_am_total)
+
     col1, col2 = st.columns(2)
     with col1:
         tma_awal = st.number_input("TMA awal (mdpl)", 
@@ -439,7 +429,8 @@ with tab3:
         am_total = st.number_input("AM Total (m³/det)", 
                                   value=None,
                                   step=0.01,
-                                  format="%.2f")
+                                  format="%.2f",
+                                  key="am_total_sim")
         limpasan = st.number_input("Limpasan (m³/det)", 
                                  value=None,
                                  step=0.01,
@@ -470,32 +461,14 @@ with tab3:
         debit_hjv_kanan_sim = calculate_hjv_debit(hjv_kanan_sim, tma_awal)
         total_hjv_sim = (debit_hjv_kiri_sim or 0) + (debit_hjv_kanan_sim or 0)
 
-    # Calculations
-    ak_hjv = total_hjv_sim  # HJV total debit
-    ak_total = (limpasan or 0) + (ak_turbin or 0) + ak_hjv  # Include HJV in total outflow
-    delta_q = (am_total or 0) - ak_total  # AM Total - AK Total
-    seconds = duration_hours * 3600  # Convert hours to seconds
-    delta_s = delta_q * seconds  # Use converted seconds instead of hardcoded 86400
-    
-    # Calculate TMA akhir first
-    if tma_awal is not None:
-        try:
-            # Convert TMA awal to capacity using el_to_cap_interpolator
-            capacity_awal = float(el_to_cap_interpolator(tma_awal))
-            
-            # Calculate new capacity
-            delta_volume = delta_s/1000000  # Convert to MCM
-            capacity_akhir = capacity_awal + delta_volume
-            
-            # Convert new capacity back to elevation using cap_to_el_interpolator
-            tma_akhir = float(cap_to_el_interpolator(capacity_akhir))
-        except:
-            st.error("Error dalam perhitungan TMA. Periksa nilai input.")
-            capacity_awal = 0
-            tma_akhir = 0
-    else:
-        capacity_awal = 0
-        tma_akhir = 0
+    # Calculations: AK Total, ΔQ, ΔS dan TMA akhir (lihat routing.simulate_single_step)
+    simulasi = simulasi_harian(tma_awal, am_total, limpasan, ak_turbin,
+                               hjv_kiri_sim, hjv_kanan_sim, duration_hours)
+    ak_total = simulasi["ak_total"]
+    delta_q = simulasi["delta_q"]
+    delta_s = simulasi["delta_s"]
+    capacity_awal = simulasi["capacity_awal"]
+    tma_akhir = simulasi["tma_akhir"]
     
     # Then display results
     st.divider()
@@ -563,7 +536,7 @@ TMA Akhir: {tma_akhir:.2f} mdpl
         st.divider()
         col1, col2, col3 = st.columns([1,2,1])
         
-        with col2:
+        with col2, profiling.phase("tombol_whatsapp"):
             st.markdown(f'''
             <a href="{whatsapp_sim_url}" target="_blank">
                 <button style="background-color: #25D366; color: white; padding: 12px 24px; border: none; border-radius: 8px; cursor: pointer; width: 100%; font-size: 16px; display: flex; align-items: center; justify-content: center; gap: 8px;">
@@ -580,3 +553,441 @@ TMA Akhir: {tma_akhir:.2f} mdpl
             st.code(sim_message)
     else:
         st.info("Masukkan data untuk melihat interpretasi")
+
+    st.divider()
+
+    # Simulasi bertahap: debit HCV dan limpasan ikut TMA di setiap langkah
+    with st.expander("Simulasi Bertahap (TMA berubah tiap langkah)"):
+        st.caption("Debit HCV dan limpasan spillway dihitung ulang dari TMA pada setiap langkah "
+                   "(isian Limpasan di atas tidak dipakai). AM Total bisa konstan atau dari file CSV "
+                   "dengan kolom am_total, satu baris per langkah waktu.")
+        col1, col2 = st.columns(2)
+        with col1:
+            langkah_menit = st.number_input("Langkah waktu (menit)",
+                                            value=60,
+                                            min_value=1,
+                                            max_value=1440,
+                                            step=5)
+        with col2:
+            durasi_routing = st.number_input("Durasi simulasi (jam)",
+                                             value=int(duration_hours),
+                                             min_value=1,
+                                             max_value=24*180,
+                                             step=1)
+        inflow_file = st.file_uploader("Seri AM Total (CSV, opsional)", type="csv")
+
+        inflow_series = None
+        if inflow_file is not None:
+            lines = inflow_file.getvalue().decode("utf-8-sig").splitlines()
+            header = [h.strip() for h in lines[0].split(",")] if lines else []
+            if "am_total" in header:
+                inflow_series = np.loadtxt(lines[1:], delimiter=",", usecols=header.index("am_total"), ndmin=1)
+            else:
+                st.error("File CSV harus memiliki kolom am_total.")
+        if inflow_series is None:
+            n_langkah = max(int(durasi_routing * 60 // langkah_menit), 1)
+            inflow_series = np.full(n_langkah, am_total or 0.0)
+
+        if tma_awal is None:
+            st.info("Masukkan TMA awal untuk menjalankan simulasi bertahap")
+        else:
+            routing = simulasi_bertahap(tma_awal, inflow_series, langkah_menit * 60,
+                                        turbine=ak_turbin or 0.0,
+                                        hcv_kiri=hjv_kiri_sim or 0.0,
+                                        hcv_kanan=hjv_kanan_sim or 0.0)
+            volume_limpasan = routing["spillway"].sum() * langkah_menit * 60 / 1000000
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("TMA akhir bertahap (mdpl)", f"{routing['tma'][-1]:.2f}")
+            with col2:
+                st.metric("TMA maksimum (mdpl)", f"{routing['tma'].max():.2f}")
+            with col3:
+                st.metric("Volume limpasan (juta m³)", f"{volume_limpasan:.3f}")
+
+            aturan = get_rules()
+            for item in aturan.summarize(aturan.check_trajectories(routing["tma"], routing["time_hours"],
+                                                                   routing["outflow"])):
+                st.warning(f"{item['pesan']}: pertama pada jam ke-{item['jam_pertama']:g}")
+
+            st.line_chart({"Jam": routing["time_hours"], "TMA (mdpl)": routing["tma"]},
+                          x="Jam", y="TMA (mdpl)")
+
+    # Ensemble: AM Total, AK Turbin dan TMA awal diganggu acak
+    with st.expander("Ensemble TMA (ketidakpastian AM Total)"):
+        st.caption("Memakai seri AM Total, langkah waktu dan bukaan HCV dari simulasi bertahap di atas.")
+        col1, col2 = st.columns(2)
+        with col1:
+            n_skenario = st.number_input("Jumlah skenario",
+                                         value=1000,
+                                         min_value=100,
+                                         max_value=50000,
+                                         step=100)
+            sd_am_total = st.number_input("Ketidakpastian AM Total (sd, %)",
+                                          value=10.0,
+                                          min_value=0.0,
+                                          step=1.0)
+        with col2:
+            sd_ak_turbin = st.number_input("Ketidakpastian AK Turbin (sd, %)",
+                                           value=0.0,
+                                           min_value=0.0,
+                                           step=1.0)
+            sd_tma_awal = st.number_input("Ketidakpastian TMA awal (± cm)",
+                                          value=0.0,
+                                          min_value=0.0,
+                                          step=1.0)
+
+        if tma_awal is None:
+            st.info("Masukkan TMA awal untuk menjalankan ensemble")
+        elif st.button("Jalankan Ensemble"):
+            # seed tetap supaya input yang sama memberi hasil yang sama (dan bisa di-cache)
+            ensemble = ensemble_tma(tma_awal, inflow_series, langkah_menit * 60,
+                                    turbine=ak_turbin or 0.0,
+                                    hcv_kiri=hjv_kiri_sim or 0.0,
+                                    hcv_kanan=hjv_kanan_sim or 0.0,
+                                    n_scenarios=int(n_skenario),
+                                    inflow_dist=("normal_pct", sd_am_total) if sd_am_total else None,
+                                    turbine_dist=("normal_pct", sd_ak_turbin) if sd_ak_turbin else None,
+                                    tma_dist=("uniform", sd_tma_awal / 100) if sd_tma_awal else None,
+                                    seed=0, rules=get_rules())
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("TMA akhir P5 (mdpl)", f"{ensemble['tma_akhir'][5]:.2f}")
+            with col2:
+                st.metric("TMA akhir P50 (mdpl)", f"{ensemble['tma_akhir'][50]:.2f}")
+            with col3:
+                st.metric("TMA akhir P95 (mdpl)", f"{ensemble['tma_akhir'][95]:.2f}")
+            with col4:
+                st.metric("Peluang melewati 106,9 m", f"{ensemble['p_exceed_crest'] * 100:.1f} %")
+
+            for item in ensemble["peringatan"]:
+                st.warning(f"{item['pesan']}: {item['fraksi'] * 100:.1f} % skenario, "
+                           f"paling cepat jam ke-{item['jam_pertama']:g}")
+
+            st.line_chart({"Jam": ensemble["time_hours"],
+                           "P5": ensemble["percentiles"][5],
+                           "P50": ensemble["percentiles"][50],
+                           "P95": ensemble["percentiles"][95]},
+                          x="Jam", y=["P5", "P50", "P95"])
+
+
+@st.fragment
+@profiling.profiled("hitung_balik")
+def tab_hitung_balik():
+    st.subheader("Hitung Balik")
+    st.caption("Mencari bukaan HCV, beban turbin atau debit keluar yang dibutuhkan untuk target tertentu.")
+
+    st.subheader("Bukaan HCV untuk Target Debit")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        tma_hb = st.number_input("TMA (mdpl)",
+                                 value=None,
+                                 step=0.01,
+                                 format="%.2f",
+                                 key="tma_hb")
+    with col2:
+        target_hcv = st.number_input("Target debit HCV total (m³/det)",
+                                     value=None,
+                                     step=0.01,
+                                     format="%.2f")
+    with col3:
+        jumlah_hcv = st.radio("HCV dibuka", ["Kiri dan kanan sama besar", "Satu HCV"], key="jumlah_hcv")
+
+    if tma_hb is not None and target_hcv is not None:
+        n_hcv = 2 if jumlah_hcv == "Kiri dan kanan sama besar" else 1
+        bukaan = float(solve_hcv_opening(target_hcv / n_hcv, tma_hb))
+        if np.isnan(bukaan):
+            st.warning("Target debit tidak dapat dicapai pada TMA ini (di luar tabel HCV).")
+        else:
+            st.info(f"Bukaan HCV = {bukaan:.1f} % ({n_hcv} HCV)")
+
+    st.divider()
+    st.subheader("Beban Turbin untuk Target Debit")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        head_hb = st.number_input("Tinggi jatuh (m)",
+                                  value=None,
+                                  step=0.01,
+                                  format="%.2f",
+                                  key="head_hb")
+    with col2:
+        target_turbin = st.number_input("Target debit turbin (m³/det)",
+                                        value=None,
+                                        step=0.01,
+                                        format="%.2f")
+    with col3:
+        unit_hb = st.number_input("Jumlah unit beroperasi", value=6, min_value=1, max_value=6, step=1)
+
+    if head_hb is not None and target_turbin is not None:
+        total_mw = float(solve_total_load(target_turbin, head_hb, unit_hb))
+        if np.isnan(total_mw):
+            st.warning("Target debit di luar rentang rumus turbin untuk jumlah unit ini.")
+        else:
+            st.info(f"Total beban = {total_mw:.2f} MW ({total_mw / unit_hb:.2f} MW per unit)")
+
+    st.divider()
+    st.subheader("Debit Keluar untuk Target TMA")
+    col1, col2 = st.columns(2)
+    with col1:
+        tma_awal_hb = st.number_input("TMA awal (mdpl)",
+                                      value=None,
+                                      step=0.01,
+                                      format="%.2f",
+                                      key="tma_awal_hb")
+        target_tma_hb = st.number_input("Target TMA (mdpl)",
+                                        value=None,
+                                        step=0.01,
+                                        format="%.2f")
+    with col2:
+        am_total_hb = st.number_input("AM Total (m³/det)",
+                                      value=None,
+                                      step=0.01,
+                                      format="%.2f",
+                                      key="am_total_hb")
+        durasi_hb = st.number_input("Durasi (jam)", value=24, min_value=1, max_value=24*30, step=1, key="durasi_hb")
+
+    if tma_awal_hb is not None and target_tma_hb is not None:
+        ak_dibutuhkan = float(solve_release_for_tma(tma_awal_hb, target_tma_hb,
+                                                    np.full(int(durasi_hb), am_total_hb or 0.0)))
+        if np.isnan(ak_dibutuhkan):
+            st.warning("Target TMA tidak tercapai walaupun tanpa debit keluar.")
+        else:
+            st.info(f"AK Turbin + HCV yang dibutuhkan = {ak_dibutuhkan:.2f} m³/det "
+                    f"(limpasan spillway dihitung otomatis)")
+
+    st.divider()
+    st.subheader("Pembagian Beban Optimal")
+    st.caption("Pembagian beban antar unit dengan total debit turbin paling kecil untuk total MW yang sama.")
+    col1, col2 = st.columns(2)
+    with col1:
+        head_opt = st.number_input("Tinggi jatuh (m)",
+                                   value=None,
+                                   step=0.01,
+                                   format="%.2f",
+                                   key="head_opt")
+    with col2:
+        beban_opt = st.number_input("Total beban (MW)",
+                                    value=None,
+                                    step=0.01,
+                                    format="%.2f",
+                                    key="beban_opt")
+    unit_cols = st.columns(6)
+    unit_tersedia = []
+    for i in range(6):
+        with unit_cols[i]:
+            unit_tersedia.append(st.checkbox(f"Unit {unit_list[i]}", value=True, key=f"unit_opt_{i}"))
+
+    if head_opt is not None and beban_opt is not None:
+        optimal = optimize_dispatch(head_opt, beban_opt, unit_tersedia)
+        if np.isnan(optimal["debit_total"]):
+            st.warning("Total beban tidak dapat dipenuhi oleh unit yang tersedia.")
+        else:
+            for i in range(6):
+                if optimal["beban"][i] > 0:
+                    st.write(f"Unit {unit_list[i]}: {optimal['beban'][i]:.1f} MW "
+                             f"→ {optimal['debit'][i]:,.3f} m³/det")
+            st.info(f"Debit turbin total = {optimal['debit_total']:,.3f} m³/det")
+
+            # pembanding: beban dibagi rata ke semua unit yang tersedia
+            n_tersedia = sum(unit_tersedia)
+            rata = [beban_opt / n_tersedia if unit_tersedia[i] else 0.0 for i in range(6)]
+            _, _, L_rata = calculate_turbine_debit(head_opt, rata)
+            debit_rata = float(L_rata.sum())
+            st.write(f"Dibagi rata ke {n_tersedia} unit: {debit_rata:,.3f} m³/det "
+                     f"(hemat {debit_rata - optimal['debit_total']:,.3f} m³/det)")
+
+
+profiling.mark("tab3")
+with tab3:
+    tab_simulasi_harian()
+
+profiling.mark("tab4")
+with tab4:
+    tab_hitung_balik()
+
+
+# Ringkasan umpan langsung diperbarui tiap 0,5 detik tanpa menjalankan ulang
+# halaman; agregat dihitung inkremental di thread umpan (live_feed.py)
+@st.fragment(run_every=0.5)
+@profiling.profiled("ringkasan_umpan")
+def ringkasan_umpan():
+    # now: ember jendela yang sudah lewat kedaluwarsa walaupun umpan sedang diam
+    ringkasan = st.session_state.umpan.snapshot(now=time.time())
+    if ringkasan["error"]:
+        st.error(f"Umpan berhenti: {ringkasan['error']}")
+    st.caption(f"Sumber: {ringkasan['sumber']} | {ringkasan['n']:,} sampel, "
+               f"{ringkasan['ditolak']:,} baris ditolak, {ringkasan['terlambat']:,} terlambat")
+    for pesan in ringkasan["peringatan_aktif"]:
+        st.warning(pesan)
+    if ringkasan["peringatan"]:
+        st.caption("Peringatan sejak umpan dimulai: " + ", ".join(
+            f"{nama} {item['jumlah']:,} kali" for nama, item in ringkasan["peringatan"].items()))
+    if ringkasan["terakhir"] is None:
+        st.info("Menunggu pembacaan dari umpan...")
+        return
+    waktu = datetime.fromtimestamp(ringkasan["waktu_terakhir"], jakarta_tz)
+    st.write(f"**Pembacaan terakhir**: {waktu.strftime('%d/%m/%Y %H:%M:%S')} WIB")
+
+    col1, col2, col3 = st.columns(3)
+    for col, judul, nilai in ((col1, "Debit Total", ringkasan["terakhir"]["debit_total"]),
+                              (col2, "Rata-rata 1 Jam", ringkasan["rata_jam"]["debit_total"]),
+                              (col3, "Rata-rata 24 Jam", ringkasan["rata_hari"]["debit_total"])):
+        col.metric(judul, f"{nilai:,.3f} m³/det")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Debit Turbin (1 jam)", f"{ringkasan['rata_jam']['debit_turbin']:,.3f} m³/det")
+    col2.metric("Debit Limpasan (1 jam)", f"{ringkasan['rata_jam']['debit_limpasan']:,.3f} m³/det")
+    col3.metric("Debit HJV (1 jam)", f"{ringkasan['rata_jam']['debit_hjv']:,.3f} m³/det")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Volume Keluar Kumulatif", f"{ringkasan['volume']['debit_total']:,.0f} m³")
+    col2.metric("TMA Minimum", f"{ringkasan['tma_min']:.2f} mdpl")
+    col3.metric("TMA Maksimum", f"{ringkasan['tma_max']:.2f} mdpl")
+
+
+profiling.mark("tab5")
+with tab5:
+    st.subheader("Pemantauan Langsung")
+    st.caption("Membaca umpan pembacaan (file yang terus ditambah atau socket TCP lokal), "
+               "satu baris CSV per pembacaan: waktu, tma, trc, hjv_kiri, hjv_kanan, beban_1 ... beban_6. "
+               "Umpan dipakai bersama oleh semua sesi.")
+    col1, col2 = st.columns(2)
+    with col1:
+        jenis_umpan = st.radio("Sumber umpan", ["File", "Socket"], horizontal=True, key="jenis_umpan")
+    with col2:
+        if jenis_umpan == "File":
+            target_umpan = st.text_input("Path file", key="file_umpan")
+        else:
+            target_umpan = st.number_input("Port", value=8503, min_value=0, max_value=65535, step=1,
+                                           key="port_umpan")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Mulai Pemantauan") and target_umpan:
+            try:
+                st.session_state.umpan = get_feed(jenis_umpan.lower(), target_umpan)
+            except OSError as e:
+                st.error(f"Umpan tidak dapat dibuka: {e}")
+    with col2:
+        if st.button("Hentikan Pemantauan") and "umpan" in st.session_state:
+            stop_feed(st.session_state.pop("umpan"))
+
+    if "umpan" in st.session_state:
+        ringkasan_umpan()
+
+profiling.mark("sidebar")
+# Statistik cache hasil perhitungan (dipakai bersama oleh semua sesi)
+with st.sidebar.expander("Statistik Cache"):
+    for nama, stat in cache_stats().items():
+        st.write(f"**{nama}**: {stat['hits']} hit / {stat['misses']} miss "
+                 f"({stat['hit_rate'] * 100:.0f} %), {stat['size']}/{stat['maxsize']} entri")
+    st.write(f"**Versi tabel**: {current_tables().version}")
+    st.write(f"**Node dihitung ulang**: {', '.join(graph.recomputed) or '-'}")
+
+# Panel debug: waktu per fase rerun sebelumnya di sesi ini dan persentil semua sesi
+with st.sidebar.expander("Profil Waktu"):
+    st.session_state.profil_aktif = profiling.enabled()
+    st.checkbox("Catat waktu per fase (semua sesi)", key="profil_aktif",
+                on_change=lambda: profiling.set_enabled(st.session_state.profil_aktif))
+    st.caption(f"Jejak JSON lines: {profiling.LOG_PATH}")
+    terakhir = profiling.last_run(st.session_state.sesi_profil)
+    if terakhir is not None:
+        st.write(f"**{terakhir['jenis'].capitalize()} sebelumnya** ({terakhir['nama']}): "
+                 f"{terakhir['total_ms']:,.1f} ms")
+        st.dataframe({"fase": list(terakhir["fase"]), "ms": list(terakhir["fase"].values())}, hide_index=True)
+    statistik = profiling.percentiles()
+    if statistik:
+        st.write(f"**Persentil semua sesi** ({len(profiling.history())} rekaman terakhir)")
+        st.dataframe({"fase": list(statistik), **{kolom: [baris[kolom] for baris in statistik.values()]
+                                                   for kolom in ("n", "p50", "p90", "p99", "maks")}},
+                     hide_index=True)
+
+
+# Resolusi grid amplop operasi (titik TMA, bukaan, total MW)
+RESOLUSI_AMPLOP = {
+    "Kasar (50 x 51 x 50)": (50, 51, 50),
+    "Sedang (100 x 101 x 100)": (100, 101, 100),
+    "Halus (200 x 101 x 200)": (200, 101, 200),
+}
+# Sumbu x dan y peta panas untuk setiap irisan (nama, label, indeks sumbu grid)
+IRISAN_AMPLOP = {
+    "Bukaan HCV tetap": (("beban_total", "Total MW", 2), ("tma", "TMA (mdpl)", 0)),
+    "Total MW tetap": (("bukaan", "Bukaan HCV (%)", 1), ("tma", "TMA (mdpl)", 0)),
+    "TMA tetap": (("beban_total", "Total MW", 2), ("bukaan", "Bukaan HCV (%)", 1)),
+}
+
+
+def _peta_panas(x, y, z, label_x, label_y):
+    """Vega-Lite heatmap spec and data of z[y, x], one rectangle per grid point"""
+    # tepi sel di tengah antar titik grid
+    dx = np.gradient(x) / 2
+    dy = np.gradient(y) / 2
+    xx, yy = np.meshgrid(np.arange(len(x)), np.arange(len(y)))
+    xx, yy = xx.ravel(), yy.ravel()
+    domain = np.nanpercentile(z, [1, 99]).tolist() if np.isfinite(z).any() else None
+    data = {"x": x[xx], "x1": (x - dx)[xx], "x2": (x + dx)[xx],
+            "y": y[yy], "y1": (y - dy)[yy], "y2": (y + dy)[yy], "debit": z.ravel()}
+    spec = {
+        "mark": "rect",
+        "encoding": {
+            "x": {"field": "x1", "type": "quantitative", "title": label_x, "scale": {"zero": False, "nice": False}},
+            "x2": {"field": "x2"},
+            "y": {"field": "y1", "type": "quantitative", "title": label_y, "scale": {"zero": False, "nice": False}},
+            "y2": {"field": "y2"},
+            # skala warna dibatasi persentil 1-99 supaya titik ekstrem di tepi rentang
+            # berlaku rumus turbin tidak membuat seluruh peta berwarna sama
+            "color": {"field": "debit", "type": "quantitative", "title": "Debit total (m³/det)",
+                      "scale": {"scheme": "viridis", "domain": domain, "clamp": True}},
+            "tooltip": [{"field": "x", "type": "quantitative", "title": label_x, "format": ".2f"},
+                        {"field": "y", "type": "quantitative", "title": label_y, "format": ".2f"},
+                        {"field": "debit", "type": "quantitative", "title": "Debit total", "format": ",.2f"}],
+        },
+    }
+    return data, spec
+
+
+@st.fragment
+@profiling.profiled("amplop_operasi")
+def tab_amplop_operasi():
+    st.subheader("Amplop Operasi")
+    st.caption("Debit keluar total (turbin + limpasan + HCV) untuk seluruh kombinasi TMA, bukaan HCV dan "
+               "total beban. Beban dibagi rata ke unit paling sedikit yang cukup (maks. 31,25 MW per unit).")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        trc_amplop = st.number_input("Tailrace (mdpl)", value=35.0, step=0.01, format="%.2f", key="trc_amplop")
+    with col2:
+        hcv_amplop = st.radio("HCV dibuka", ["Kiri dan kanan sama besar", "Satu HCV"], key="hcv_amplop")
+    with col3:
+        resolusi = st.selectbox("Resolusi grid", list(RESOLUSI_AMPLOP), index=1, key="resolusi_amplop")
+
+    tabel = current_tables()
+    tma, bukaan, beban_total = default_axes(tabel, *RESOLUSI_AMPLOP[resolusi])
+    amplop = amplop_operasi(tma, bukaan, beban_total, trc_amplop,
+                            2 if hcv_amplop == "Kiri dan kanan sama besar" else 1, versi=tabel.version)
+    st.caption(f"{amplop['debit_total'].size:,} titik, versi tabel {amplop['versi_tabel']}")
+
+    irisan = st.radio("Irisan", list(IRISAN_AMPLOP), horizontal=True, key="irisan_amplop")
+    (nama_x, label_x, sumbu_x), (nama_y, label_y, sumbu_y) = IRISAN_AMPLOP[irisan]
+    sumbu_tetap = 3 - sumbu_x - sumbu_y
+    nama_tetap = ("tma", "bukaan", "beban_total")[sumbu_tetap]
+    nilai_tetap = amplop[nama_tetap]
+    label_tetap = {"tma": "TMA (mdpl)", "bukaan": "Bukaan HCV (%)", "beban_total": "Total MW"}[nama_tetap]
+    pilihan = st.select_slider(label_tetap, options=list(range(len(nilai_tetap))),
+                               value=len(nilai_tetap) // 2, format_func=lambda i: f"{nilai_tetap[i]:.2f}",
+                               key=f"amplop_{nama_tetap}")
+    z = np.take(amplop["debit_total"], pilihan, axis=sumbu_tetap)
+    if sumbu_x < sumbu_y:
+        z = z.T
+    with profiling.phase("peta_panas"):
+        data, spec = _peta_panas(amplop[nama_x], amplop[nama_y], z, label_x, label_y)
+        st.vega_lite_chart(data, spec, use_container_width=True)
+    if np.isfinite(z).any():
+        st.write(f"Debit total pada irisan ini: {np.nanmin(z):,.2f} - {np.nanmax(z):,.2f} m³/det")
+
+
+profiling.mark("tab6")
+with tab6:
+    tab_amplop_operasi()
+
+profiling.end_run()
@@ -0,0 +1,340 @@
+"""Benchmark dan uji regresi jalur hitung utama.
+
+Setiap kasus menghitung satu rumus pada grid tetap yang mencakup seluruh
+domain berlaku (TMA 80-111 mdpl, bukaan 0-100 %, beban 0 sampai beban
+pengenal per unit):
+
+- hcv: tabel rating HCV (calculate_hjv_debit / calculate_hjv_debit_array)
+- turbin: rumus R5, R6-R11 dan L6-L11 (calculate_turbine_debit)
+- limpasan: rumus L13 (calculate_spillway_debit)
+- kapasitas: elevasi -> kapasitas -> elevasi seperti tab Simulasi Harian
+- debit_total: seluruh form sekaligus (calculate_debit)
+
+Hasil batch dan panggilan skalar dibandingkan dengan nilai golden pada
+GOLDEN_SAMPLE titik per kasus yang dipilih dengan seed tetap
+(bench/golden.json, dibuat dari implementasi yang sudah diterima), dengan
+versi tabel yang sama dengan saat golden dibuat. Throughput (titik/detik)
+dibandingkan dengan baseline mesin ini (bench/baseline.json); turun lebih
+dari ``--ambang`` dianggap regresi. Kode keluar 1 bila ada yang gagal.
+
+Contoh:
+    python benchmark.py
+    python benchmark.py --kasus hcv turbin --ambang 0.1
+    python benchmark.py --simpan-baseline
+    python benchmark.py --tanpa-waktu
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import namedtuple
+
+import numpy as np
+
+from debit_engine import (
+    N_UNITS,
+    calculate_debit,
+    calculate_hjv_debit,
+    calculate_hjv_debit_array,
+    calculate_spillway_debit,
+    calculate_turbine_debit,
+    current_tables,
+)
+from dispatch import UNIT_RATED_LOAD
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench")
+GOLDEN_PATH = os.path.join(BENCH_DIR, "golden.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+# Throughput boleh turun sebanyak ini (fraksi) sebelum dianggap regresi
+DEFAULT_THRESHOLD = 0.25
+# Toleransi relatif/absolut terhadap golden (perbedaan pembulatan saja)
+RTOL = 1e-9
+ATOL = 1e-9
+# Jumlah titik yang juga dihitung lewat panggilan skalar saat mengukur waktu
+SCALAR_SAMPLE = 500
+# Jumlah titik golden per kasus dan seed pemilihannya (file golden tetap kecil)
+GOLDEN_SAMPLE = 64
+GOLDEN_SEED = 2024
+# Tailrace tetap untuk grid turbin (tinggi jatuh 45-76 m)
+TRC = 35.0
+
+Case = namedtuple("Case", "n_points batch scalar")
+
+
+def domain(n_tma=249, n_bukaan=81, n_beban=64):
+    """Grid axes; the step sizes deliberately do not line up with the rating table"""
+    tma = np.linspace(80.0, 111.0, n_tma)
+    bukaan = np.linspace(0.0, 100.0, n_bukaan)
+    beban = np.linspace(0.0, UNIT_RATED_LOAD, n_beban)
+    return tma, bukaan, beban
+
+
+def _unit_loads(index, beban):
+    """(N, 6) loads: unit u of point i gets load grid value (i + 11u) mod n"""
+    return beban[(index[:, np.newaxis] + 11 * np.arange(N_UNITS)) % len(beban)]
+
+
+def _case_hcv(tables):
+    tma, bukaan, _ = domain()
+    level, opening = (a.ravel() for a in np.meshgrid(tma, bukaan, indexing="ij"))
+
+    def batch():
+        return {"debit": calculate_hjv_debit_array(opening, level, tables=tables)}
+
+    def scalar(i):
+        return {"debit": calculate_hjv_debit(float(opening[i]), float(level[i]), tables=tables)}
+    return Case(len(level), batch, scalar)
+
+
+def _case_turbin(tables):
+    tma, _, beban = domain()
+    level, load = (a.ravel() for a in np.meshgrid(tma, beban, indexing="ij"))
+    head = level - TRC
+    loads = _unit_loads(np.arange(len(level)), beban)
+
+    def batch():
+        R5, R, L = calculate_turbine_debit(head, loads)
+        return {"R5": R5, "R": R, "L": L}
+
+    def scalar(i):
+        R5, R, L = calculate_turbine_debit(float(head[i]), loads[i].tolist())
+        return {"R5": R5, "R": R, "L": L}
+    return Case(len(level), batch, scalar)
+
+
+def _case_limpasan(tables):
+    tma = np.linspace(80.0, 111.0, 3101)
+
+    def batch():
+        return {"debit": calculate_spillway_debit(tma)}
+
+    def scalar(i):
+        return {"debit": calculate_spillway_debit(float(tma[i]))}
+    return Case(len(tma), batch, scalar)
+
+
+def _case_kapasitas(tables):
+    tma = np.linspace(80.0, 111.0, 3101)
+    curve = tables.curve
+
+    def batch():
+        capacity = curve.el_to_cap(tma)
+        return {"kapasitas": capacity, "tma": curve.cap_to_el(capacity)}
+
+    def scalar(i):
+        capacity = float(curve.el_to_cap(float(tma[i])))
+        return {"kapasitas": capacity, "tma": float(curve.cap_to_el(capacity))}
+    return Case(len(tma), batch, scalar)
+
+
+def _case_debit_total(tables):
+    tma, bukaan, beban = domain(n_tma=125, n_bukaan=41)
+    level, opening = (a.ravel() for a in np.meshgrid(tma, bukaan, indexing="ij"))
+    loads = _unit_loads(np.arange(len(level)), beban)
+    keys = ("R", "L", "debit_hjv_kiri", "debit_hjv_kanan", "L12", "L13", "L14", "L15")
+
+    def batch():
+        hasil = calculate_debit(level, TRC, opening, 100.0 - opening, loads, tables=tables)
+        return {key: hasil[key] for key in keys}
+
+    def scalar(i):
+        hasil = calculate_debit(float(level[i]), TRC, float(opening[i]), 100.0 - float(opening[i]),
+                                loads[i].tolist(), tables=tables)
+        return {key: hasil[key] for key in keys}
+    return Case(len(level), batch, scalar)
+
+
+CASES = {
+    "hcv": _case_hcv,
+    "turbin": _case_turbin,
+    "limpasan": _case_limpasan,
+    "kapasitas": _case_kapasitas,
+    "debit_total": _case_debit_total,
+}
+
+
+def _sample(n_points):
+    return np.unique(np.linspace(0, n_points - 1, min(SCALAR_SAMPLE, n_points)).astype(int))
+
+
+def golden_points(n_points):
+    """Sorted point indices checked against the golden values (fixed seed)"""
+    rng = np.random.default_rng(GOLDEN_SEED)
+    return np.sort(rng.choice(n_points, min(GOLDEN_SAMPLE, n_points), replace=False))
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_golden(names=None, path=GOLDEN_PATH):
+    """Write the batch results of the cases (default: all) at the golden points as the new golden values
+
+    Other cases already in the file are kept when the table version is the same.
+    """
+    tables = current_tables()
+    golden = load_golden(path) if os.path.exists(path) else {}
+    if golden.get("versi_tabel") != tables.version:
+        golden = {"versi_tabel": tables.version, "kasus": {}}
+    for name in names or CASES:
+        case = CASES[name](tables)
+        points = golden_points(case.n_points)
+        golden["kasus"][name] = {
+            "indeks": points.tolist(),
+            "nilai": {key: np.asarray(value, dtype=float)[points].tolist() for key, value in case.batch().items()},
+        }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(golden, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return tables.version
+
+
+def _compare(actual, expected):
+    return np.allclose(actual, expected, rtol=RTOL, atol=ATOL, equal_nan=True)
+
+
+def check_golden(name, golden):
+    """Compare batch and scalar results of one case with the golden values
+
+    Returns a list of problem descriptions (empty when everything matches).
+    """
+    entry = golden.get("kasus", {}).get(name)
+    if not entry:
+        return [f"tidak ada nilai golden untuk {name}, jalankan --simpan-golden"]
+    case = CASES[name](current_tables(golden["versi_tabel"]))
+    points = np.asarray(entry["indeks"], dtype=np.intp)
+    if points.max() >= case.n_points:
+        return [f"indeks golden di luar grid ({case.n_points} titik), jalankan --simpan-golden"]
+    problems = []
+    batch = case.batch()
+    for key, values in entry["nilai"].items():
+        expected = np.asarray(values, dtype=float)
+        actual = np.asarray(batch.get(key, np.nan), dtype=float)
+        actual = actual[points] if actual.ndim else actual
+        if actual.shape != expected.shape:
+            problems.append(f"{key}: bentuk {actual.shape}, golden {expected.shape}")
+        elif not _compare(actual, expected):
+            diff = np.abs(np.nan_to_num(actual - expected, nan=np.inf))
+            problems.append(f"{key}: {int((diff > ATOL + RTOL * np.abs(expected)).sum())} titik berbeda, "
+                            f"selisih maks {np.max(diff):.3g}")
+    scalar_diff = {}
+    for k, i in enumerate(points):
+        hasil = case.scalar(int(i))
+        for key, values in entry["nilai"].items():
+            if not _compare(np.asarray(hasil[key], dtype=float), np.asarray(values[k], dtype=float)):
+                scalar_diff.setdefault(key, []).append(int(i))
+    for key, diff_points in scalar_diff.items():
+        problems.append(f"{key}: panggilan skalar berbeda dari golden di {len(diff_points)} titik "
+                        f"(pertama {diff_points[0]})")
+    return problems
+
+
+def _throughput(func, n_points, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return n_points / (min(timer.repeat(repeat, number)) / number)
+
+
+def measure(name, repeat=5):
+    """Throughput (points/s) of the scalar API and the batched API for one case"""
+    case = CASES[name](current_tables())
+    sample = _sample(case.n_points)
+    return {
+        "skalar": _throughput(lambda: [case.scalar(i) for i in sample], len(sample), repeat),
+        "batch": _throughput(case.batch, case.n_points, repeat),
+    }
+
+
+def machine():
+    """Description of this machine, stored with the baseline"""
+    return {
+        "host": platform.node(),
+        "cpu": platform.processor() or platform.machine(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(timings, path=BASELINE_PATH):
+    """Merge ``timings`` ({case: {api: points/s}}) into the baseline file"""
+    baseline = load_baseline(path) or {"kasus": {}}
+    baseline["mesin"] = machine()
+    baseline["kasus"].update(timings)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dan uji regresi jalur hitung utama")
+    parser.add_argument("--kasus", nargs="+", choices=list(CASES), help="kasus yang dijalankan (default: semua)")
+    parser.add_argument("--ambang", type=float, default=DEFAULT_THRESHOLD,
+                        help="penurunan throughput maksimum terhadap baseline (fraksi, default 0.25)")
+    parser.add_argument("--repeat", type=int, default=5, help="jumlah pengulangan waktu (diambil yang tercepat)")
+    parser.add_argument("--tanpa-waktu", action="store_true", help="hanya cek nilai golden")
+    parser.add_argument("--simpan-baseline", action="store_true", help="simpan waktu hasil run ini sebagai baseline")
+    parser.add_argument("--simpan-golden", action="store_true",
+                        help="tulis ulang nilai golden dari implementasi sekarang (hanya bila perubahan angka disengaja)")
+    args = parser.parse_args(argv)
+    names = args.kasus or list(CASES)
+
+    try:
+        if args.simpan_golden:
+            versi = save_golden(names)
+            print(f"nilai golden {', '.join(names)} (versi tabel {versi}) -> {GOLDEN_PATH}")
+            return 0
+        if not os.path.exists(GOLDEN_PATH):
+            raise ValueError(f"{GOLDEN_PATH} tidak ada, buat dengan --simpan-golden")
+        golden = load_golden()
+        problems = {name: check_golden(name, golden) for name in names}
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    gagal = False
+    print("golden:")
+    for name in names:
+        print(f"  {name:<12} {'GAGAL' if problems[name] else 'ok'}")
+        for problem in problems[name][:10]:
+            print(f"      {problem}")
+        gagal |= bool(problems[name])
+    if args.tanpa_waktu:
+        return int(gagal)
+
+    timings = {name: measure(name, args.repeat) for name in names}
+    baseline = None if args.simpan_baseline else load_baseline()
+    if baseline is None and not args.simpan_baseline:
+        print(f"(belum ada baseline di {BASELINE_PATH}, simpan dengan --simpan-baseline)")
+    elif baseline is not None and baseline.get("mesin", {}).get("host") != platform.node():
+        print(f"(baseline dibuat di mesin lain: {baseline['mesin']}, perbandingan kurang berarti)")
+    print("throughput (titik/detik):")
+    for name in names:
+        for api, value in timings[name].items():
+            line = f"  {name:<12} {api:<7} {value:14,.0f}"
+            reference = ((baseline or {}).get("kasus", {}).get(name) or {}).get(api)
+            if reference:
+                change = value / reference - 1
+                regresi = change < -args.ambang
+                gagal |= regresi
+                line += f"   baseline {reference:14,.0f}  {change:+6.1%}{'  REGRESI' if regresi else ''}"
+            print(line)
+    if args.simpan_baseline:
+        save_baseline(timings)
+        print(f"baseline disimpan ke {BASELINE_PATH}")
+    return int(gagal)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
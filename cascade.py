@@ -0,0 +1,352 @@
+"""Routing kaskade waduk: pelepasan waduk hulu menjadi inflow waduk hilir.
+
+Setiap waduk punya lengkung elevasi-kapasitas sendiri dan aturan debit
+keluar yang bisa diganti: jadwal pelepasan (konstan, seri waktu atau per
+skenario) atau fungsi aturan, ditambah spillway. Debit keluar total
+sebuah waduk masuk ke waduk hilirnya setelah waktu tempuh ``lag_hours``.
+
+Bendungan Ir. H. Djuanda memakai routing.route_reservoir dengan tabel
+rating HCV, lengkung waduk dan rumus L13 yang sama dengan aplikasi.
+
+Waduk diurutkan dari hulu ke hilir; waduk pada tingkat yang sama (tidak
+saling bergantung) dan blok skenario yang besar dihitung paralel di
+beberapa proses.
+
+Contoh:
+    python cascade.py kaskade.json hasil_kaskade.csv
+
+Isi kaskade.json (kurva: CSV el, cap, area; "djuanda" = tabel aplikasi):
+    {"dt_jam": 1, "langkah": 4320,
+     "waduk": [
+        {"nama": "Saguling", "kurva": "saguling.csv", "tma_awal": 640.0, "pelepasan": 150,
+         "spillway": {"mercu": 643.0, "koefisien": 2.1, "lebar": 60}, "inflow_lokal": 120,
+         "hilir": "Cirata", "lag_jam": 6},
+        {"nama": "Cirata", "kurva": "cirata.csv", "tma_awal": 215.0, "pelepasan": 180,
+         "inflow_lokal": 40, "hilir": "Djuanda", "lag_jam": 4},
+        {"nama": "Djuanda", "kurva": "djuanda", "tma_awal": 105.0, "turbin": 160,
+         "hcv_kiri": 0, "hcv_kanan": 0, "inflow_lokal": 20}]}
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from debit_engine import current_tables
+from rating_table import StorageCurve
+from routing import route_reservoir
+from tables import read_curve_csv
+
+# Di bawah jumlah skenario ini overhead proses lebih mahal daripada hitungannya
+PARALLEL_MIN_SCENARIOS = 2000
+
+
+class WeirSpillway:
+    """Uncontrolled overflow ``Q = koefisien * lebar * (TMA - mercu)^1.5``"""
+
+    def __init__(self, mercu, koefisien, lebar):
+        self.mercu = mercu
+        self.koefisien = koefisien
+        self.lebar = lebar
+
+    def __call__(self, tma):
+        over = np.maximum(tma - self.mercu, 0.0)
+        return self.koefisien * self.lebar * over**1.5
+
+
+class LevelRule:
+    """Release what keeps the level at ``target`` (mdpl), within [minimum, maximum] m³/det
+
+    Each step releases the inflow plus the storage above the target
+    spread over ``horizon_steps`` steps.
+    """
+
+    def __init__(self, target, minimum=0.0, maximum=np.inf, horizon_steps=24):
+        self.target = target
+        self.minimum = minimum
+        self.maximum = maximum
+        self.horizon_steps = horizon_steps
+
+    def __call__(self, tma, storage, inflow, k, curve, dt_seconds):
+        excess = (storage - curve.el_to_cap(self.target)) * 1_000_000 / (self.horizon_steps * dt_seconds)
+        return np.clip(inflow + excess, self.minimum, self.maximum)
+
+
+def _scenarios(value, sl):
+    """Rows ``sl`` of a per-scenario input (2-D schedules, 1-D initial levels)"""
+    return value[sl] if isinstance(value, np.ndarray) and value.ndim == 2 else value
+
+
+class Reservoir:
+    """One reservoir: storage curve, release rule, spillway and downstream link
+
+    ``release`` is a scalar, a (T,) schedule, an (S, T) schedule per
+    scenario or a rule ``release(tma, storage, inflow, k, curve, dt)``
+    returning the controlled outflow (m³/det) of every scenario at step k.
+    ``local_inflow`` is the inflow not coming from upstream reservoirs.
+    Rules and spillways must be picklable (module-level classes such as
+    LevelRule/WeirSpillway) for parallel runs.
+    """
+
+    def __init__(self, name, curve, tma_awal, release=0.0, spillway=None, local_inflow=0.0,
+                 downstream=None, lag_hours=0.0):
+        self.name = name
+        self.curve = curve
+        self.tma_awal = np.asarray(tma_awal, dtype=float)
+        self.release = release if callable(release) else np.asarray(release, dtype=float)
+        self.spillway = spillway
+        self.local_inflow = np.asarray(local_inflow, dtype=float)
+        self.downstream = downstream
+        self.lag_hours = lag_hours
+
+    def n_scenarios(self):
+        shapes = [np.shape(x)[:-1] for x in self._schedules() if np.ndim(x) == 2]
+        return np.broadcast_shapes(self.tma_awal.shape, *shapes, (1,))[0]
+
+    def _schedules(self):
+        schedules = [self.local_inflow]
+        if not callable(self.release):
+            schedules.append(self.release)
+        return schedules
+
+    def for_scenarios(self, sl):
+        """Copy holding only the scenarios ``sl`` (for sharded runs)"""
+        part = object.__new__(type(self))
+        part.__dict__.update(self.__dict__)
+        part.tma_awal = self.tma_awal[sl] if self.tma_awal.ndim == 1 else self.tma_awal
+        part.local_inflow = _scenarios(self.local_inflow, sl)
+        part.release = _scenarios(self.release, sl)
+        return part
+
+    def route(self, inflow, dt_seconds):
+        """Route the total inflow (S, T); returns tma/storage (S, T+1) and outflows (S, T)"""
+        n_scen, n_steps = inflow.shape
+        curve = self.curve
+        volume_factor = dt_seconds / 1_000_000  # m³/det selama satu langkah -> juta m³
+        # dihitung dalam tata letak (T, S) supaya setiap langkah membaca/menulis satu baris kontigu
+        inflow_t = np.ascontiguousarray(inflow.T)
+        tma = np.empty((n_steps + 1, n_scen))
+        storage = np.empty((n_steps + 1, n_scen))
+        if callable(self.release):
+            release = np.empty((n_steps, n_scen))
+        else:
+            release = np.ascontiguousarray(np.broadcast_to(self.release, (n_scen, n_steps)).T)
+        spill = np.zeros((n_steps, n_scen))
+
+        h = np.broadcast_to(self.tma_awal, (n_scen,)).astype(float)
+        s = curve.el_to_cap(h)
+        tma[0] = h
+        storage[0] = s
+        for k in range(n_steps):
+            if callable(self.release):
+                release[k] = self.release(h, s, inflow_t[k], k, curve, dt_seconds)
+            if self.spillway is not None:
+                spill[k] = self.spillway(h)
+            s = s + (inflow_t[k] - release[k] - spill[k]) * volume_factor
+            h = curve.cap_to_el(s)
+            tma[k + 1] = h
+            storage[k + 1] = s
+        return {"tma": tma.T, "storage": storage.T, "inflow": inflow, "release": release.T,
+                "spillway": spill.T, "outflow": (release + spill).T}
+
+
+class DjuandaReservoir(Reservoir):
+    """Djuanda routed with routing.route_reservoir (HCV rating, L13 spillway)
+
+    ``release`` is the AK Turbin schedule; the HCV openings (%) are
+    scalars or schedules like in route_reservoir.
+    """
+
+    def __init__(self, tma_awal, turbine=0.0, hcv_kiri=0.0, hcv_kanan=0.0, local_inflow=0.0,
+                 downstream=None, lag_hours=0.0, name="Djuanda", tables=None):
+        tables = tables or current_tables()
+        super().__init__(name, tables.curve, tma_awal, turbine, None, local_inflow, downstream, lag_hours)
+        self.rating = tables.rating
+        self.hcv_kiri = np.asarray(hcv_kiri, dtype=float)
+        self.hcv_kanan = np.asarray(hcv_kanan, dtype=float)
+
+    def _schedules(self):
+        return super()._schedules() + [self.hcv_kiri, self.hcv_kanan]
+
+    def for_scenarios(self, sl):
+        part = super().for_scenarios(sl)
+        part.hcv_kiri = _scenarios(self.hcv_kiri, sl)
+        part.hcv_kanan = _scenarios(self.hcv_kanan, sl)
+        return part
+
+    def route(self, inflow, dt_seconds):
+        n_scen = inflow.shape[0]
+        hasil = route_reservoir(np.broadcast_to(self.tma_awal, (n_scen,)), inflow, dt_seconds,
+                                turbine=self.release, hcv_kiri=self.hcv_kiri, hcv_kanan=self.hcv_kanan,
+                                rating=self.rating, curve=self.curve)
+        return {"tma": hasil["tma"], "storage": hasil["storage"], "inflow": inflow,
+                "release": hasil["turbine"] + hasil["hcv"], "spillway": hasil["spillway"],
+                "outflow": hasil["outflow"]}
+
+
+def lag_series(outflow, lag_steps):
+    """Outflow arriving ``lag_steps`` (may be fractional) steps later
+
+    Before the first release arrives the first value is assumed (steady
+    state); a fractional lag is split linearly between two whole steps.
+    """
+    whole = int(np.floor(lag_steps))
+    frac = lag_steps - whole
+
+    def shift(n):
+        if n == 0:
+            return outflow
+        n = min(n, outflow.shape[1])
+        return np.concatenate((np.repeat(outflow[:, :1], n, axis=1), outflow[:, :outflow.shape[1] - n]), axis=1)
+
+    if frac == 0:
+        return shift(whole)
+    return (1 - frac) * shift(whole) + frac * shift(whole + 1)
+
+
+class Cascade:
+    """Reservoirs linked upstream to downstream"""
+
+    def __init__(self, reservoirs):
+        self.reservoirs = {r.name: r for r in reservoirs}
+        if len(self.reservoirs) != len(reservoirs):
+            raise ValueError("nama waduk dalam kaskade harus unik")
+        for r in reservoirs:
+            if r.downstream is not None and r.downstream not in self.reservoirs:
+                raise ValueError(f"waduk hilir {r.downstream!r} dari {r.name!r} tidak ada di kaskade")
+            if r.lag_hours < 0:
+                raise ValueError(f"lag {r.name!r} tidak boleh negatif")
+        self.levels = self._levels()
+
+    def _levels(self):
+        """Reservoir names grouped so every level only depends on earlier levels"""
+        upstream = {name: [r.name for r in self.reservoirs.values() if r.downstream == name]
+                    for name in self.reservoirs}
+        levels, done = [], set()
+        while len(done) < len(self.reservoirs):
+            level = [name for name in self.reservoirs
+                     if name not in done and all(u in done for u in upstream[name])]
+            if not level:
+                raise ValueError("kaskade tidak boleh berputar (hilir kembali ke hulu)")
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    def n_scenarios(self):
+        return max(r.n_scenarios() for r in self.reservoirs.values())
+
+    def run(self, n_steps, dt_seconds=3600, n_workers=None, shard_size=2500):
+        """Simulate every reservoir for ``n_steps``, returns ``{name: routing result}``
+
+        Scenario blocks of ``shard_size`` (from PARALLEL_MIN_SCENARIOS
+        scenarios) or the reservoirs of one level run in a process pool of
+        ``n_workers`` (default: CPU count). Arrays are (S, T) or, with a
+        single scenario, (T,).
+        """
+        n_scen = self.n_scenarios()
+        n_workers = n_workers or os.cpu_count() or 1
+        parallel = n_workers > 1
+        if parallel and n_scen >= PARALLEL_MIN_SCENARIOS and n_scen > shard_size:
+            blocks = [slice(i, i + shard_size) for i in range(0, n_scen, shard_size)]
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(blocks))) as pool:
+                futures = [pool.submit(_run_cascade, [r.for_scenarios(b) for r in self.reservoirs.values()],
+                                       min(b.stop, n_scen) - b.start, n_steps, dt_seconds) for b in blocks]
+                parts = [f.result() for f in futures]
+            hasil = {name: {key: np.concatenate([p[name][key] for p in parts]) for key in parts[0][name]}
+                     for name in self.reservoirs}
+        elif parallel and max(len(level) for level in self.levels) > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                hasil = self._run_levels(n_scen, n_steps, dt_seconds, pool)
+        else:
+            hasil = self._run_levels(n_scen, n_steps, dt_seconds)
+        if n_scen == 1:
+            hasil = {name: {key: value[0] for key, value in r.items()} for name, r in hasil.items()}
+        for r in hasil.values():
+            r["time_hours"] = np.arange(n_steps + 1) * dt_seconds / 3600
+        return hasil
+
+    def _run_levels(self, n_scen, n_steps, dt_seconds, pool=None):
+        shape = (n_scen, n_steps)
+        inflows = {name: np.broadcast_to(r.local_inflow, shape).astype(float)
+                   for name, r in self.reservoirs.items()}
+        hasil = {}
+        for level in self.levels:
+            if pool is not None and len(level) > 1:
+                futures = {name: pool.submit(self.reservoirs[name].route, inflows[name], dt_seconds)
+                           for name in level}
+                routed = {name: f.result() for name, f in futures.items()}
+            else:
+                routed = {name: self.reservoirs[name].route(inflows[name], dt_seconds) for name in level}
+            for name, r in routed.items():
+                hasil[name] = r
+                reservoir = self.reservoirs[name]
+                if reservoir.downstream is not None:
+                    inflows[reservoir.downstream] += lag_series(r["outflow"], reservoir.lag_hours * 3600 / dt_seconds)
+        return hasil
+
+
+def _run_cascade(reservoirs, n_scen, n_steps, dt_seconds):
+    """One scenario block of a sharded run (worker process)"""
+    return Cascade(reservoirs)._run_levels(n_scen, n_steps, dt_seconds)
+
+
+def load_config(config, directory="."):
+    """Cascade and (n_steps, dt_seconds) from a parsed JSON configuration"""
+    reservoirs = []
+    for item in config["waduk"]:
+        name = item["nama"]
+        common = dict(local_inflow=item.get("inflow_lokal", 0.0), downstream=item.get("hilir"),
+                      lag_hours=item.get("lag_jam", 0.0))
+        if item.get("kurva", "djuanda") == "djuanda":
+            reservoirs.append(DjuandaReservoir(item["tma_awal"], item.get("turbin", 0.0), item.get("hcv_kiri", 0.0),
+                                               item.get("hcv_kanan", 0.0), name=name, **common))
+            continue
+        curve = StorageCurve(*read_curve_csv(os.path.join(directory, item["kurva"])))
+        release = item.get("pelepasan", 0.0)
+        if isinstance(release, dict):
+            release = LevelRule(release["target"], release.get("min", 0.0), release.get("maks", np.inf),
+                                release.get("horizon_langkah", 24))
+        spillway = item.get("spillway")
+        if spillway is not None:
+            spillway = WeirSpillway(spillway["mercu"], spillway["koefisien"], spillway["lebar"])
+        reservoirs.append(Reservoir(name, curve, item["tma_awal"], release, spillway, **common))
+    return Cascade(reservoirs), int(config["langkah"]), float(config.get("dt_jam", 1)) * 3600
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulasi TMA kaskade waduk dari hulu ke hilir")
+    parser.add_argument("config", help="file JSON konfigurasi kaskade")
+    parser.add_argument("output", help="file CSV hasil (TMA dan debit keluar per waduk)")
+    parser.add_argument("--workers", type=int, help="jumlah proses (default: jumlah CPU)")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+        cascade, n_steps, dt_seconds = load_config(config, os.path.dirname(os.path.abspath(args.config)))
+        if cascade.n_scenarios() != 1:
+            raise ValueError("CLI hanya mendukung satu skenario")
+        hasil = cascade.run(n_steps, dt_seconds, args.workers)
+    except KeyError as e:
+        print(f"Error: field {e} tidak ada di konfigurasi", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    names = [name for level in cascade.levels for name in level]
+    columns = {"jam": hasil[names[0]]["time_hours"][1:]}
+    for name in names:
+        columns[f"{name}_tma"] = hasil[name]["tma"][1:]
+        columns[f"{name}_inflow"] = hasil[name]["inflow"]
+        columns[f"{name}_outflow"] = hasil[name]["outflow"]
+    np.savetxt(args.output, np.column_stack(list(columns.values())), delimiter=",", fmt="%.3f",
+               header=",".join(columns), comments="")
+    print(f"{n_steps} langkah x {len(names)} waduk -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Konsumsi air spesifik (m³/MWh) per unit dan seluruh pembangkit.
+
+Konsumsi air spesifik adalah volume air turbin per energi yang dihasilkan:
+3600 x debit (m³/det) / beban (MW). Per unit dihitung dari debit L6-L11
+masing-masing unit, untuk pembangkit dari total debit turbin dibagi total
+beban. Makin kecil angkanya makin efisien unit bekerja pada tinggi jatuh
+itu.
+
+Untuk analisis efisiensi riwayat, log pembacaan (CSV) diproses per chunk
+dengan rumus turbin yang tervektorisasi (debit_engine.calculate_turbine_debit)
+dan kolom konsumsi ditambahkan di belakang setiap baris.
+
+Contoh:
+    python consumption.py log_2023.csv konsumsi_2023.csv
+    python consumption.py log.csv konsumsi.csv --delimiter ";"
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from debit_engine import N_UNITS, calculate_turbine_debit
+from recompute_debit import iter_chunks, parse_numeric
+
+INPUT_COLUMNS = ["tma", "trc"] + [f"beban_{i + 1}" for i in range(N_UNITS)]
+OUTPUT_COLUMNS = [f"konsumsi_unit_{i + 1}" for i in range(N_UNITS)] + ["konsumsi_total"]
+
+
+def specific_consumption(debit, beban):
+    """Konsumsi air spesifik (m³/MWh) from unit discharges and loads
+
+    ``debit`` and ``beban`` shaped (N, 6) or (6,). Returns ``(per_unit,
+    plant)``: per unit 3600 x debit / beban (NaN for units without load)
+    and plant-wide total discharge over total load (NaN when nothing runs).
+    """
+    debit = np.asarray(debit, dtype=float)
+    beban = np.nan_to_num(np.asarray(beban, dtype=float), nan=0.0)
+    running = beban > 0
+    per_unit = np.full(beban.shape, np.nan)
+    np.divide(3600 * debit, beban, out=per_unit, where=running)
+    total_beban = beban.sum(axis=-1)
+    total_debit = np.where(running, debit, 0.0).sum(axis=-1)
+    plant = np.divide(3600 * total_debit, total_beban, out=np.full(np.shape(total_beban), np.nan),
+                      where=total_beban > 0)
+    return per_unit, plant
+
+
+def analyze(input_path, output_path, chunk_size=100_000, delimiter=","):
+    """Append per-unit and plant specific consumption columns to a reading log
+
+    Returns ``(rows, plant m³/MWh)``, the plant figure being the total
+    turbine discharge over the total load of the whole log.
+    """
+    n = 0
+    sum_debit = sum_beban = 0.0
+    with open(input_path, newline="", encoding="utf-8-sig") as f, \
+            open(output_path, "w", newline="", encoding="utf-8") as out:
+        header_line = f.readline()
+        header = next(csv.reader([header_line], delimiter=delimiter))
+        missing = [name for name in INPUT_COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"Kolom {missing} tidak ditemukan di {input_path}")
+        numeric = [header.index(name) for name in INPUT_COLUMNS]
+        out.write(header_line.rstrip("\r\n") + delimiter + delimiter.join(OUTPUT_COLUMNS) + "\n")
+        for lines in iter_chunks(f, chunk_size):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            values = np.nan_to_num(parse_numeric(lines, numeric, delimiter))
+            beban = values[:, 2:]
+            _, _, debit = calculate_turbine_debit(values[:, 0] - values[:, 1], beban)
+            per_unit, plant = specific_consumption(debit, beban)
+            sum_debit += float(np.where(beban > 0, debit, 0.0).sum())
+            sum_beban += float(beban.sum())
+            matrix = np.column_stack([per_unit, plant]).tolist()
+            out.writelines(line.rstrip("\r\n") + delimiter
+                           + delimiter.join("" if value != value else f"{value:.2f}" for value in row) + "\n"
+                           for line, row in zip(lines, matrix))
+            n += len(lines)
+    return n, 3600 * sum_debit / sum_beban if sum_beban > 0 else float("nan")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konsumsi air spesifik (m³/MWh) per unit dan pembangkit dari log pembacaan")
+    parser.add_argument("input", help="file CSV log pembacaan (kolom tma, trc, beban_1 ... beban_6)")
+    parser.add_argument("output", help="file CSV hasil (kolom asli + konsumsi per unit dan total)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="jumlah baris per chunk")
+    parser.add_argument("--delimiter", default=",")
+    args = parser.parse_args(argv)
+
+    try:
+        n, plant = analyze(args.input, args.output, args.chunk_size, args.delimiter)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{n:,} baris -> {args.output}, konsumsi air spesifik pembangkit {plant:,.1f} m³/MWh")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
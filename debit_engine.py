@@ -0,0 +1,214 @@
+"""Perhitungan debit Bendungan Ir. H. Djuanda tanpa Streamlit.
+
+Semua rumus yang sebelumnya ada di app_streamlit.py (R5, R6-R11, L6-L15)
+dikumpulkan di sini supaya bisa dipakai dari skrip lain dan dihitung
+sekaligus untuk banyak pembacaan (array NumPy).
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from rating_table import GridInterpolator, HcvRatingTable, LinearInterpolator
+from tables import store
+
+# Elevasi mercu spillway (mdpl)
+SPILLWAY_CREST = 106.9
+# Batas beban rendah, di bawah ini debit turbin diinput manual
+LOW_BEBAN_LIMIT = 15
+N_UNITS = 6
+# Koefisien polinom efisiensi turbin (rumus L6-L11, persen), pangkat 0..4 dari R
+EFFICIENCY_COEFFS = (-4.532068452, 0.31155337, -0.006520552181, 0.0000597737436, -0.0000002019124)
+
+# Tabel rating HCV dan lengkung EL (mdpl) - CAP (juta m³) - AREA (km²) dibaca
+# dari file .npy berversi di tables/ (lihat tables.py), bukan lagi literal di sini.
+
+
+def current_tables(tanggal=None):
+    """Table version valid on ``tanggal`` (latest when None), reloaded if the files changed"""
+    return store.get(tanggal)
+
+
+@lru_cache(maxsize=None)
+def setup_hjv_interpolator(use_scipy=False, tables=None):
+    """RegularGridInterpolator-style interpolator on the HCV table
+
+    NumPy-only by default; ``use_scipy`` builds scipy's own object (scipy
+    is imported only then), e.g. to compare results.
+    """
+    tables = tables or current_tables()
+    points = (tables.hcv_levels, tables.hcv_openings)
+    if use_scipy:
+        from scipy.interpolate import RegularGridInterpolator
+        return RegularGridInterpolator(points, np.asarray(tables.hcv_debit))
+    return GridInterpolator(points, tables.hcv_debit)
+
+@lru_cache(maxsize=None)
+def setup_hjv_rating_table(out_of_range="zero", tables=None):
+    tables = tables or current_tables()
+    if out_of_range == tables.rating.out_of_range:
+        return tables.rating
+    return HcvRatingTable(tables.hcv_levels, tables.hcv_openings, tables.hcv_debit, out_of_range=out_of_range)
+
+@lru_cache(maxsize=None)
+def setup_el_interpolators(use_scipy=False, tables=None):
+    """el -> cap, cap -> el and el -> area, linear with extrapolation
+
+    NumPy-only by default (same numbers as interp1d); ``use_scipy`` builds
+    scipy's interp1d objects instead.
+    """
+    tables = tables or current_tables()
+    el, cap, area = tables.el, tables.cap, tables.area
+    pairs = ((el, cap), (cap, el), (el, area))
+    if use_scipy:
+        from scipy.interpolate import interp1d
+        return tuple(interp1d(x, y, kind='linear', fill_value="extrapolate") for x, y in pairs)
+    return tuple(LinearInterpolator(x, y) for x, y in pairs)
+
+@lru_cache(maxsize=None)
+def setup_storage_curve(tables=None):
+    return (tables or current_tables()).curve
+
+
+@store.on_reload
+def _clear_setup_caches():
+    # tabel berubah di disk: interpolator lama tidak boleh dipakai lagi
+    for setup in (setup_hjv_interpolator, setup_hjv_rating_table, setup_el_interpolators, setup_storage_curve):
+        setup.cache_clear()
+
+
+# Nama lama tetap bisa dipakai (debit_engine.storage_curve dst.), selalu versi terbaru
+_CURRENT = {
+    "hcv_rating_table": lambda: current_tables().rating,
+    "storage_curve": lambda: current_tables().curve,
+    "el_to_cap_interpolator": lambda: setup_el_interpolators()[0],
+    "cap_to_el_interpolator": lambda: setup_el_interpolators()[1],
+    "el_to_area_interpolator": lambda: setup_el_interpolators()[2],
+}
+
+
+def __getattr__(name):
+    if name in _CURRENT:
+        return _CURRENT[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def calculate_hjv_debit(opening_percent, res_level, out_of_range=None, tables=None):
+    """Calculate HJV debit based on opening percentage and reservoir level
+
+    Out of range or empty inputs give 0.0 unless another ``out_of_range``
+    policy is given (see HcvRatingTable). ``tables`` selects a table
+    version (default: the latest).
+    """
+    rating = (tables or current_tables()).rating
+    return float(rating.lookup(opening_percent, res_level, out_of_range))
+
+
+def _as_float_array(values):
+    """Convert scalars/lists (None allowed) to a float array with NaN for missing values"""
+    return np.asarray(values, dtype=float)
+
+
+def calculate_hjv_debit_array(opening_percent, res_level, out_of_range=None, tables=None):
+    """Vectorized calculate_hjv_debit, always returns a float array"""
+    opening = _as_float_array(opening_percent)
+    level = _as_float_array(res_level)
+    rating = (tables or current_tables()).rating
+    return np.asarray(rating.lookup(opening, level, out_of_range), dtype=float)
+
+
+def calculate_head(tma, trc):
+    """Tinggi jatuh (head), missing TMA/tailrace counted as 0 like the form"""
+    tma = np.nan_to_num(_as_float_array(tma), nan=0.0)
+    trc = np.nan_to_num(_as_float_array(trc), nan=0.0)
+    return tma - trc
+
+
+def turbine_efficiency(R):
+    """Efficiency polynomial of rumus L6-L11 (percent) at R
+
+    Horner form in one array: no R**3/R**4 and no temporary per term.
+    """
+    efficiency = _as_float_array(R) * EFFICIENCY_COEFFS[4]
+    for coeff in EFFICIENCY_COEFFS[3:0:-1]:
+        efficiency += coeff
+        efficiency *= R
+    efficiency += EFFICIENCY_COEFFS[0]
+    return efficiency
+
+
+def calculate_turbine_debit(tinggi_jatuh, beban):
+    """Rumus R5, R6-R11 dan L6-L11 for every unit at once
+
+    ``tinggi_jatuh`` has shape (N,) (or scalar) and ``beban`` shape (N, 6)
+    (or (6,)). Returns ``(R5, R, L)`` with R and L shaped like ``beban``.
+    """
+    tinggi_jatuh = _as_float_array(tinggi_jatuh)
+    beban = np.nan_to_num(_as_float_array(beban), nan=0.0)
+    h = tinggi_jatuh[..., np.newaxis]
+
+    # Rumus R5
+    R5 = -0.32675 + 3.5945*tinggi_jatuh - 0.0463189*tinggi_jatuh**2 + 0.0001975*tinggi_jatuh**3
+
+    # Rumus R6-R11
+    denominator = -30857 + 1292.71*h - 8.9741*h**2 + 0.03682*h**3
+    denominator = np.broadcast_to(denominator, beban.shape)
+    R = np.zeros(beban.shape)
+    np.divide(beban*100*1000, denominator, out=R, where=denominator != 0)
+
+    # Rumus L6-L11
+    denominator = turbine_efficiency(R)
+    denominator *= 9.8 * h * R5[..., np.newaxis] / 100
+    L = np.zeros(beban.shape)
+    np.divide(beban, denominator, out=L, where=denominator != 0)
+    L *= 1000
+
+    return R5, R, L
+
+
+def calculate_spillway_debit(tma):
+    """Rumus L13, debit limpasan di atas mercu spillway"""
+    tma = _as_float_array(tma)
+    # NaN (TMA kosong) juga menghasilkan 0 karena perbandingan selalu False
+    above = tma > SPILLWAY_CREST
+    h = np.where(above, tma - SPILLWAY_CREST, 0.0)
+    return np.where(above, 231.2*(h**1.5) + 15.8*(h**2.5), 0.0)
+
+
+def calculate_debit(tma, trc, hjv_kiri, hjv_kanan, beban, tables=None):
+    """Hitung semua debit antara dan total dalam satu kali jalan
+
+    Inputs can be scalars or arrays of N readings, ``beban`` is (N, 6).
+    Missing values (None/NaN) are treated the same way as empty form fields.
+    Returns a dict of arrays keyed like the spreadsheet cells (R5, R, L,
+    L12-L15) plus the HCV and head intermediates. ``tables`` selects the
+    HCV table version (see current_tables).
+    """
+    tma = _as_float_array(tma)
+    tinggi_jatuh = calculate_head(tma, trc)
+    beban = np.nan_to_num(_as_float_array(beban), nan=0.0)
+
+    R5, R, L = calculate_turbine_debit(tinggi_jatuh, beban)
+
+    tables = tables or current_tables()
+    debit_hjv_kiri = calculate_hjv_debit_array(hjv_kiri, tma, tables=tables)
+    debit_hjv_kanan = calculate_hjv_debit_array(hjv_kanan, tma, tables=tables)
+
+    L12 = L.sum(axis=-1)
+    L13 = calculate_spillway_debit(tma)
+    L14 = debit_hjv_kiri + debit_hjv_kanan
+    L15 = L12 + L13 + L14
+
+    return {
+        "tinggi_jatuh": tinggi_jatuh,
+        "R5": R5,
+        "R": R,
+        "L": L,
+        "total_beban": beban.sum(axis=-1),
+        "has_low_beban": ((beban < LOW_BEBAN_LIMIT) & (beban > 0)).any(axis=-1),
+        "debit_hjv_kiri": debit_hjv_kiri,
+        "debit_hjv_kanan": debit_hjv_kanan,
+        "L12": L12,
+        "L13": L13,
+        "L14": L14,
+        "L15": L15,
+    }
@@ -0,0 +1,129 @@
+"""Pembagian beban optimal antar unit I-VI (debit turbin paling kecil).
+
+Debit per unit (rumus L6-L11) tergantung beban dan tinggi jatuh lewat
+polinom efisiensi, jadi total debit untuk total MW yang sama berbeda-beda
+tergantung pembagiannya. Di sini beban per unit didiskretkan (default
+0,1 MW), tabel debit per tinggi jatuh dihitung sekali lalu disimpan, dan
+pembagian terbaik dicari dengan dynamic programming (min-plus) antar unit.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from debit_engine import LOW_BEBAN_LIMIT, N_UNITS, calculate_turbine_debit
+from solver import R_MAX, R_MIN
+
+# Kapasitas terpasang per unit (MW)
+UNIT_RATED_LOAD = 31.25
+DEFAULT_STEP = 0.1
+
+
+def load_limits(tinggi_jatuh, min_load=None, max_load=UNIT_RATED_LOAD):
+    """Allowed (min, max) load per running unit at this head
+
+    The formula is only meaningful on the branch where discharge rises
+    with load (see solver.R_MIN/R_MAX), so the limits are narrowed to it.
+    ``min_load``/``max_load`` narrow them further.
+    """
+    denominator = -30857 + 1292.71*tinggi_jatuh - 8.9741*tinggi_jatuh**2 + 0.03682*tinggi_jatuh**3
+    lo = R_MIN * denominator / 100_000
+    hi = R_MAX * (1 - 1e-9) * denominator / 100_000
+    if min_load is not None:
+        lo = max(lo, min_load)
+    if max_load is not None:
+        hi = min(hi, max_load)
+    return lo, hi
+
+
+@lru_cache(maxsize=256)
+def discharge_table(tinggi_jatuh, step=DEFAULT_STEP, min_load=LOW_BEBAN_LIMIT, max_load=UNIT_RATED_LOAD):
+    """Debit of one unit at every load grid point ``g * step`` for this head
+
+    Index 0 is the unit switched off (0 MW, 0 m³/det); loads outside the
+    allowed band are +inf. Cached per (head, step, limits).
+    """
+    lo, hi = load_limits(tinggi_jatuh, min_load, max_load)
+    n = int(np.floor(hi / step + 1e-9)) + 1
+    loads = np.arange(n) * step
+    _, _, L = calculate_turbine_debit(np.full(n, tinggi_jatuh), loads[:, np.newaxis])
+    q = L[:, 0]
+    q[(loads < lo - 1e-9) | (loads > hi + 1e-9)] = np.inf
+    q[0] = 0.0
+    q.setflags(write=False)
+    return q
+
+
+def optimize_dispatch(tinggi_jatuh, total_beban, available=None, step=DEFAULT_STEP,
+                      min_load=LOW_BEBAN_LIMIT, max_load=UNIT_RATED_LOAD):
+    """Pembagian beban dengan debit turbin total paling kecil
+
+    ``available`` is a sequence of six booleans (default: all units).
+    Running units carry at least ``min_load`` (default LOW_BEBAN_LIMIT,
+    below it the formula is not valid). The demand is rounded to the load
+    grid. Returns a dict with the load
+    per unit (MW, 0 for units that are off or unavailable), the discharge
+    per unit and the total; loads are NaN when the demand cannot be met.
+    """
+    available = [True] * N_UNITS if available is None else list(available)
+    units = [i for i in range(N_UNITS) if available[i]]
+    head = round(float(tinggi_jatuh), 2)
+    q = discharge_table(head, step, min_load, max_load)
+    target = int(round(total_beban / step))
+
+    loads = np.zeros(N_UNITS)
+    if target == 0:
+        return {"beban": loads, "debit": np.zeros(N_UNITS), "debit_total": 0.0}
+    if not units or target > len(units) * (len(q) - 1):
+        loads[:] = np.nan
+        return {"beban": loads, "debit": np.full(N_UNITS, np.nan), "debit_total": np.nan}
+
+    # cost[x] = debit minimum untuk x langkah beban pada unit yang sudah diproses
+    finite = np.flatnonzero(np.isfinite(q))
+    cost = np.full(target + 1, np.inf)
+    cost[:min(len(q), target + 1)] = q[:target + 1]
+    choices = []
+    for _ in units[1:]:
+        new_cost = np.full(target + 1, np.inf)
+        choice = np.zeros(target + 1, dtype=np.intp)
+        for g in finite:
+            if g > target:
+                break
+            candidate = cost[:target + 1 - g] + q[g]
+            better = candidate < new_cost[g:]
+            new_cost[g:][better] = candidate[better]
+            choice[g:][better] = g
+        choices.append(choice)
+        cost = new_cost
+
+    if not np.isfinite(cost[target]):
+        loads[:] = np.nan
+        return {"beban": loads, "debit": np.full(N_UNITS, np.nan), "debit_total": np.nan}
+
+    # telusuri balik pilihan tiap unit
+    remaining = target
+    for unit, choice in zip(reversed(units[1:]), reversed(choices)):
+        g = choice[remaining]
+        loads[unit] = g * step
+        remaining -= g
+    loads[units[0]] = remaining * step
+
+    _, _, L = calculate_turbine_debit(head, loads)
+    return {"beban": loads, "debit": L, "debit_total": float(L.sum())}
+
+
+def optimize_dispatch_series(tinggi_jatuh, total_beban, available=None, step=DEFAULT_STEP,
+                             min_load=LOW_BEBAN_LIMIT, max_load=UNIT_RATED_LOAD):
+    """optimize_dispatch for a series of (head, demand), e.g. a day of hourly demands
+
+    Returns loads (N, 6), discharge per unit (N, 6) and total discharge (N,).
+    Heads are rounded to 1 cm so the discharge tables are shared.
+    """
+    heads = np.broadcast_to(np.asarray(tinggi_jatuh, dtype=float), np.shape(total_beban))
+    demands = np.asarray(total_beban, dtype=float)
+    loads = np.empty(demands.shape + (N_UNITS,))
+    debit = np.empty(demands.shape + (N_UNITS,))
+    for idx in np.ndindex(demands.shape):
+        hasil = optimize_dispatch(heads[idx], demands[idx], available, step, min_load, max_load)
+        loads[idx] = hasil["beban"]
+        debit[idx] = hasil["debit"]
+    return {"beban": loads, "debit": debit, "debit_total": debit.sum(axis=-1)}
@@ -0,0 +1,154 @@
+"""Simulasi ensemble (Monte Carlo) TMA untuk AM Total yang tidak pasti.
+
+AM Total, AK Turbin dan TMA awal diganggu secara acak menurut distribusi
+yang dipilih pengguna, lalu semua skenario dihitung sekaligus dengan
+routing.route_reservoir. Ensemble besar dibagi ke beberapa proses.
+
+Distribusi ditulis sebagai tuple ``(jenis, parameter)``:
+
+- ``("normal", sd)``: ditambah N(0, sd), satuan sama dengan nilainya
+- ``("normal_pct", sd_persen)``: dikali 1 + N(0, sd_persen / 100)
+- ``("uniform", lebar)``: ditambah U(-lebar, +lebar)
+- ``("lognormal", sigma)``: dikali faktor lognormal dengan median 1
+- ``None``: tidak diganggu
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from debit_engine import SPILLWAY_CREST
+from routing import route_reservoir
+
+DISTRIBUTIONS = ("normal", "normal_pct", "uniform", "lognormal")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Di bawah jumlah ini overhead membuat proses lebih mahal daripada hitungannya
+PARALLEL_MIN_SCENARIOS = 2000
+
+# Pool proses per jumlah worker, dipakai ulang oleh semua panggilan di proses ini
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def perturb(rng, base, spec, shape):
+    """Apply one perturbation spec to ``base``
+
+    ``shape`` is the shape of the random draw and must broadcast against
+    ``base``, e.g. (S, 1) for one persistent error per scenario on a (T,)
+    series or (S, T) for an independent error at every step.
+    """
+    base = np.asarray(base, dtype=float)
+    if spec is None:
+        return base
+    kind, scale = spec
+    if kind == "normal":
+        return base + rng.normal(0.0, scale, shape)
+    if kind == "normal_pct":
+        return base * (1 + rng.normal(0.0, scale / 100, shape))
+    if kind == "uniform":
+        return base + rng.uniform(-scale, scale, shape)
+    if kind == "lognormal":
+        return base * rng.lognormal(0.0, scale, shape)
+    raise ValueError(f"distribusi tidak dikenal: {kind!r}, pilih dari {DISTRIBUTIONS}")
+
+
+def _run_shard(seed, n_scenarios, tma_awal, inflow, dt_seconds, turbine, hcv_kiri, hcv_kanan,
+               inflow_dist, turbine_dist, tma_dist, per_step):
+    """Sample and route one block of scenarios (runs in a worker process)"""
+    rng = np.random.default_rng(seed)
+    draw_shape = (n_scenarios, len(inflow)) if per_step else (n_scenarios, 1)
+
+    inflow_s = np.maximum(perturb(rng, inflow, inflow_dist, draw_shape), 0.0)
+    turbine_s = np.maximum(perturb(rng, turbine, turbine_dist, draw_shape), 0.0)
+    tma_s = np.broadcast_to(perturb(rng, tma_awal, tma_dist, (n_scenarios,)), (n_scenarios,))
+
+    hasil = route_reservoir(tma_s, inflow_s, dt_seconds, turbine=turbine_s,
+                            hcv_kiri=hcv_kiri, hcv_kanan=hcv_kanan)
+    return hasil["tma"]
+
+
+def _get_pool(n_workers):
+    """Process-wide pool of ``n_workers`` processes, started on first use
+
+    Workers start lazily and stay alive between ensembles, so only the
+    first parallel run pays the process start-up.
+    """
+    with _pools_lock:
+        pool = _pools.get(n_workers)
+        if pool is None:
+            pool = _pools[n_workers] = ProcessPoolExecutor(max_workers=n_workers)
+    return pool
+
+
+def _discard_pool(pool):
+    """Forget a broken pool so the next ensemble starts a new one"""
+    with _pools_lock:
+        for key, value in list(_pools.items()):
+            if value is pool:
+                del _pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_ensemble(tma_awal, inflow, dt_seconds=3600, turbine=0.0, hcv_kiri=0.0, hcv_kanan=0.0,
+                 n_scenarios=1000, inflow_dist=("normal_pct", 10), turbine_dist=None, tma_dist=None,
+                 per_step=False, percentiles=DEFAULT_PERCENTILES, seed=None, n_workers=None,
+                 shard_size=2500, rules=None):
+    """Run a Monte Carlo ensemble of TMA trajectories
+
+    ``inflow`` is the forecast AM Total series (T,) in m³/det and
+    ``turbine`` a scalar or (T,) AK Turbin schedule. With ``per_step``
+    False each scenario gets one persistent error for the whole horizon,
+    otherwise every step is perturbed independently. Ensembles of at least
+    PARALLEL_MIN_SCENARIOS are split into shards of ``shard_size`` and
+    evaluated in a process pool of ``n_workers`` (default: CPU count),
+    shared by every call in this process.
+
+    Returns percentile bands of TMA per step, percentiles of the final TMA
+    and the probability of exceeding the spillway crest. With ``rules``
+    (alerts.RuleSet) the TMA rules are checked on every scenario and
+    ``peringatan`` lists the triggered ones with their share of scenarios.
+    """
+    if n_scenarios < 1:
+        raise ValueError(f"jumlah skenario minimal 1, dapat: {n_scenarios}")
+    inflow = np.atleast_1d(np.asarray(inflow, dtype=float))
+    turbine = np.broadcast_to(np.asarray(turbine, dtype=float), inflow.shape)
+    for spec in (inflow_dist, turbine_dist, tma_dist):
+        if spec is not None and spec[0] not in DISTRIBUTIONS:
+            raise ValueError(f"distribusi tidak dikenal: {spec[0]!r}, pilih dari {DISTRIBUTIONS}")
+
+    n_workers = n_workers or os.cpu_count() or 1
+    sizes = [shard_size] * (n_scenarios // shard_size)
+    if n_scenarios % shard_size:
+        sizes.append(n_scenarios % shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (tma_awal, inflow, dt_seconds, turbine, hcv_kiri, hcv_kanan,
+            inflow_dist, turbine_dist, tma_dist, per_step)
+
+    if n_workers > 1 and n_scenarios >= PARALLEL_MIN_SCENARIOS and len(sizes) > 1:
+        pool = _get_pool(n_workers)
+        try:
+            futures = [pool.submit(_run_shard, s, n, *args) for s, n in zip(seeds, sizes)]
+            tma = np.concatenate([f.result() for f in futures])
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+    else:
+        tma = np.concatenate([_run_shard(s, n, *args) for s, n in zip(seeds, sizes)])
+
+    tma_akhir = tma[:, -1]
+    time_hours = np.arange(inflow.size + 1) * dt_seconds / 3600
+    hasil = {
+        "time_hours": time_hours,
+        "percentiles": {p: band for p, band in zip(percentiles, np.percentile(tma, percentiles, axis=0))},
+        "tma_akhir": dict(zip(percentiles, np.percentile(tma_akhir, percentiles).tolist())),
+        "tma_akhir_mean": float(tma_akhir.mean()),
+        # peluang TMA melewati mercu spillway kapan saja selama horizon, dan di akhir horizon
+        "p_exceed_crest": float((tma.max(axis=1) > SPILLWAY_CREST).mean()),
+        "p_exceed_crest_akhir": float((tma_akhir > SPILLWAY_CREST).mean()),
+        "n_scenarios": n_scenarios,
+    }
+    if rules is not None:
+        hasil["peringatan"] = rules.summarize(rules.check_trajectories(tma, time_hours))
+    return hasil
@@ -0,0 +1,141 @@
+"""Graf dependensi perhitungan debit sesaat dengan node yang di-memo.
+
+Setiap node hanya bergantung pada node/input tertentu: tinggi jatuh pada
+TMA dan tailrace, debit unit i pada tinggi jatuh dan beban unit i, L13
+pada TMA, L14 pada bukaan HCV dan TMA. Saat input berubah hanya node di
+hilirnya yang dihitung ulang; node yang hasilnya tidak berubah juga tidak
+memicu hitung ulang node di bawahnya.
+"""
+import math
+
+from debit_engine import (
+    LOW_BEBAN_LIMIT,
+    N_UNITS,
+    calculate_head,
+    calculate_hjv_debit,
+    calculate_spillway_debit,
+    calculate_turbine_debit,
+    current_tables,
+)
+
+
+def _same(a, b):
+    """Equality that also treats NaN == NaN (floats, tuples of floats)"""
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+class CalcGraph:
+    """Named inputs and calculation nodes, evaluated lazily and memoized
+
+    Every input and node carries a version that is bumped only when its
+    value actually changes. A node is re-evaluated when the version of
+    one of its dependencies differs from the one it last saw.
+    """
+
+    def __init__(self):
+        self._funcs = {}
+        self._deps = {}
+        self._values = {}
+        self._versions = {}
+        self._seen = {}
+        # node yang dihitung ulang sejak reset_log() terakhir
+        self.recomputed = []
+
+    def add_input(self, name, value=None):
+        self._values[name] = value
+        self._versions[name] = 0
+
+    def add_node(self, name, func, deps):
+        """Register ``func(*values of deps)`` as node ``name``"""
+        missing = [d for d in deps if d not in self._versions and d not in self._funcs]
+        if missing:
+            raise ValueError(f"node {name!r}: dependensi belum terdaftar: {missing}")
+        self._funcs[name] = func
+        self._deps[name] = tuple(deps)
+        self._versions[name] = -1
+
+    def set(self, **values):
+        """Update inputs; unchanged values leave the graph untouched"""
+        for name, value in values.items():
+            if name not in self._versions or name in self._funcs:
+                raise KeyError(f"input tidak dikenal: {name!r}")
+            if not _same(self._values[name], value):
+                self._values[name] = value
+                self._versions[name] += 1
+
+    def get(self, name):
+        if name in self._funcs:
+            self._refresh(name)
+        return self._values[name]
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def _refresh(self, name):
+        deps = self._deps[name]
+        for dep in deps:
+            if dep in self._funcs:
+                self._refresh(dep)
+        seen = tuple(self._versions[dep] for dep in deps)
+        if self._seen.get(name) == seen:
+            return
+        value = self._funcs[name](*(self._values[dep] for dep in deps))
+        self.recomputed.append(name)
+        self._seen[name] = seen
+        if self._versions[name] < 0 or not _same(self._values[name], value):
+            self._values[name] = value
+            self._versions[name] += 1
+
+    def reset_log(self):
+        self.recomputed = []
+
+
+def _unit_debit(tinggi_jatuh, beban):
+    """(R, L) of one unit, rumus R6-R11 and L6-L11"""
+    _, R, L = calculate_turbine_debit(tinggi_jatuh, [beban or 0.0])
+    return float(R[0]), float(L[0])
+
+
+def _hjv_debit(opening, tma, tabel):
+    return calculate_hjv_debit(opening, tma, tables=tabel)
+
+
+def debit_graph():
+    """Graph of the instantaneous discharge form (tab Input Data)
+
+    Inputs: tma, trc, hjv_kiri, hjv_kanan, beban_1 .. beban_6 (None for
+    empty fields) and ``tabel``, the table version (tables.TableSet) used
+    for the HCV discharge; setting a reloaded version recomputes L14.
+    Nodes are keyed like the spreadsheet cells: R5, unit_i = (R, L) per
+    unit, L12-L15, plus the intermediates.
+    """
+    graph = CalcGraph()
+    graph.add_input("tabel", current_tables())
+    for name in ("tma", "trc", "hjv_kiri", "hjv_kanan"):
+        graph.add_input(name)
+    beban = [f"beban_{i + 1}" for i in range(N_UNITS)]
+    for name in beban:
+        graph.add_input(name)
+
+    graph.add_node("tinggi_jatuh", lambda tma, trc: float(calculate_head(tma, trc)), ["tma", "trc"])
+    graph.add_node("R5", lambda h: float(calculate_turbine_debit(h, [0.0])[0]), ["tinggi_jatuh"])
+    units = []
+    for i, name in enumerate(beban):
+        graph.add_node(f"unit_{i + 1}", _unit_debit, ["tinggi_jatuh", name])
+        units.append(f"unit_{i + 1}")
+
+    graph.add_node("total_beban", lambda *b: sum(x or 0.0 for x in b), beban)
+    graph.add_node("has_low_beban",
+                   lambda *b: any(0 < (x or 0.0) < LOW_BEBAN_LIMIT for x in b), beban)
+    graph.add_node("debit_hjv_kiri", _hjv_debit, ["hjv_kiri", "tma", "tabel"])
+    graph.add_node("debit_hjv_kanan", _hjv_debit, ["hjv_kanan", "tma", "tabel"])
+
+    graph.add_node("L12", lambda *u: sum(L for _, L in u), units)
+    graph.add_node("L13", lambda tma: float(calculate_spillway_debit(tma)), ["tma"])
+    graph.add_node("L14", lambda kiri, kanan: kiri + kanan, ["debit_hjv_kiri", "debit_hjv_kanan"])
+    graph.add_node("L15", lambda l12, l13, l14: l12 + l13 + l14, ["L12", "L13", "L14"])
+    return graph
@@ -0,0 +1,233 @@
+"""Perkiraan AM Total (inflow) dari riwayat TMA dan debit keluar.
+
+Neraca air dibalik: antara dua pembacaan berurutan
+
+    inflow = ΔS / Δt + debit keluar rata-rata
+
+dengan ΔS dari lengkung elevasi-kapasitas (el_to_cap, sama dengan
+``el_to_cap_interpolator``) dan debit keluar rata-rata trapesium dari
+debit total (turbin + limpasan + HCV). Pada resolusi menit, perubahan TMA
+1 cm saja setara ribuan m³/det, jadi hasil dihaluskan dengan jendela
+``jendela`` selang terakhir: volume masuk dijumlah lalu dibagi total
+waktunya. Karena ΔS berurutan saling menghapus, ini sama dengan neraca air
+dari awal ke akhir jendela, tanpa bias dan tanpa membaca ulang data.
+
+InflowEstimator memproses riwayat per potongan (chunk) dan menyimpan
+sisa jendela di antara potongan, sehingga arsip bertahun-tahun bisa
+diproses dan ditulis bertahap dengan memori tetap.
+
+Dengan waktu ISO, debit keluar dan lengkung kapasitas memakai versi tabel
+(tables.py) yang berlaku pada tanggal tiap pembacaan, seperti
+recompute_debit; --tanggal memaksa satu versi untuk seluruh file.
+
+Contoh:
+    python inflow.py log_2023.csv inflow_2023.csv --kolom-waktu waktu
+    python inflow.py log.csv inflow.csv --kolom-waktu waktu --jendela 180 --kolom-debit debit_total
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from debit_engine import current_tables
+from recompute_debit import INPUT_COLUMNS, compute_chunk, compute_chunk_by_date, iter_chunks, parse_dates, \
+    parse_numeric
+from tables import store
+
+# Jumlah selang (pembacaan) default untuk penghalusan, 60 = 1 jam pada data per menit
+DEFAULT_WINDOW = 60
+OUTPUT_COLUMNS = ["waktu", "inflow", "inflow_sesaat", "debit_keluar", "delta_s"]
+
+
+class InflowEstimator:
+    """Streaming inverse water balance with a trailing volume window
+
+    Feed consecutive chunks to ``update``; each call returns the estimate
+    for every new reading (the first reading of the stream only starts
+    it). Rows with a missing time, TMA or outflow, and rows not later
+    than the reading before them, are skipped and counted in ``dilewati``.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, curve=None):
+        if window < 1:
+            raise ValueError("jendela penghalusan minimal 1 selang")
+        self.window = int(window)
+        self.curve = curve or current_tables().curve
+        self.n = 0
+        self.dilewati = 0
+        # pembacaan terakhir (waktu, kapasitas juta m³, debit keluar)
+        self._last = None
+        # jumlah kumulatif volume masuk (m³) dan waktu (s) di akhir jendela sebelumnya
+        self._cum_volume = np.zeros(1)
+        self._cum_time = np.zeros(1)
+
+    def update(self, waktu, tma, outflow):
+        """Estimate inflow for one chunk of readings (time-ordered)
+
+        ``waktu`` in seconds (epoch or any common origin), ``tma`` in mdpl,
+        ``outflow`` the total discharge in m³/det. Returns a dict of arrays:
+        ``waktu`` (time of the reading), ``inflow`` (smoothed over the last
+        ``window`` intervals), ``inflow_sesaat`` (last interval only),
+        ``debit_keluar`` and ``delta_s`` (m³ since the previous reading).
+        """
+        waktu = np.asarray(waktu, dtype=float)
+        tma = np.asarray(tma, dtype=float)
+        outflow = np.asarray(outflow, dtype=float)
+        # inf juga dibuang: waktu tak hingga membuat semua pembacaan berikutnya dianggap mundur
+        valid = np.isfinite(waktu) & np.isfinite(tma) & np.isfinite(outflow)
+        # waktu harus naik: buang duplikat dan baris yang mundur
+        previous = np.maximum.accumulate(np.concatenate(([-np.inf if self._last is None else self._last[0]],
+                                                         np.where(valid, waktu, -np.inf))))[:-1]
+        valid &= waktu > previous
+        if not valid.all():
+            self.dilewati += int((~valid).sum())
+            waktu, tma, outflow = waktu[valid], tma[valid], outflow[valid]
+        capacity = self.curve.el_to_cap(tma)
+
+        if self._last is not None:
+            t0, s0, q0 = self._last
+            waktu_all = np.concatenate(([t0], waktu))
+            capacity_all = np.concatenate(([s0], capacity))
+            outflow_all = np.concatenate(([q0], outflow))
+        else:
+            waktu_all, capacity_all, outflow_all = waktu, capacity, outflow
+            waktu, outflow = waktu[1:], outflow[1:]
+        if len(waktu_all):
+            self._last = (waktu_all[-1], capacity_all[-1], outflow_all[-1])
+
+        dt = np.diff(waktu_all)
+        delta_s = np.diff(capacity_all) * 1_000_000
+        # volume masuk per selang = ΔS + volume keluar (trapesium)
+        volume = delta_s + 0.5 * (outflow_all[1:] + outflow_all[:-1]) * dt
+
+        cum_volume = np.concatenate((self._cum_volume, self._cum_volume[-1] + np.cumsum(volume)))
+        cum_time = np.concatenate((self._cum_time, self._cum_time[-1] + np.cumsum(dt)))
+        # indeks awal jendela untuk setiap selang baru, dibatasi pada riwayat yang tersimpan
+        n_new = len(dt)
+        end = np.arange(len(self._cum_volume), len(cum_volume))
+        start = np.maximum(end - self.window, 0)
+        inflow = (cum_volume[end] - cum_volume[start]) / (cum_time[end] - cum_time[start])
+
+        self.n += n_new
+        self._cum_volume = cum_volume[-(self.window + 1):]
+        self._cum_time = cum_time[-(self.window + 1):]
+        return {
+            "waktu": waktu,
+            "inflow": inflow,
+            "inflow_sesaat": volume / dt if n_new else np.empty(0),
+            "debit_keluar": outflow,
+            "delta_s": delta_s,
+        }
+
+
+def estimate_inflow(waktu, tma, outflow, window=DEFAULT_WINDOW, curve=None):
+    """InflowEstimator over a whole series at once (chunked updates agree up to rounding)"""
+    return InflowEstimator(window, curve).update(waktu, tma, outflow)
+
+
+def parse_times(texts):
+    """(seconds, is_iso) from numeric epoch strings or zone-less ISO datetimes"""
+    texts = np.char.strip(np.asarray(texts, dtype=str))
+    try:
+        return texts.astype(float), False
+    except ValueError:
+        pass
+    try:
+        return texts.astype("datetime64[s]").astype(float), True
+    except ValueError:
+        raise ValueError("kolom waktu harus berisi detik epoch atau tanggal-jam ISO (YYYY-MM-DD HH:MM:SS)")
+
+
+def _format_times(waktu, iso):
+    if iso:
+        return np.datetime_as_string(waktu.astype("datetime64[s]"), unit="s")
+    return [f"{w:.0f}" for w in waktu]
+
+
+def _version_runs(dates):
+    """(rows, tables) for each run of consecutive readings under the same table version"""
+    versions = store.versions()
+    index = store.version_index(dates)
+    bounds = np.flatnonzero(np.diff(index)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(index)]))
+    return [(slice(start, end), store.get(versions[index[start]])) for start, end in zip(starts, ends)]
+
+
+def reconstruct(input_path, output_path, time_column, window=DEFAULT_WINDOW, outflow_column=None,
+                chunk_size=100_000, delimiter=",", precision=3, tanggal=None):
+    """Stream a reading log to an inflow CSV, returns the number of rows written
+
+    The total outflow is computed from the form columns (like
+    recompute_debit) unless ``outflow_column`` names a column that already
+    holds it. ISO times use the table version valid on each reading's date
+    unless ``tanggal`` fixes one version for the whole file.
+    """
+    tables = current_tables(tanggal)
+    estimator = InflowEstimator(window, tables.curve)
+    total = 0
+    with open(input_path, newline="", encoding="utf-8-sig") as f, \
+            open(output_path, "w", newline="", encoding="utf-8") as out:
+        header = next(csv.reader([f.readline()], delimiter=delimiter))
+        needed = [time_column] + (["tma", outflow_column] if outflow_column else INPUT_COLUMNS)
+        missing = [name for name in needed if name not in header]
+        if missing:
+            raise ValueError(f"Kolom {missing} tidak ditemukan di {input_path}")
+        numeric = [header.index(name) for name in needed[1:]]
+        time_index = header.index(time_column)
+        out.write(delimiter.join(OUTPUT_COLUMNS) + "\n")
+        row_format = "%s" + delimiter + delimiter.join([f"%.{precision}f"] * (len(OUTPUT_COLUMNS) - 1)) + "\n"
+
+        for lines in iter_chunks(f, chunk_size):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            texts = parse_dates(lines, time_index, delimiter)
+            waktu, iso = parse_times(texts)
+            values = parse_numeric(lines, numeric, delimiter)
+            by_date = iso and tanggal is None
+            tma = values[:, 0]
+            if outflow_column:
+                outflow = values[:, 1]
+            elif by_date:
+                outflow = compute_chunk_by_date(values, texts)["debit_total"]
+            else:
+                outflow = compute_chunk(values, tables)["debit_total"]
+            # ΔS dengan lengkung kapasitas versi tabel yang berlaku pada tiap pembacaan
+            for rows, run_tables in _version_runs(texts) if by_date else [(slice(None), tables)]:
+                estimator.curve = run_tables.curve
+                hasil = estimator.update(waktu[rows], tma[rows], outflow[rows])
+                labels = _format_times(hasil["waktu"], iso)
+                matrix = np.column_stack([hasil[name] for name in OUTPUT_COLUMNS[1:]])
+                out.writelines(row_format % (label, *row) for label, row in zip(labels, matrix.tolist()))
+                total += len(labels)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perkirakan AM Total (inflow) dari riwayat TMA dan debit keluar")
+    parser.add_argument("input", help="file CSV log pembacaan (urut waktu)")
+    parser.add_argument("output", help="file CSV hasil")
+    parser.add_argument("--kolom-waktu", required=True, help="kolom waktu (detik epoch atau ISO)")
+    parser.add_argument("--jendela", type=int, default=DEFAULT_WINDOW,
+                        help="jumlah selang pembacaan untuk penghalusan (default 60)")
+    parser.add_argument("--kolom-debit", help="kolom debit keluar total bila sudah ada (tanpa hitung ulang)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="jumlah baris per chunk")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--precision", type=int, default=3, help="jumlah desimal output")
+    parser.add_argument("--tanggal", help="pakai versi tabel yang berlaku pada tanggal ini (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    try:
+        total = reconstruct(args.input, args.output, args.kolom_waktu, args.jendela, args.kolom_debit,
+                            args.chunk_size, args.delimiter, args.precision, args.tanggal)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{total} baris inflow -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,528 @@
+"""Pemantauan debit langsung dari umpan pembacaan (file yang di-tail atau socket).
+
+Umpan berisi satu pembacaan per baris CSV, pengganti sementara SCADA:
+
+    waktu,tma,trc,hjv_kiri,hjv_kanan,beban_1,...,beban_6
+
+``waktu`` berupa detik epoch atau ISO 8601 (tanpa zona = jam dinding WIB,
+seperti log SCADA dan report.py); kosong berarti waktu baris diterima. Sel kosong
+diperlakukan seperti isian kosong di form. Baris yang tidak bisa dibaca
+(misal header) dilewati dan dihitung sebagai ``ditolak``.
+
+Baris yang masuk dihitung per batch dengan compute_chunk (satu panggilan
+vektor), lalu setiap sampel memperbarui agregat secara inkremental dengan
+waktu dan memori tetap per sampel, tanpa membaca ulang data lama:
+
+- rata-rata bergulir 1 jam dan 24 jam (ember waktu 1 menit dan 5 menit)
+  sampai sampel terbaru, sehingga file lama yang diputar ulang tetap punya
+  rata-rata,
+- volume kumulatif yang dikeluarkan (m³, integrasi trapesium debit),
+- TMA minimum dan maksimum sejak umpan dimulai,
+- aturan peringatan (alerts.py) yang terpicu: jumlah, waktu terakhir dan
+  aturan yang aktif pada pembacaan terbaru.
+
+Contoh:
+    python live_feed.py file scada.csv
+    python live_feed.py socket --port 8503
+    python live_feed.py file scada.csv --dari-awal --interval 5
+"""
+import argparse
+import math
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from alerts import get_rules
+from debit_engine import current_tables
+from reading_store import to_epoch
+from recompute_debit import INPUT_COLUMNS, compute_chunk
+from report import WIB_OFFSET
+
+# Kolom yang dirata-rata dalam jendela bergulir
+AVERAGE_COLUMNS = ("tma", "debit_turbin", "debit_limpasan", "debit_hjv", "debit_total")
+# Kolom debit (m³/det) yang diintegrasikan menjadi volume (m³)
+VOLUME_COLUMNS = ("debit_turbin", "debit_limpasan", "debit_hjv", "debit_total")
+# (nama, panjang jendela, lebar ember) dalam detik
+WINDOWS = (("jam", 3600, 60), ("hari", 86400, 300))
+# Selang antar sampel lebih dari ini (detik) dianggap umpan terputus, tidak diintegrasikan
+MAX_GAP = 900
+# Selang tunggu (detik) saat umpan tidak mengirim baris baru
+POLL_INTERVAL = 0.05
+# Waktu pembacaan yang masuk akal relatif terhadap saat diterima (detik): boleh
+# mundur jauh (file lama diputar ulang; jendela bergulir mengikuti waktu sampel
+# terbaru, bukan jam dinding), maju hanya sebatas selisih jam
+MAX_AGE = 20 * 366 * 86400
+MAX_LEAD = 3600
+
+
+class RollingWindow:
+    """Means over the last ``span`` seconds, kept in fixed time buckets
+
+    Memory is ``span / bucket`` buckets whatever the sample rate. Adding a
+    sample costs O(1) amortized: running totals are updated in place and
+    a bucket is cleared once when time moves past it. The window covers
+    whole buckets, so its span is exact to one bucket width.
+    """
+
+    def __init__(self, span, bucket, n_fields):
+        self.bucket = bucket
+        self.n_buckets = int(math.ceil(span / bucket))
+        self.n_fields = n_fields
+        self._sums = [[0.0] * n_fields for _ in range(self.n_buckets)]
+        self._counts = [[0] * n_fields for _ in range(self.n_buckets)]
+        self._total = [0.0] * n_fields
+        self._count = [0] * n_fields
+        self._head = None
+
+    def _advance(self, index):
+        """Move the newest bucket to ``index``, clearing buckets that left the window"""
+        if self._head is None or index - self._head >= self.n_buckets:
+            for slot in range(self.n_buckets):
+                self._sums[slot] = [0.0] * self.n_fields
+                self._counts[slot] = [0] * self.n_fields
+            self._total = [0.0] * self.n_fields
+            self._count = [0] * self.n_fields
+        else:
+            total, count = self._total, self._count
+            for k in range(self._head + 1, index + 1):
+                slot = k % self.n_buckets
+                sums, counts = self._sums[slot], self._counts[slot]
+                for j in range(self.n_fields):
+                    total[j] -= sums[j]
+                    count[j] -= counts[j]
+                self._sums[slot] = [0.0] * self.n_fields
+                self._counts[slot] = [0] * self.n_fields
+        self._head = index
+
+    def add(self, t, values):
+        """Add one sample; NaN fields are skipped. False if too old for the window"""
+        index = int(t // self.bucket)
+        if self._head is None or index > self._head:
+            self._advance(index)
+        elif index <= self._head - self.n_buckets:
+            return False
+        sums, counts = self._sums[index % self.n_buckets], self._counts[index % self.n_buckets]
+        total, count = self._total, self._count
+        for j, value in enumerate(values):
+            if value == value:
+                sums[j] += value
+                counts[j] += 1
+                total[j] += value
+                count[j] += 1
+        return True
+
+    def means(self, now=None):
+        """Mean per field (NaN when the window holds no value for it)
+
+        ``now`` (epoch s, on the sample clock) first expires buckets older
+        than the window, so the means drop out when the feed goes quiet.
+        """
+        if now is not None and self._head is not None and int(now // self.bucket) > self._head:
+            self._advance(int(now // self.bucket))
+        return [total / count if count else np.nan for total, count in zip(self._total, self._count)]
+
+
+class LiveAggregates:
+    """Rolling means, released volume and TMA extremes of a reading stream"""
+
+    def __init__(self, windows=WINDOWS, max_gap=MAX_GAP):
+        self.windows = {name: RollingWindow(span, bucket, len(AVERAGE_COLUMNS)) for name, span, bucket in windows}
+        self.max_gap = max_gap
+        self.n = 0
+        # sampel yang lebih tua dari sampel sebelumnya (tidak diintegrasikan)
+        self.terlambat = 0
+        # selang lebih dari max_gap yang tidak diintegrasikan
+        self.terputus = 0
+        self.volume = dict.fromkeys(VOLUME_COLUMNS, 0.0)
+        self.tma_min = self.tma_max = np.nan
+        self.waktu_tma_min = self.waktu_tma_max = None
+        self.waktu_terakhir = None
+        # jam dinding saat sampel terbaru diterima (lihat sample_clock)
+        self.diterima_terakhir = None
+        self.terakhir = None
+        self._last_debit = None
+
+    def add(self, t, sample, received=None):
+        """Update every aggregate with one sample (dict with the output columns and tma)
+
+        ``received`` is the wall-clock time the sample arrived (default now).
+        """
+        self.n += 1
+        averaged = [sample[name] for name in AVERAGE_COLUMNS]
+        for window in self.windows.values():
+            window.add(t, averaged)
+
+        tma = sample["tma"]
+        if tma == tma:
+            if not tma >= self.tma_min:
+                self.tma_min, self.waktu_tma_min = tma, t
+            if not tma <= self.tma_max:
+                self.tma_max, self.waktu_tma_max = tma, t
+
+        if self.waktu_terakhir is not None and t < self.waktu_terakhir:
+            self.terlambat += 1
+            return
+        debit = [sample[name] for name in VOLUME_COLUMNS]
+        if self._last_debit is not None:
+            dt = t - self.waktu_terakhir
+            if dt > self.max_gap:
+                self.terputus += 1
+            else:
+                # trapesium: rata-rata debit dua sampel berurutan x selang waktu
+                for name, q0, q1 in zip(VOLUME_COLUMNS, self._last_debit, debit):
+                    if q0 == q0 and q1 == q1:
+                        self.volume[name] += 0.5 * (q0 + q1) * dt
+        self._last_debit = debit
+        self.waktu_terakhir = t
+        self.diterima_terakhir = time.time() if received is None else received
+        self.terakhir = sample
+
+    def sample_clock(self, now):
+        """Wall-clock ``now`` on the sample clock: newest sample time plus the quiet time since it arrived
+
+        Windows follow the sample times, so a replayed old log keeps its
+        means, and still expire once the feed stops sending.
+        """
+        if self.waktu_terakhir is None:
+            return None
+        return self.waktu_terakhir + max(now - self.diterima_terakhir, 0.0)
+
+    def snapshot(self, now=None):
+        """Current aggregates as a plain dict (means per window keyed 'rata_<window>')
+
+        ``now`` (wall-clock epoch s) expires window buckets once the feed has
+        been quiet longer than the window (see sample_clock).
+        """
+        if now is not None:
+            now = self.sample_clock(now)
+        hasil = {
+            "n": self.n,
+            "terlambat": self.terlambat,
+            "terputus": self.terputus,
+            "waktu_terakhir": self.waktu_terakhir,
+            "terakhir": dict(self.terakhir) if self.terakhir else None,
+            "volume": dict(self.volume),
+            "tma_min": self.tma_min,
+            "waktu_tma_min": self.waktu_tma_min,
+            "tma_max": self.tma_max,
+            "waktu_tma_max": self.waktu_tma_max,
+        }
+        for name, window in self.windows.items():
+            hasil[f"rata_{name}"] = dict(zip(AVERAGE_COLUMNS, window.means(now)))
+        return hasil
+
+
+def parse_lines(lines, now=None):
+    """Raw feed lines -> (epoch times, (n, 10) input matrix, rejected count)
+
+    Times that are not finite or lie outside MAX_AGE/MAX_LEAD around
+    ``now`` are rejected: one NaN or far-future time would stall the
+    rolling windows and the volume integration.
+    """
+    now = time.time() if now is None else now
+    times, rows = [], []
+    rejected = 0
+    n_fields = len(INPUT_COLUMNS) + 1
+    for line in lines:
+        fields = line.strip().split(",")
+        if fields == [""]:
+            continue
+        if len(fields) != n_fields:
+            rejected += 1
+            continue
+        try:
+            waktu = fields[0].strip()
+            if not waktu:
+                t = now
+            else:
+                try:
+                    t = float(waktu)
+                except ValueError:
+                    waktu = datetime.fromisoformat(waktu)
+                    t = to_epoch(waktu) - (WIB_OFFSET if waktu.tzinfo is None else 0)
+            row = [float(x) if x.strip() else np.nan for x in fields[1:]]
+        except ValueError:
+            rejected += 1
+            continue
+        if not now - MAX_AGE <= t <= now + MAX_LEAD:
+            rejected += 1
+            continue
+        times.append(t)
+        rows.append(row)
+    values = np.array(rows, dtype=float).reshape(-1, len(INPUT_COLUMNS))
+    return times, values, rejected
+
+
+class FileSource:
+    """New lines appended to a file (like ``tail -F``), rotation and truncation aware"""
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.from_start = from_start
+        self._file = None
+        self._inode = None
+        self._buffer = ""
+
+    def describe(self):
+        return f"file {self.path}"
+
+    def _open(self, from_start):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, encoding="utf-8", errors="replace", newline="")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._buffer = ""
+        if not from_start:
+            self._file.seek(0, os.SEEK_END)
+
+    def poll(self, timeout):
+        """Complete lines written since the last call (waits ``timeout`` s if none)"""
+        try:
+            if self._file is None:
+                self._open(self.from_start)
+            else:
+                stat = os.stat(self.path)
+                # file diganti (rotasi log) atau dipotong: baca lagi dari awal
+                if stat.st_ino != self._inode or stat.st_size < self._file.tell():
+                    self._open(True)
+        except FileNotFoundError:
+            time.sleep(timeout)
+            return []
+        data = self._file.read()
+        if not data:
+            time.sleep(timeout)
+            return []
+        data = self._buffer + data
+        # baris terakhir yang belum lengkap disimpan untuk pembacaan berikutnya
+        lines = data.split("\n")
+        self._buffer = lines.pop()
+        return lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SocketSource:
+    """Lines sent by any number of TCP clients to a local port"""
+
+    def __init__(self, host="127.0.0.1", port=8503):
+        self._selector = selectors.DefaultSelector()
+        self._server = socket.create_server((host, port))
+        self._server.setblocking(False)
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self.address = self._server.getsockname()[:2]
+        self._buffers = {}
+
+    def describe(self):
+        return f"socket {self.address[0]}:{self.address[1]}"
+
+    def poll(self, timeout):
+        """Complete lines received since the last call (waits up to ``timeout`` s)"""
+        lines = []
+        for key, _ in self._selector.select(timeout):
+            sock = key.fileobj
+            if sock is self._server:
+                client, _ = self._server.accept()
+                client.setblocking(False)
+                self._selector.register(client, selectors.EVENT_READ)
+                self._buffers[client] = b""
+                continue
+            try:
+                data = sock.recv(1 << 16)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                # klien menutup koneksi, sisa buffer dianggap satu baris
+                rest = self._buffers.pop(sock, b"")
+                if rest.strip():
+                    lines.append(rest.decode("utf-8", "replace"))
+                self._selector.unregister(sock)
+                sock.close()
+                continue
+            parts = (self._buffers[sock] + data).split(b"\n")
+            self._buffers[sock] = parts.pop()
+            lines.extend(part.decode("utf-8", "replace") for part in parts)
+        return lines
+
+    def close(self):
+        for sock in list(self._buffers):
+            self._selector.unregister(sock)
+            sock.close()
+        self._buffers = {}
+        self._selector.unregister(self._server)
+        self._server.close()
+        self._selector.close()
+
+
+class LiveFeed:
+    """Background thread that ingests a source into LiveAggregates"""
+
+    def __init__(self, source, poll_interval=POLL_INTERVAL, rules=None):
+        self.source = source
+        self.poll_interval = poll_interval
+        # None: aturan aplikasi (alerts.get_rules), ikut berubah bila file aturan diubah
+        self.rules = rules
+        self.aggregates = LiveAggregates()
+        self.peringatan = {}
+        self.peringatan_aktif = []
+        self.ditolak = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ingest(self, lines, tables=None):
+        """Compute and aggregate a batch of raw lines, returns the accepted count"""
+        times, values, rejected = parse_lines(lines)
+        self.ditolak += rejected
+        if not times:
+            return 0
+        columns = compute_chunk(values, tables or current_tables())
+        rules = self.rules or get_rules()
+        picu = rules.check_readings({"tma": values[:, 0], "debit_total": columns["debit_total"],
+                                     "beban": values[:, 4:]})["picu"]
+        names = list(columns)
+        outputs = [columns[name].tolist() for name in names]
+        tma = values[:, 0].tolist()
+        received = time.time()
+        with self._lock:
+            aggregates = self.aggregates
+            for i, t in enumerate(times):
+                sample = {name: column[i] for name, column in zip(names, outputs)}
+                sample["tma"] = tma[i]
+                aggregates.add(t, sample, received)
+            for k in np.flatnonzero(picu.any(axis=0)):
+                rows = np.flatnonzero(picu[:, k])
+                item = self.peringatan.setdefault(rules.names[k], {"pesan": rules.messages[k], "jumlah": 0})
+                item["jumlah"] += len(rows)
+                item["waktu_terakhir"] = times[rows[-1]]
+            self.peringatan_aktif = [rules.messages[k] for k in np.flatnonzero(picu[-1])]
+        return len(times)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                lines = self.source.poll(self.poll_interval)
+                if lines:
+                    self.ingest(lines)
+        except Exception as e:  # tampilkan di dashboard, jangan hilang diam-diam
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.source.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self, now=None):
+        """Aggregates plus feed status; ``now`` (wall-clock epoch s) expires windows of a quiet feed"""
+        with self._lock:
+            hasil = self.aggregates.snapshot(now)
+            hasil["peringatan"] = {nama: dict(item) for nama, item in self.peringatan.items()}
+            hasil["peringatan_aktif"] = list(self.peringatan_aktif)
+        hasil["ditolak"] = self.ditolak
+        hasil["sumber"] = self.source.describe()
+        hasil["error"] = self.error
+        return hasil
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed(kind, target):
+    """Process-wide running feed for a source, started on first use
+
+    ``kind`` is ``"file"`` (target = path) or ``"socket"`` (target = port);
+    every Streamlit session watching the same source shares one feed.
+    """
+    key = (kind, str(target))
+    with _feeds_lock:
+        feed = _feeds.get(key)
+        if feed is None or not feed.running:
+            if kind == "file":
+                source = FileSource(str(target))
+            elif kind == "socket":
+                source = SocketSource(port=int(target))
+            else:
+                raise ValueError(f"jenis umpan tidak dikenal: {kind!r}")
+            feed = _feeds[key] = LiveFeed(source).start()
+    return feed
+
+
+def stop_feed(feed):
+    """Stop a feed started by get_feed for every session using it"""
+    with _feeds_lock:
+        for key, value in list(_feeds.items()):
+            if value is feed:
+                del _feeds[key]
+    feed.stop()
+
+
+def _format(snapshot):
+    rata = snapshot["rata_jam"]
+    return (f"{snapshot['n']} sampel | Q total {(snapshot['terakhir'] or {}).get('debit_total', np.nan):,.3f} "
+            f"| rata 1 jam {rata['debit_total']:,.3f} m³/det "
+            f"| volume {snapshot['volume']['debit_total']:,.0f} m³ "
+            f"| TMA {snapshot['tma_min']:.2f}-{snapshot['tma_max']:.2f}"
+            + "".join(f" | ! {pesan}" for pesan in snapshot["peringatan_aktif"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pantau debit langsung dari file yang di-tail atau socket lokal")
+    sub = parser.add_subparsers(dest="sumber", required=True)
+    file_parser = sub.add_parser("file", help="ikuti baris baru di akhir file")
+    file_parser.add_argument("path")
+    file_parser.add_argument("--dari-awal", action="store_true", help="baca isi file yang sudah ada lebih dulu")
+    socket_parser = sub.add_parser("socket", help="terima baris dari klien TCP")
+    socket_parser.add_argument("--host", default="127.0.0.1")
+    socket_parser.add_argument("--port", type=int, default=8503)
+    parser.add_argument("--interval", type=float, default=1.0, help="selang tampilan ringkasan (detik)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.sumber == "file":
+            source = FileSource(args.path, from_start=args.dari_awal)
+        else:
+            source = SocketSource(args.host, args.port)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    feed = LiveFeed(source).start()
+    print(f"Memantau {source.describe()}", flush=True)
+    try:
+        while feed.running:
+            time.sleep(args.interval)
+            print(_format(feed.snapshot()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.stop()
+    if feed.error:
+        print(f"Error: {feed.error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""Pencarian kebijakan rule curve jangka panjang dengan inflow historis.
+
+Seri inflow harian (historis atau hasil inflow.py) diputar ulang melalui
+lengkung waduk (setup_el_interpolators) untuk setiap kandidat kebijakan:
+
+- target TMA per bulan (rule curve), dibentuk dari TMA terendah/tertinggi
+  dan bulan terendah/tertinggi, linear di antaranya,
+- batas debit keluar terkendali minimum dan maksimum (m³/det).
+
+Setiap hari debit keluar diatur menuju target (selisih volume dibagi
+``horizon_hari``), dibatasi batas kebijakan dan air yang tersedia di atas
+TMA minimum. Limpasan di atas mercu 106,9 m memakai rumus L13. Debit turbin
+(sampai kapasitas 6 unit) diubah menjadi daya lewat rumus L6-L11 yang
+dibalik dalam tabel (tinggi jatuh x debit per unit); sisanya lewat HCV.
+
+Skor = bobot energi x energi (GWh) - bobot limpasan x volume limpasan
+(juta m³) - bobot kekurangan x kekurangan terhadap kebutuhan (juta m³).
+Semua kebijakan disimulasikan sekaligus sebagai array; kebijakan yang
+banyak dibagi ke beberapa proses.
+
+Contoh:
+    python policy.py inflow_harian.csv --kolom-tanggal tanggal --kolom-inflow inflow
+    python policy.py inflow_harian.csv --kolom-tanggal tanggal --kolom-inflow inflow \\
+        --tma-rendah 95 97 99 101 --tma-tinggi 104 105 106 107 --kebutuhan 120 --top 20
+"""
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from debit_engine import (
+    N_UNITS,
+    calculate_spillway_debit,
+    calculate_turbine_debit,
+    current_tables,
+    setup_el_interpolators,
+    turbine_efficiency,
+)
+from dispatch import UNIT_RATED_LOAD, load_limits
+from solver import R_MAX, R_MIN
+
+# Di bawah jumlah kebijakan ini overhead proses lebih mahal daripada hitungannya
+PARALLEL_MIN_POLICIES = 2000
+DEFAULT_WEIGHTS = {"energi": 1.0, "limpasan": 1.0, "kekurangan": 10.0}
+# Rentang tinggi jatuh (m) tabel daya turbin
+HEAD_RANGE = (40.0, 80.0)
+
+
+# Di ujung atas R_MAX efisiensi turun ke 0 dan debit per MW meledak; unit
+# dianggap tidak dijalankan di atas R yang efisiensinya di bawah efisiensi R_MIN
+_R = np.linspace(R_MIN, R_MAX, 10_001)
+R_EFFICIENT_MAX = float(_R[np.nonzero(turbine_efficiency(_R) >= turbine_efficiency(R_MIN))[0][-1]])
+del _R
+
+
+@lru_cache(maxsize=8)
+def turbine_power_table(head_lo=HEAD_RANGE[0], head_hi=HEAD_RANGE[1], n_head=161, n_flow=201):
+    """Inverse of the L6-L11 formula for one unit on a regular grid
+
+    Returns ``(heads, q_min, q_max, load)``: per head the unit discharge
+    range of the usable load band (dispatch.load_limits up to
+    R_EFFICIENT_MAX, at most UNIT_RATED_LOAD) and the load (MW) at
+    ``n_flow`` equally spaced discharges across that range.
+    """
+    heads = np.linspace(head_lo, head_hi, n_head)
+    q_min = np.empty(n_head)
+    q_max = np.empty(n_head)
+    load = np.empty((n_head, n_flow))
+    fraction = np.linspace(0.0, 1.0, n_flow)
+    for i, head in enumerate(heads):
+        # batas R_MAX tanpa batas beban pengenal, diperkecil ke R_EFFICIENT_MAX, baru dibatasi beban pengenal
+        lo, hi = load_limits(head, max_load=None)
+        hi = min(R_EFFICIENT_MAX * hi / (R_MAX * (1 - 1e-9)), UNIT_RATED_LOAD)
+        loads = np.linspace(lo, hi, 4 * n_flow)
+        _, _, L = calculate_turbine_debit(np.full(len(loads), head), loads[:, np.newaxis])
+        q = L[:, 0]
+        q_min[i], q_max[i] = q[0], q[-1]
+        load[i] = np.interp(q[0] + fraction * (q[-1] - q[0]), q, loads)
+    for array in (heads, q_min, q_max, load):
+        array.setflags(write=False)
+    return heads, q_min, q_max, load
+
+
+def turbine_power(debit_turbin, tinggi_jatuh, table=None):
+    """Total MW for a turbine discharge (m³/det) at a head, fewest units at equal load
+
+    Discharge above six units at full load is not turned into power (the
+    caller routes it through the HCV); below one unit's minimum gives 0.
+    """
+    heads, q_min, q_max, load = table or turbine_power_table()
+    n_head, n_flow = load.shape
+    pos = np.clip((tinggi_jatuh - heads[0]) / (heads[1] - heads[0]), 0, n_head - 1)
+    i = np.minimum(pos.astype(np.intp), n_head - 2)
+    t = pos - i
+    unit_min = q_min[i] * (1 - t) + q_min[i + 1] * t
+    unit_max = q_max[i] * (1 - t) + q_max[i + 1] * t
+
+    debit = np.minimum(debit_turbin, N_UNITS * unit_max)
+    units = np.clip(np.ceil(debit / unit_max - 1e-12), 1, N_UNITS)
+    per_unit = debit / units
+    v = np.clip((per_unit - unit_min) / (unit_max - unit_min), 0.0, 1.0) * (n_flow - 1)
+    j = np.minimum(v.astype(np.intp), n_flow - 2)
+    u = v - j
+    power = ((load[i, j] * (1 - u) + load[i, j + 1] * u) * (1 - t)
+             + (load[i + 1, j] * (1 - u) + load[i + 1, j + 1] * u) * t)
+    return np.where(per_unit >= unit_min, units * power, 0.0)
+
+
+def rule_curve(tma_rendah, tma_tinggi, bulan_rendah, bulan_tinggi):
+    """Target TMA for months 1..12 (shape (..., 12)), linear between the low and high months"""
+    tma_rendah, tma_tinggi, bulan_rendah, bulan_tinggi = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float)[..., np.newaxis] for a in (tma_rendah, tma_tinggi, bulan_rendah, bulan_tinggi)))
+    month = np.arange(1, 13)
+    naik = (bulan_tinggi - bulan_rendah) % 12
+    naik = np.where(naik == 0, 12, naik)
+    since_low = (month - bulan_rendah) % 12
+    # naik dari bulan terendah ke tertinggi, lalu turun kembali
+    fraction = np.where(since_low <= naik, since_low / naik, 1 - (since_low - naik) / (12 - naik))
+    return tma_rendah + (tma_tinggi - tma_rendah) * fraction
+
+
+def policy_grid(tma_rendah, tma_tinggi, bulan_rendah, bulan_tinggi, debit_min, debit_maks):
+    """Every combination of the parameter lists as policy arrays (invalid ones dropped)"""
+    combos = np.array(list(itertools.product(tma_rendah, tma_tinggi, bulan_rendah, bulan_tinggi,
+                                             debit_min, debit_maks)), dtype=float).reshape(-1, 6)
+    valid = (combos[:, 0] <= combos[:, 1]) & (combos[:, 2] != combos[:, 3]) & (combos[:, 4] <= combos[:, 5])
+    combos = combos[valid]
+    return {
+        "tma_rendah": combos[:, 0],
+        "tma_tinggi": combos[:, 1],
+        "bulan_rendah": combos[:, 2].astype(int),
+        "bulan_tinggi": combos[:, 3].astype(int),
+        "debit_min": combos[:, 4],
+        "debit_maks": combos[:, 5],
+    }
+
+
+def simulate_policies(policies, inflow, months, tma_awal, trc, kebutuhan=0.0, tma_minimum=75.0,
+                      horizon_hari=7, dt_seconds=86400, tables=None):
+    """Replay ``inflow`` (T,) m³/det under every policy, returns per-policy totals
+
+    ``months`` (T,) are the calendar months 1..12 of the steps and
+    ``kebutuhan`` the downstream demand (scalar or (T,)) used for the
+    shortfall. Totals: energi (GWh), limpasan and kekurangan (juta m³),
+    tma_min/tma_maks (mdpl).
+    """
+    el_to_cap, cap_to_el, _ = setup_el_interpolators(tables=tables)
+    inflow = np.asarray(inflow, dtype=float)
+    months = np.asarray(months, dtype=int)
+    kebutuhan = np.broadcast_to(np.asarray(kebutuhan, dtype=float), inflow.shape)
+    n_policies = len(policies["tma_rendah"])
+    target_cap = el_to_cap(rule_curve(policies["tma_rendah"], policies["tma_tinggi"],
+                                      policies["bulan_rendah"], policies["bulan_tinggi"]))
+    # (12, P) supaya target satu bulan adalah satu baris kontigu
+    target_cap = np.ascontiguousarray(target_cap.T)
+    debit_min = np.asarray(policies["debit_min"], dtype=float)
+    debit_maks = np.asarray(policies["debit_maks"], dtype=float)
+    cap_minimum = float(el_to_cap(tma_minimum))
+    table = turbine_power_table()
+    turbine_max = N_UNITS * table[2].max()
+    volume_factor = dt_seconds / 1_000_000  # m³/det selama satu langkah -> juta m³
+
+    s = np.full(n_policies, float(el_to_cap(tma_awal)))
+    h = np.full(n_policies, float(tma_awal))
+    energi = np.zeros(n_policies)
+    limpasan = np.zeros(n_policies)
+    kekurangan = np.zeros(n_policies)
+    tma_min = h.copy()
+    tma_maks = h.copy()
+    for k, (q_in, month, demand) in enumerate(zip(inflow.tolist(), (months - 1).tolist(), kebutuhan.tolist())):
+        release = q_in + (s - target_cap[month]) / (horizon_hari * volume_factor)
+        np.clip(release, debit_min, debit_maks, out=release)
+        # tidak melepas air di bawah TMA minimum
+        available = np.maximum((s - cap_minimum) / volume_factor + q_in, 0.0)
+        np.minimum(release, available, out=release)
+        spill = calculate_spillway_debit(h)
+
+        power = turbine_power(np.minimum(release, turbine_max), h - trc, table)
+        energi += power
+        limpasan += spill
+        kekurangan += np.maximum(demand - release - spill, 0.0)
+
+        s = s + (q_in - release - spill) * volume_factor
+        h = cap_to_el(s)
+        np.minimum(tma_min, h, out=tma_min)
+        np.maximum(tma_maks, h, out=tma_maks)
+
+    return {
+        "energi": energi * dt_seconds / 3600 / 1000,  # MW x jam -> GWh
+        "limpasan": limpasan * volume_factor,
+        "kekurangan": kekurangan * volume_factor,
+        "tma_min": tma_min,
+        "tma_maks": tma_maks,
+    }
+
+
+def _simulate_block(policies, block, args):
+    """One block of policies (runs in a worker process)"""
+    return simulate_policies({key: value[block] for key, value in policies.items()}, *args[:4], **args[4])
+
+
+def search_policies(policies, inflow, months, tma_awal, trc, weights=None, top=10, n_workers=None,
+                    block_size=1000, **options):
+    """Score every policy and return the ``top`` best (highest score first)
+
+    ``options`` are passed to simulate_policies. Grids of at least
+    PARALLEL_MIN_POLICIES are split into blocks evaluated in a process pool
+    of ``n_workers`` (default: CPU count). Returns a dict of arrays with
+    the policy parameters, totals and ``skor`` of the best policies, plus
+    ``n_kebijakan``.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    n_policies = len(policies["tma_rendah"])
+    if n_policies == 0:
+        raise ValueError("tidak ada kebijakan yang valid pada grid ini")
+    n_workers = n_workers or os.cpu_count() or 1
+    blocks = [slice(i, i + block_size) for i in range(0, n_policies, block_size)]
+    args = (inflow, months, tma_awal, trc, options)
+    if n_workers > 1 and n_policies >= PARALLEL_MIN_POLICIES and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(blocks))) as pool:
+            parts = list(pool.map(_simulate_block, [policies] * len(blocks), blocks, [args] * len(blocks)))
+    else:
+        parts = [_simulate_block(policies, block, args) for block in blocks]
+    totals = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    skor = (weights["energi"] * totals["energi"] - weights["limpasan"] * totals["limpasan"]
+            - weights["kekurangan"] * totals["kekurangan"])
+    best = np.argsort(-skor, kind="stable")[:top]
+    hasil = {key: np.asarray(value)[best] for key, value in {**policies, **totals}.items()}
+    hasil["skor"] = skor[best]
+    hasil["n_kebijakan"] = n_policies
+    return hasil
+
+
+def read_daily_inflow(path, date_column, inflow_column, delimiter=","):
+    """(inflow (T,), months (T,)) from a CSV with one row per day"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = f.readline().rstrip("\r\n").split(delimiter)
+        for name in (date_column, inflow_column):
+            if name not in header:
+                raise ValueError(f"Kolom '{name}' tidak ditemukan di {path}")
+        data = np.loadtxt(f, delimiter=delimiter, usecols=[header.index(date_column), header.index(inflow_column)],
+                          dtype=str, ndmin=2)
+    try:
+        dates = data[:, 0].astype("datetime64[D]")
+    except ValueError:
+        raise ValueError(f"kolom {date_column} harus berisi tanggal YYYY-MM-DD")
+    if np.any(np.diff(dates) != np.timedelta64(1, "D")):
+        raise ValueError("data inflow harus harian, berurutan dan tanpa tanggal yang hilang")
+    months = dates.astype("datetime64[M]").astype(int) % 12 + 1
+    return data[:, 1].astype(float), months
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cari rule curve terbaik dengan inflow harian historis")
+    parser.add_argument("input", help="CSV inflow harian")
+    parser.add_argument("--kolom-tanggal", default="tanggal")
+    parser.add_argument("--kolom-inflow", default="inflow")
+    parser.add_argument("--tma-awal", type=float, default=105.0)
+    parser.add_argument("--trc", type=float, default=35.0, help="elevasi tailrace (mdpl)")
+    parser.add_argument("--kebutuhan", type=float, default=0.0, help="kebutuhan hilir (m³/det)")
+    parser.add_argument("--tma-minimum", type=float, default=75.0)
+    parser.add_argument("--tma-rendah", type=float, nargs="+", default=[95, 97, 99, 101, 103])
+    parser.add_argument("--tma-tinggi", type=float, nargs="+", default=[103, 104, 105, 106, 107])
+    parser.add_argument("--bulan-rendah", type=int, nargs="+", default=[9, 10, 11])
+    parser.add_argument("--bulan-tinggi", type=int, nargs="+", default=[4, 5, 6])
+    parser.add_argument("--debit-min", type=float, nargs="+", default=[50, 80, 110])
+    parser.add_argument("--debit-maks", type=float, nargs="+", default=[300, 400, 500, 600])
+    parser.add_argument("--bobot", nargs="+", default=[], metavar="NAMA=NILAI",
+                        help="bobot skor: energi, limpasan, kekurangan")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, help="jumlah proses (default: jumlah CPU)")
+    args = parser.parse_args(argv)
+
+    try:
+        weights = {}
+        for item in args.bobot:
+            name, _, value = item.partition("=")
+            if name not in DEFAULT_WEIGHTS:
+                raise ValueError(f"bobot tidak dikenal: {name!r}, pilih dari {list(DEFAULT_WEIGHTS)}")
+            weights[name] = float(value)
+        inflow, months = read_daily_inflow(args.input, args.kolom_tanggal, args.kolom_inflow)
+        policies = policy_grid(args.tma_rendah, args.tma_tinggi, args.bulan_rendah, args.bulan_tinggi,
+                               args.debit_min, args.debit_maks)
+        hasil = search_policies(policies, inflow, months, args.tma_awal, args.trc, weights, args.top,
+                                args.workers, kebutuhan=args.kebutuhan, tma_minimum=args.tma_minimum,
+                                tables=current_tables())
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{hasil['n_kebijakan']} kebijakan x {len(inflow)} hari, {args.top} terbaik:")
+    print("  TMA rendah/tinggi  bulan  debit min/maks   energi GWh  limpasan jt m³  kurang jt m³  TMA min     skor")
+    for i in range(len(hasil["skor"])):
+        print(f"  {hasil['tma_rendah'][i]:7.2f} {hasil['tma_tinggi'][i]:7.2f}  "
+              f"{hasil['bulan_rendah'][i]:2d}/{hasil['bulan_tinggi'][i]:2d}  "
+              f"{hasil['debit_min'][i]:6.1f} {hasil['debit_maks'][i]:6.1f}  "
+              f"{hasil['energi'][i]:11.1f}  {hasil['limpasan'][i]:14.1f}  {hasil['kekurangan'][i]:12.1f}  "
+              f"{hasil['tma_min'][i]:7.2f}  {hasil['skor'][i]:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
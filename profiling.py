@@ -0,0 +1,294 @@
+"""Profil waktu setiap rerun aplikasi per fase.
+
+Setiap rerun skrip (dan setiap rerun fragment sendiri) dicatat sebagai
+satu rekaman: waktu dinding total dan waktu tiap fase bernama (setup,
+perhitungan tiap tab, blok tampilan seperti pesan WhatsApp). Skrip dibagi
+menjadi segmen berurutan dengan ``mark``; di dalamnya fase boleh bersarang
+(``phase``/``profiled``) dan namanya menjadi jalur seperti
+``tab2/pesan_whatsapp``.
+
+Rekaman disimpan di memori (untuk panel debug dan persentil lintas sesi
+di proses ini) dan ditambahkan sebagai satu baris JSON ke LOG_PATH. Saat
+tidak aktif, ``phase`` hanya mengembalikan context manager kosong yang
+sama, jadi biayanya satu pemanggilan fungsi per fase.
+
+Aktif sejak start dengan DJUANDA_PROFIL=1, atau dinyalakan dari panel
+debug di aplikasi.
+
+Contoh:
+    DJUANDA_PROFIL=1 streamlit run app_streamlit.py
+    python profiling.py data/profil.jsonl
+    python profiling.py data/profil.jsonl --jenis rerun --sejak 2024-05-01
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from functools import wraps
+
+LOG_PATH = os.environ.get(
+    "DJUANDA_PROFIL_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profil.jsonl"))
+# Jumlah rekaman terakhir di memori untuk persentil
+HISTORY = 2000
+PERCENTILES = (50, 90, 99)
+
+_enabled = os.environ.get("DJUANDA_PROFIL", "") not in ("", "0")
+_NULL = nullcontext()
+# rerun yang sedang berjalan, per thread skrip
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY)
+_last = {}
+# rerun penuh yang belum selesai per sesi (thread skrip bisa berganti antar rerun)
+_open = {}
+_log = None
+_session_source = None
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    """Switch profiling on or off for the whole process (all sessions)"""
+    global _enabled
+    _enabled = bool(value)
+
+
+def set_session_source(func):
+    """``func()`` gives the session id for runs started by a fragment"""
+    global _session_source
+    _session_source = func
+
+
+class Run:
+    """Phase timings (seconds) of one script or fragment run"""
+
+    def __init__(self, sesi, jenis, nama):
+        self.sesi = sesi
+        self.jenis = jenis
+        self.nama = nama
+        self.waktu = time.time()
+        self.start = time.perf_counter()
+        self.fase = {}
+        self.stack = []
+        self.segment_start = None
+        self.last = self.start
+
+    def add(self, path, seconds):
+        self.fase[path] = self.fase.get(path, 0.0) + seconds
+        self.last = time.perf_counter()
+
+    def close_segment(self):
+        if self.segment_start is not None:
+            self.add(self.stack.pop(0), time.perf_counter() - self.segment_start)
+            self.segment_start = None
+
+    def record(self, selesai=True):
+        return {
+            "waktu": round(self.waktu, 3),
+            "sesi": self.sesi,
+            "jenis": self.jenis,
+            "nama": self.nama,
+            "selesai": selesai,
+            "total_ms": round(((time.perf_counter() if selesai else self.last) - self.start) * 1000, 3),
+            "fase": {name: round(seconds * 1000, 3) for name, seconds in self.fase.items()},
+        }
+
+
+class _Phase:
+    __slots__ = ("name", "run", "root", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        run = getattr(_local, "run", None)
+        # fragment yang dijalankan ulang sendiri menjadi rekaman tersendiri
+        self.root = run is None
+        if self.root:
+            run = _local.run = Run(_session_source() if _session_source else None, "fragment", self.name)
+        self.run = run
+        run.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.run.add("/".join(self.run.stack), elapsed)
+        self.run.stack.pop()
+        if self.root:
+            _local.run = None
+            _finish(self.run.record(selesai=exc[0] is None))
+        return False
+
+
+def phase(name):
+    """Context manager timing one named phase of the current run"""
+    if not _enabled:
+        return _NULL
+    return _Phase(name)
+
+
+def profiled(name):
+    """Decorator: the whole function call is phase ``name``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_run(sesi, nama="rerun"):
+    """Start recording a full script run in this thread
+
+    A run of this session that never reached end_run (st.rerun, st.stop or
+    an exception) is written first, marked ``selesai: false`` and timed up
+    to its last finished phase.
+    """
+    stale = _open.pop(sesi, None)
+    _local.run = None
+    if stale is not None:
+        _finish(stale.record(selesai=False))
+    if _enabled:
+        _local.run = _open[sesi] = Run(sesi, "rerun", nama)
+
+
+def mark(name):
+    """End the current top-level segment of the script run and start segment ``name``"""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+    run.close_segment()
+    run.stack.insert(0, name)
+    run.segment_start = time.perf_counter()
+
+
+def end_run():
+    """Finish the run started by begin_run, returns its record (None when not profiling)"""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    _open.pop(run.sesi, None)
+    run.close_segment()
+    record = run.record()
+    _finish(record)
+    return record
+
+
+def _finish(record):
+    global _log
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock:
+        _history.append(record)
+        _last[record["sesi"]] = record
+        try:
+            if _log is None:
+                if os.path.dirname(LOG_PATH):
+                    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+                _log = open(LOG_PATH, "a", encoding="utf-8")
+            _log.write(line)
+            _log.flush()
+        except OSError:
+            # profil tidak boleh menghentikan aplikasi; rekaman tetap ada di memori
+            pass
+
+
+def last_run(sesi):
+    """Latest record of session ``sesi`` (None if there is none yet)"""
+    with _lock:
+        return _last.get(sesi)
+
+
+def history():
+    """Records kept in memory, oldest first"""
+    with _lock:
+        return list(_history)
+
+
+def _percentile(values, p):
+    """Linear-interpolated percentile of sorted ``values`` (like numpy's default)"""
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def percentiles(records=None, q=PERCENTILES):
+    """Per-phase percentiles (ms) over ``records`` (default: the in-memory history)
+
+    Full script runs also contribute their total under the name ``rerun``.
+    Returns ``{fase: {"n", "p50", ..., "maks"}}``, slowest p90 first.
+    """
+    records = history() if records is None else records
+    samples = {}
+    for record in records:
+        if record["jenis"] == "rerun":
+            samples.setdefault("rerun", []).append(record["total_ms"])
+        for name, ms in record["fase"].items():
+            samples.setdefault(name, []).append(ms)
+    stats = {}
+    for name, values in samples.items():
+        values.sort()
+        row = {"n": len(values)}
+        row.update({f"p{p}": _percentile(values, p) for p in q})
+        row["maks"] = values[-1]
+        stats[name] = row
+    return dict(sorted(stats.items(), key=lambda item: -item[1].get("p90", item[1]["maks"])))
+
+
+def read_trace(path=LOG_PATH, sejak=None, jenis=None):
+    """Records from a JSON-lines trace file, skipping damaged lines"""
+    start = datetime.fromisoformat(sejak).timestamp() if sejak else None
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if start is not None and record["waktu"] < start:
+                continue
+            if jenis and record["jenis"] != jenis:
+                continue
+            records.append(record)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persentil waktu per fase dari file jejak profil (JSON lines)")
+    parser.add_argument("trace", nargs="?", default=LOG_PATH, help="file jejak (default: data/profil.jsonl)")
+    parser.add_argument("--sejak", help="hanya rekaman sejak tanggal/jam ini (ISO, waktu lokal)")
+    parser.add_argument("--jenis", choices=("rerun", "fragment"), help="hanya satu jenis rekaman")
+    args = parser.parse_args(argv)
+
+    try:
+        records = read_trace(args.trace, args.sejak, args.jenis)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not records:
+        print("Tidak ada rekaman")
+        return 0
+    sesi = {record["sesi"] for record in records}
+    tidak_selesai = sum(not record["selesai"] for record in records)
+    print(f"{len(records)} rekaman dari {len(sesi)} sesi ({tidak_selesai} tidak selesai)")
+    print(f"  {'fase':<40} {'n':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'maks ms':>9}")
+    for name, row in percentiles(records).items():
+        print(f"  {name:<40} {row['n']:>6} {row['p50']:>9.1f} {row['p90']:>9.1f} {row['p99']:>9.1f} "
+              f"{row['maks']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""Lookup cepat tabel debit (rating) Hollow Cone Valve.
+
+Grid HCV berbentuk TMA (80-110, langkah 1 m) x bukaan (0-100 %, kelipatan
+5 %), jadi indeks sel bisa dihitung langsung dengan pembagian tanpa
+pencarian. Hasilnya sama dengan interpolasi bilinear
+RegularGridInterpolator sampai pembulatan (~1e-13), tetapi tanpa
+membangun list dan array baru di setiap pemanggilan.
+
+GridInterpolator dan LinearInterpolator adalah pengganti langsung
+RegularGridInterpolator dan interp1d(..., fill_value="extrapolate") yang
+hanya memakai NumPy, supaya scipy tidak perlu dimuat saat aplikasi start.
+"""
+import math
+
+import numpy as np
+
+# Kebijakan untuk input di luar grid
+OUT_OF_RANGE_POLICIES = ("zero", "nan", "clip", "raise")
+_POLICY_SET = frozenset(OUT_OF_RANGE_POLICIES)
+_SCALAR_TYPES = (int, float, type(None))
+# Jumlah titik per blok pada lookup array
+BLOCK_SIZE = 65536
+
+
+class _Axis:
+    """Map coordinates to (segment index, fraction) with index arithmetic
+
+    Breakpoints that are all multiples of a common cell size (e.g. 0, 5,
+    10, ..., 50, 60, ..., 100) get a lookup table from cell number to
+    segment, so no binary search is needed even when the spacing changes.
+    """
+
+    def __init__(self, points, max_cells=10_000):
+        self.points = np.asarray(points, dtype=float)
+        if self.points.ndim != 1 or len(self.points) < 2 or np.any(np.diff(self.points) <= 0):
+            raise ValueError("grid points must be strictly increasing with at least two values")
+        self.lo = float(self.points[0])
+        self.hi = float(self.points[-1])
+        self.n_segments = len(self.points) - 1
+
+        diffs = np.diff(self.points)
+        cell = float(diffs.min())
+        while not np.allclose(diffs / cell, np.round(diffs / cell), rtol=0, atol=1e-9):
+            # coba pecahan dari langkah terkecil (misal 2.5 untuk 5 dan 7.5)
+            cell /= 2
+            if (self.hi - self.lo) / cell > max_cells:
+                cell = 0.0
+                break
+        self.cell = cell
+        if cell:
+            n_cells = int(round((self.hi - self.lo) / cell))
+            starts = np.round((self.points[:-1] - self.lo) / cell).astype(int)
+            self.cell_to_segment = np.repeat(np.arange(self.n_segments), np.diff(np.append(starts, n_cells)))
+            self.cell_to_segment_list = self.cell_to_segment.tolist()
+            self.n_cells = n_cells
+            # setiap sel adalah satu segmen (grid seragam), tabel sel->segmen tidak perlu
+            self.uniform = n_cells == self.n_segments
+        else:
+            self.uniform = False
+        self.widths = diffs
+        self.points_list = self.points.tolist()
+
+    def locate(self, x):
+        """Segment index and fraction for an array of in-range coordinates"""
+        if self.uniform:
+            idx = ((x - self.lo) / self.cell).astype(np.intp)
+            np.minimum(idx, self.n_segments - 1, out=idx)
+        elif self.cell:
+            cells = ((x - self.lo) / self.cell).astype(np.intp)
+            np.minimum(cells, self.n_cells - 1, out=cells)
+            idx = self.cell_to_segment.take(cells)
+        else:
+            idx = np.searchsorted(self.points, x, side="right") - 1
+            np.clip(idx, 0, self.n_segments - 1, out=idx)
+        # pembagian (bukan kali kebalikan), urutan operasi sedekat mungkin dengan scipy
+        frac = x - self.points.take(idx)
+        frac /= self.widths.take(idx)
+        return idx, frac
+
+    def locate_scalar(self, x):
+        """Pure Python version of locate for a single coordinate"""
+        if self.cell:
+            cell = min(int((x - self.lo) / self.cell), self.n_cells - 1)
+            idx = self.cell_to_segment_list[cell]
+        else:
+            idx = min(int(np.searchsorted(self.points, x, side="right")) - 1, self.n_segments - 1)
+        x0 = self.points_list[idx]
+        return idx, (x - x0) / (self.points_list[idx + 1] - x0)
+
+
+class HcvRatingTable:
+    """Bilinear lookup on the HCV rating grid (TMA x bukaan -> debit m³/det)
+
+    ``out_of_range`` decides what happens to readings outside the grid:
+
+    - ``"zero"``: debit 0.0, the behaviour of the original form
+    - ``"nan"``: NaN so the caller can see the reading was not valid
+    - ``"clip"``: clamp TMA and bukaan to the edge of the grid
+    - ``"raise"``: raise ValueError
+
+    Missing inputs (None/NaN) give 0.0 like an empty form field, except
+    with ``"nan"`` (NaN) and ``"raise"`` (ValueError).
+    """
+
+    def __init__(self, levels, openings, values, out_of_range="zero"):
+        self.values = np.asarray(values, dtype=float)
+        self.level_axis = _Axis(levels)
+        self.opening_axis = _Axis(openings)
+        if self.values.shape != (len(self.level_axis.points), len(self.opening_axis.points)):
+            raise ValueError("values must have shape (len(levels), len(openings))")
+        self.out_of_range = self._check_policy(out_of_range)
+        self._rows = self.values.tolist()
+        self._flat = self.values.ravel()
+        self._n_cols = self.values.shape[1]
+
+    @staticmethod
+    def _check_policy(policy):
+        if policy not in _POLICY_SET:
+            raise ValueError(f"out_of_range must be one of {OUT_OF_RANGE_POLICIES}, got {policy!r}")
+        return policy
+
+    @property
+    def grid(self):
+        """(levels, openings), same layout as RegularGridInterpolator.grid"""
+        return self.level_axis.points, self.opening_axis.points
+
+    def lookup(self, opening_percent, res_level, out_of_range=None):
+        """Debit for scalar or array inputs (broadcast together)"""
+        policy = self._check_policy(out_of_range or self.out_of_range)
+        if (type(opening_percent) in _SCALAR_TYPES and type(res_level) in _SCALAR_TYPES) or (
+                np.ndim(opening_percent) == 0 and np.ndim(res_level) == 0):
+            return self._lookup_scalar(opening_percent, res_level, policy)
+        return self._lookup_array(opening_percent, res_level, policy)
+
+    __call__ = lookup
+
+    def _lookup_scalar(self, opening, level, policy):
+        la, oa = self.level_axis, self.opening_axis
+        level = math.nan if level is None else float(level)
+        opening = math.nan if opening is None else float(opening)
+        if not (la.lo <= level <= la.hi and oa.lo <= opening <= oa.hi):
+            missing = math.isnan(level) or math.isnan(opening)
+            if policy == "raise":
+                raise ValueError(f"HCV reading out of range: bukaan={opening}, TMA={level}")
+            if policy == "nan":
+                return math.nan
+            if policy == "zero" or missing:
+                return 0.0
+            level = min(max(level, la.lo), la.hi)
+            opening = min(max(opening, oa.lo), oa.hi)
+
+        i, t = la.locate_scalar(level)
+        j, u = oa.locate_scalar(opening)
+        row0 = self._rows[i]
+        row1 = self._rows[i + 1]
+        # urutan operasi sama dengan RegularGridInterpolator (method="linear")
+        return (row0[j] * (1 - t) * (1 - u) + row0[j + 1] * (1 - t) * u
+                + row1[j] * t * (1 - u) + row1[j + 1] * t * u)
+
+    def _lookup_array(self, opening, level, policy):
+        opening = np.asarray(opening, dtype=float)
+        level = np.asarray(level, dtype=float)
+        opening, level = np.broadcast_arrays(opening, level)
+        shape = opening.shape
+        opening = opening.ravel()
+        level = level.ravel()
+
+        # dihitung per blok supaya array sementara tetap muat di cache CPU
+        debit = np.empty(opening.size)
+        for start in range(0, opening.size, BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            debit[block] = self._lookup_block(opening[block], level[block], policy)
+        return debit.reshape(shape)
+
+    def _lookup_block(self, opening, level, policy):
+        la, oa = self.level_axis, self.opening_axis
+        valid = (level >= la.lo) & (level <= la.hi) & (opening >= oa.lo) & (opening <= oa.hi)
+        all_valid = bool(valid.all())
+        if not all_valid:
+            if policy == "raise":
+                raise ValueError(f"{int((~valid).sum())} HCV readings out of range")
+            if policy == "clip":
+                missing = np.isnan(level) | np.isnan(opening)
+                level = np.clip(level, la.lo, la.hi)
+                opening = np.clip(opening, oa.lo, oa.hi)
+                valid = ~missing
+            level = np.where(valid, level, la.lo)
+            opening = np.where(valid, opening, oa.lo)
+
+        i, t = la.locate(level)
+        j, u = oa.locate(opening)
+        # indeks datar ke tabel, empat titik sudut sel
+        k = i * self._n_cols
+        k += j
+        flat = self._flat
+        v00 = flat.take(k)
+        v01 = flat.take(k + 1)
+        k += self._n_cols
+        v10 = flat.take(k)
+        v11 = flat.take(k + 1)
+        # urutan operasi sama dengan RegularGridInterpolator (method="linear")
+        t1 = 1 - t
+        u1 = 1 - u
+        debit = v00 * t1 * u1 + v01 * t1 * u + v10 * t * u1 + v11 * t * u
+
+        if not all_valid:
+            debit[~valid] = np.nan if policy == "nan" else 0.0
+        return debit
+
+
+class GridInterpolator:
+    """NumPy-only stand-in for ``RegularGridInterpolator((levels, openings), values)``
+
+    Called with points ``xi`` of shape (..., 2) as (TMA, bukaan), like the
+    scipy object, and agrees with it (method="linear") to rounding (~1e-13).
+    Out-of-bounds (or NaN) points raise ValueError when ``bounds_error`` is
+    true, otherwise they get ``fill_value`` and NaN coordinates give NaN.
+    """
+
+    def __init__(self, points, values, bounds_error=True, fill_value=np.nan):
+        levels, openings = points
+        self.table = HcvRatingTable(levels, openings, values, out_of_range="nan")
+        self.bounds_error = bounds_error
+        self.fill_value = fill_value
+
+    @property
+    def grid(self):
+        return self.table.grid
+
+    @property
+    def values(self):
+        return self.table.values
+
+    def __call__(self, xi):
+        xi = np.asarray(xi, dtype=float)
+        if xi.shape[-1] != 2:
+            raise ValueError(f"The requested sample points xi have dimension {xi.shape[-1]} "
+                             f"but this RegularGridInterpolator has dimension 2")
+        # satu titik (2,) dikembalikan sebagai (1,), sama seperti scipy
+        xi = xi.reshape(-1, 2) if xi.ndim == 1 else xi
+        level = xi[..., 0]
+        opening = xi[..., 1]
+        out = np.zeros(level.shape, dtype=bool)
+        for dim, (x, axis) in enumerate(((level, self.table.level_axis), (opening, self.table.opening_axis))):
+            # seperti scipy: NaN ditolak bila bounds_error, selain itu hasilnya NaN (bukan fill_value)
+            if self.bounds_error and not np.all((x >= axis.lo) & (x <= axis.hi)):
+                raise ValueError(f"One of the requested xi is out of bounds in dimension {dim}")
+            out |= (x < axis.lo) | (x > axis.hi)
+        debit = np.asarray(self.table.lookup(opening, level), dtype=float)
+        if out.any():
+            debit = np.where(out, self.fill_value, debit)
+        return debit
+
+
+def _interp_linear(x_points, y_points, slopes, x):
+    """Linear interpolation, extrapolated with the first/last segment"""
+    x = np.asarray(x, dtype=float)
+    # sama seperti interp1d: searchsorted lalu dibatasi ke segmen pertama/terakhir
+    idx = np.clip(np.searchsorted(x_points, x) - 1, 0, len(x_points) - 2)
+    return slopes[idx] * (x - x_points[idx]) + y_points[idx]
+
+
+class LinearInterpolator:
+    """NumPy-only stand-in for ``interp1d(x, y, kind="linear", fill_value="extrapolate")``"""
+
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        if self.x.ndim != 1 or self.x.shape != self.y.shape or np.any(np.diff(self.x) <= 0):
+            raise ValueError("x must be strictly increasing and have the same length as y")
+        self.slopes = np.diff(self.y) / np.diff(self.x)
+
+    def __call__(self, x_new):
+        return _interp_linear(self.x, self.y, self.slopes, x_new)
+
+
+class StorageCurve:
+    """Lengkung elevasi - kapasitas - luas waduk (linear, diekstrapolasi)
+
+    Gives the same numbers as ``interp1d(..., kind="linear",
+    fill_value="extrapolate")`` but on plain arrays, so it can be used
+    inside tight loops. Capacity is in juta m³ (MCM), area in km².
+    """
+
+    def __init__(self, el, cap, area):
+        self.el = np.asarray(el, dtype=float)
+        self.cap = np.asarray(cap, dtype=float)
+        self.area = np.asarray(area, dtype=float)
+        if not (np.all(np.diff(self.el) > 0) and np.all(np.diff(self.cap) > 0)):
+            raise ValueError("el and cap must be strictly increasing")
+        self.cap_per_el = np.diff(self.cap) / np.diff(self.el)
+        self.el_per_cap = np.diff(self.el) / np.diff(self.cap)
+        self.area_per_el = np.diff(self.area) / np.diff(self.el)
+
+    def el_to_cap(self, el):
+        return _interp_linear(self.el, self.cap, self.cap_per_el, el)
+
+    def cap_to_el(self, cap):
+        return _interp_linear(self.cap, self.el, self.el_per_cap, cap)
+
+    def el_to_area(self, el):
+        return _interp_linear(self.el, self.area, self.area_per_el, el)
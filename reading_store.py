@@ -0,0 +1,191 @@
+"""Penyimpanan pembacaan dan hasil debit di SQLite (mode WAL) di server.
+
+Setiap pembacaan yang disimpan operator (input form + debit hasil hitung)
+ditulis ke tabel ``pembacaan`` dengan indeks waktu, sehingga satu shift,
+satu hari atau satu bulan bisa diambil lewat query rentang waktu.
+
+Penulisan tidak dilakukan di thread Streamlit: ``add`` hanya memasukkan
+baris ke antrean, lalu satu thread penulis mengumpulkan antrean dan
+menulisnya per batch dalam satu transaksi. Pembacaan memakai koneksi
+sendiri; dengan WAL, query tidak menunggu penulis.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from recompute_debit import INPUT_COLUMNS, OUTPUT_COLUMNS
+
+DB_PATH = os.environ.get(
+    "DJUANDA_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pembacaan.db"))
+# waktu (detik epoch UTC) + input form + kolom hasil seperti recompute_debit
+COLUMNS = ["waktu"] + INPUT_COLUMNS + OUTPUT_COLUMNS + ["versi_tabel"]
+# Antrean ditulis paling lambat setiap FLUSH_INTERVAL detik atau per BATCH_SIZE baris
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 500
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS pembacaan (
+    id INTEGER PRIMARY KEY,
+    waktu REAL NOT NULL,
+    {", ".join(f"{name} REAL" for name in INPUT_COLUMNS + OUTPUT_COLUMNS)},
+    versi_tabel TEXT
+);
+CREATE INDEX IF NOT EXISTS pembacaan_waktu ON pembacaan (waktu);
+"""
+_STOP = object()
+
+
+def to_epoch(waktu):
+    """Seconds since epoch from a datetime (naive = UTC) or a number"""
+    if isinstance(waktu, datetime):
+        if waktu.tzinfo is None:
+            waktu = waktu.replace(tzinfo=timezone.utc)
+        return waktu.timestamp()
+    return float(waktu)
+
+
+class ReadingStore:
+    """Append-only reading log with a background batch writer"""
+
+    def __init__(self, path=DB_PATH, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._insert = (f"INSERT INTO pembacaan ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})")
+        self.written = 0
+        # baris yang gagal ditulis (database terkunci, disk penuh, ...) dan error terakhirnya
+        self.failed = 0
+        self.error = None
+        self._writer = threading.Thread(target=self._run_writer, name="reading-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + synchronous=NORMAL: aman saat aplikasi crash, commit tidak menunggu fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def add(self, waktu, reading):
+        """Queue one reading (dict keyed by COLUMNS, missing values stored as NULL)
+
+        Returns immediately; the row is written by the background thread.
+        """
+        row = [to_epoch(waktu)]
+        for name in COLUMNS[1:]:
+            value = reading.get(name)
+            if isinstance(value, (np.floating, np.integer, np.bool_)):
+                value = value.item()
+            row.append(None if value is None or value != value else value)
+        self._queue.put(tuple(row))
+
+    def _run_writer(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            # kumpulkan baris yang datang berdekatan supaya satu transaksi menulis banyak baris
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not _STOP]
+            stop = len(rows) != len(batch)
+            try:
+                if rows:
+                    with conn:
+                        conn.executemany(self._insert, rows)
+                    self.written += len(rows)
+            except sqlite3.Error as e:
+                # batch dibuang, thread penulis tetap jalan supaya add/flush tidak macet
+                self.failed += len(rows)
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Error: {len(rows)} pembacaan tidak tersimpan di {self.path}: {self.error}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """Wait until every queued reading has been written"""
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def query(self, start=None, end=None, columns=None):
+        """Readings with start <= waktu < end, oldest first, as a dict of arrays
+
+        ``start``/``end`` are datetimes or epoch seconds (None = open).
+        Missing values come back as NaN; ``waktu`` is epoch seconds UTC.
+        """
+        columns = list(columns or COLUMNS)
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"kolom tidak dikenal: {sorted(unknown)}")
+        sql = f"SELECT {', '.join(columns)} FROM pembacaan"
+        where, params = [], []
+        if start is not None:
+            where.append("waktu >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            where.append("waktu < ?")
+            params.append(to_epoch(end))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self._reader().execute(sql + " ORDER BY waktu", params).fetchall()
+        values = zip(*rows) if rows else [()] * len(columns)
+        # NULL menjadi NaN pada kolom angka
+        return {name: np.array(column, dtype=object if name == "versi_tabel" else float)
+                for name, column in zip(columns, values)}
+
+    def latest(self):
+        """The most recent reading as a dict, or None when the store is empty"""
+        row = self._reader().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM pembacaan ORDER BY waktu DESC, id DESC LIMIT 1").fetchone()
+        return None if row is None else dict(zip(COLUMNS, row))
+
+    def __len__(self):
+        return self._reader().execute("SELECT COUNT(*) FROM pembacaan").fetchone()[0]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store on DB_PATH, shared by every Streamlit session"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ReadingStore()
+            atexit.register(_default.close)
+    return _default
@@ -0,0 +1,273 @@
+"""Hitung ulang debit dari log operator (CSV) dalam potongan (chunk).
+
+Contoh:
+    python recompute_debit.py log_2023.csv hasil_2023.csv
+    python recompute_debit.py log_2023.csv hasil_2023 --format npy --chunk-size 500000
+    python recompute_debit.py log.csv hasil.csv --map tma=TMA --map trc=Tailrace
+    python recompute_debit.py log_2015.csv hasil_2015.csv --kolom-tanggal waktu
+
+File input dibaca baris demi baris per chunk sehingga memori tetap kecil
+berapapun panjang file. Kolom input default mengikuti nama field form:
+tma, trc, hjv_kiri, hjv_kanan, beban_1 ... beban_6. Sel kosong dianggap
+sama seperti input kosong di form (0 / tidak ada debit HCV).
+
+Debit HCV dihitung dengan versi tabel (tables.py) yang berlaku pada
+tanggal pembacaan: satu tanggal untuk seluruh file (--tanggal) atau per
+baris dari kolom tanggal ISO (--kolom-tanggal). Tanpa keduanya dipakai
+versi terbaru.
+"""
+import argparse
+import csv
+import itertools
+import os
+import struct
+import sys
+
+import numpy as np
+
+from debit_engine import N_UNITS, calculate_debit, current_tables
+from tables import store
+
+INPUT_COLUMNS = ["tma", "trc", "hjv_kiri", "hjv_kanan"] + [f"beban_{i + 1}" for i in range(N_UNITS)]
+
+OUTPUT_COLUMNS = (
+    ["tinggi_jatuh"]
+    + [f"debit_unit_{i + 1}" for i in range(N_UNITS)]
+    + ["debit_turbin", "debit_limpasan", "debit_hjv_kiri", "debit_hjv_kanan",
+       "debit_hjv", "debit_total", "beban_rendah"]
+)
+
+
+def iter_chunks(lines, chunk_size):
+    """Yield lists of at most ``chunk_size`` raw lines"""
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _to_float(text):
+    text = text.strip()
+    return float(text) if text else np.nan
+
+
+def parse_numeric(lines, indices, delimiter):
+    """Parse the selected columns of raw CSV lines to a float matrix, '' -> NaN"""
+    options = dict(delimiter=delimiter, usecols=indices, quotechar='"', comments=None, ndmin=2, dtype=float)
+    try:
+        return np.loadtxt(lines, **options)
+    except ValueError:
+        pass
+    # ada sel kosong di chunk ini, isi dengan 'nan' lalu coba lagi
+    empty = delimiter * 2
+    filled = delimiter + "nan" + delimiter
+    padded = [(delimiter + line.rstrip("\r\n") + delimiter).replace(empty, filled).replace(empty, filled)[1:-1]
+              for line in lines]
+    try:
+        return np.loadtxt(padded, **options)
+    except ValueError:
+        # sel berisi spasi saja dan sejenisnya, pakai konverter (paling lambat)
+        return np.loadtxt(lines, converters=_to_float, **options)
+
+
+def parse_dates(lines, index, delimiter):
+    """The date column of raw CSV lines as strings (blank lines skipped like parse_numeric)"""
+    return np.loadtxt(lines, delimiter=delimiter, usecols=[index], quotechar='"', comments=None,
+                      ndmin=1, dtype=str)
+
+
+def compute_chunk(values, tables=None):
+    """Run calculate_debit on an (n, 10) input matrix and return output columns"""
+    hasil = calculate_debit(values[:, 0], values[:, 1], values[:, 2], values[:, 3], values[:, 4:],
+                            tables=tables)
+    columns = {"tinggi_jatuh": hasil["tinggi_jatuh"]}
+    for i in range(N_UNITS):
+        columns[f"debit_unit_{i + 1}"] = hasil["L"][:, i]
+    columns["debit_turbin"] = hasil["L12"]
+    columns["debit_limpasan"] = hasil["L13"]
+    columns["debit_hjv_kiri"] = hasil["debit_hjv_kiri"]
+    columns["debit_hjv_kanan"] = hasil["debit_hjv_kanan"]
+    columns["debit_hjv"] = hasil["L14"]
+    columns["debit_total"] = hasil["L15"]
+    for column in columns.values():
+        # unit mati (beban 0 dibagi penyebut negatif) memberi -0.0; tulis sebagai 0
+        column += 0.0
+    columns["beban_rendah"] = hasil["has_low_beban"].astype(np.int8)
+    return columns
+
+
+def compute_chunk_by_date(values, dates):
+    """compute_chunk with every row using the table version valid on its date"""
+    versions = store.versions()
+    index = store.version_index(dates)
+    if (index == index[0]).all():
+        return compute_chunk(values, store.get(versions[index[0]]))
+    columns = {name: np.empty(len(values), dtype=np.int8 if name == "beban_rendah" else float)
+               for name in OUTPUT_COLUMNS}
+    for i in np.unique(index):
+        rows = index == i
+        part = compute_chunk(values[rows], store.get(versions[i]))
+        for name in OUTPUT_COLUMNS:
+            columns[name][rows] = part[name]
+    return columns
+
+
+class CsvWriter:
+    """Write the original row followed by the computed columns"""
+
+    def __init__(self, path, input_header, delimiter, precision):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.delimiter = delimiter
+        csv.writer(self.file, delimiter=delimiter, lineterminator="\n").writerow(list(input_header) + OUTPUT_COLUMNS)
+        # satu format string per baris, jauh lebih cepat daripada memformat per kolom
+        self.row_format = delimiter.join(
+            "%d" if name == "beban_rendah" else f"%.{precision}f" for name in OUTPUT_COLUMNS
+        )
+
+    def write(self, lines, values, columns):
+        matrix = np.column_stack([columns[name] for name in OUTPUT_COLUMNS])
+        row_format = "%s" + self.delimiter + self.row_format + "\n"
+        self.file.writelines(row_format % (line.rstrip("\r\n"), *row)
+                             for line, row in zip(lines, matrix.tolist()))
+
+    def close(self):
+        self.file.close()
+
+
+class NpyColumnWriter:
+    """Append a 1-D column to a .npy file whose length is only known at the end
+
+    The header is written with a fixed size and patched with the final
+    shape on close, so the file can be opened with ``np.load(mmap_mode="r")``.
+    """
+
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype):
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (self.dtype.str, self.count)
+        # magic (6) + version (2) + header length (2)
+        header = header.ljust(self.HEADER_SIZE - 10 - 1) + "\n"
+        self.file.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+    def write(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.write(values.tobytes())
+        self.count += len(values)
+
+    def close(self):
+        self.file.seek(0)
+        self._write_header()
+        self.file.close()
+
+
+class NpyWriter:
+    """Write every input and output column to its own .npy file in a directory"""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.columns = {}
+        for name in INPUT_COLUMNS + OUTPUT_COLUMNS:
+            dtype = np.int8 if name == "beban_rendah" else np.float64
+            self.columns[name] = NpyColumnWriter(os.path.join(path, f"{name}.npy"), dtype)
+
+    def write(self, lines, values, columns):
+        for i, name in enumerate(INPUT_COLUMNS):
+            self.columns[name].write(values[:, i])
+        for name in OUTPUT_COLUMNS:
+            self.columns[name].write(columns[name])
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+
+
+def recompute(input_path, output_path, fmt="csv", chunk_size=100_000, delimiter=",",
+              column_map=None, precision=3, tanggal=None, date_column=None):
+    """Stream ``input_path`` through the discharge formulas, returns the row count
+
+    ``tanggal`` picks one table version for the whole file, ``date_column``
+    names a column of ISO dates to pick the version per row.
+    """
+    column_map = column_map or {}
+    tables = current_tables(tanggal)
+    with open(input_path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader([f.readline()], delimiter=delimiter))
+        indices = []
+        for name in INPUT_COLUMNS:
+            source = column_map.get(name, name)
+            if source not in header:
+                raise ValueError(f"Kolom '{source}' tidak ditemukan di {input_path}")
+            indices.append(header.index(source))
+        if date_column is not None and date_column not in header:
+            raise ValueError(f"Kolom '{date_column}' tidak ditemukan di {input_path}")
+
+        if fmt == "csv":
+            writer = CsvWriter(output_path, header, delimiter, precision)
+        elif fmt == "npy":
+            writer = NpyWriter(output_path)
+        else:
+            raise ValueError(f"Format output tidak dikenal: {fmt}")
+
+        total = 0
+        try:
+            for lines in iter_chunks(f, chunk_size):
+                values = parse_numeric(lines, indices, delimiter)
+                if len(values) != len(lines):
+                    # loadtxt melewati baris kosong, samakan supaya baris asli tetap sejajar
+                    lines = [line for line in lines if line.strip()]
+                if date_column is None:
+                    columns = compute_chunk(values, tables)
+                else:
+                    columns = compute_chunk_by_date(values, parse_dates(lines, header.index(date_column), delimiter))
+                writer.write(lines, values, columns)
+                total += len(lines)
+        finally:
+            writer.close()
+    return total
+
+
+def _parse_map(items):
+    column_map = {}
+    for item in items:
+        name, _, source = item.partition("=")
+        if name not in INPUT_COLUMNS or not source:
+            raise argparse.ArgumentTypeError(f"--map harus berbentuk KOLOM=NAMA_CSV, dapat: {item}")
+        column_map[name] = source
+    return column_map
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hitung ulang Debit Turbin, Limpasan, HJV dan Total dari log CSV")
+    parser.add_argument("input", help="file CSV log operator")
+    parser.add_argument("output", help="file CSV hasil, atau direktori untuk format npy")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv",
+                        help="csv (baris asli + hasil) atau npy (satu file .npy per kolom)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="jumlah baris per chunk")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--precision", type=int, default=3, help="jumlah desimal untuk output CSV")
+    parser.add_argument("--map", action="append", default=[], metavar="KOLOM=NAMA_CSV",
+                        help="nama kolom CSV untuk input yang namanya berbeda, bisa diulang")
+    parser.add_argument("--tanggal", help="pakai versi tabel yang berlaku pada tanggal ini (YYYY-MM-DD)")
+    parser.add_argument("--kolom-tanggal", help="kolom tanggal ISO untuk memilih versi tabel per baris")
+    args = parser.parse_args(argv)
+
+    try:
+        column_map = _parse_map(args.map)
+        total = recompute(args.input, args.output, args.format, args.chunk_size,
+                          args.delimiter, column_map, args.precision, args.tanggal, args.kolom_tanggal)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{total} baris diproses -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
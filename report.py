@@ -0,0 +1,289 @@
+"""Laporan harian dan bulanan volume debit keluar dari riwayat pembacaan.
+
+Debit turbin, limpasan, HJV dan total diintegrasikan dengan aturan
+trapesium antar pembacaan berurutan. Selang yang melewati pergantian hari
+dipotong tepat di batas hari (debit linear di dalam selang), sehingga
+volume harian dan bulanan dihitung dari jumlah kumulatif di batas-batas
+itu sekaligus, tanpa loop per pembacaan. Selang lebih lama dari
+``selang_maks`` dianggap data hilang dan tidak diintegrasikan; lamanya
+data yang tercakup dilaporkan sebagai ``jam_data``, dan debit rata-rata
+adalah volume dibagi waktu tercakup itu.
+
+Hari dihitung dalam WIB. Sumber data: penyimpanan pembacaan server
+(reading_store.py) atau CSV log (kolom debit dipakai bila ada, bila tidak
+dihitung dari kolom form seperti recompute_debit.py).
+
+Contoh:
+    python report.py laporan_2024.txt --dari 2024-01-01 --sampai 2025-01-01
+    python report.py laporan_2024.txt --input log_2024.csv --kolom-waktu waktu --csv-harian harian_2024.csv
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from inflow import parse_times
+from reading_store import get_store
+from recompute_debit import INPUT_COLUMNS, compute_chunk, compute_chunk_by_date, iter_chunks, parse_dates, \
+    parse_numeric
+
+# Komponen debit yang dilaporkan: (nama, kolom debit, label)
+KOMPONEN = (
+    ("turbin", "debit_turbin", "Turbin"),
+    ("limpasan", "debit_limpasan", "Limpasan"),
+    ("hjv", "debit_hjv", "HJV"),
+    ("total", "debit_total", "Total"),
+)
+WIB_OFFSET = 7 * 3600
+# Selang antar pembacaan lebih dari ini (detik) dianggap data hilang
+MAX_GAP = 6 * 3600
+
+# Nama hari dan bulan Indonesia (dipakai juga oleh pesan WhatsApp di app_streamlit.py)
+HARI = {
+    'Monday': 'Senin',
+    'Tuesday': 'Selasa',
+    'Wednesday': 'Rabu',
+    'Thursday': 'Kamis',
+    'Friday': 'Jumat',
+    'Saturday': 'Sabtu',
+    'Sunday': 'Minggu'
+}
+BULAN = {
+    'January': 'Januari',
+    'February': 'Februari',
+    'March': 'Maret',
+    'April': 'April',
+    'May': 'Mei',
+    'June': 'Juni',
+    'July': 'Juli',
+    'August': 'Agustus',
+    'September': 'September',
+    'October': 'Oktober',
+    'November': 'November',
+    'December': 'Desember'
+}
+# Urutan Senin..Minggu dan Januari..Desember, tanpa bergantung pada locale strftime
+_NAMA_HARI = list(HARI.values())
+_NAMA_BULAN = list(BULAN.values())
+
+
+def format_tanggal(tanggal):
+    """'Senin, 01 Januari 2024' like the WhatsApp messages"""
+    return f"{_NAMA_HARI[tanggal.weekday()]}, {tanggal.day:02d} {_NAMA_BULAN[tanggal.month - 1]} {tanggal.year}"
+
+
+def volumes_between(waktu, debit, edges, max_gap=MAX_GAP):
+    """Trapezoidal volume of each column of ``debit`` between consecutive ``edges``
+
+    ``waktu`` (n,) seconds, ascending; ``debit`` (n, k) m³/det; ``edges``
+    (m,) seconds, ascending. Returns (m - 1, k) m³. Intervals longer than
+    ``max_gap`` or with a missing value at either end add nothing.
+    """
+    debit = np.asarray(debit, dtype=float)
+    n_cols = debit.shape[1]
+    if len(waktu) < 2:
+        return np.zeros((len(edges) - 1, n_cols))
+    dt = np.diff(waktu)
+    finite = np.isfinite(debit).all(axis=1)
+    valid = (dt <= max_gap) & finite[:-1] & finite[1:]
+    q0 = np.where(valid[:, np.newaxis], debit[:-1], 0.0)
+    q1 = np.where(valid[:, np.newaxis], debit[1:], 0.0)
+    # volume kumulatif di setiap pembacaan
+    cumulative = np.zeros((len(waktu), n_cols))
+    np.cumsum(0.5 * (q0 + q1) * dt[:, np.newaxis], axis=0, out=cumulative[1:])
+
+    # volume kumulatif di setiap batas: selang yang memuat batas dipotong di situ
+    i = np.clip(np.searchsorted(waktu, edges, side="right") - 1, 0, len(dt) - 1)
+    s = np.clip(edges - waktu[i], 0.0, dt[i])[:, np.newaxis]
+    slope = (q1[i] - q0[i]) / np.maximum(dt[i], 1e-9)[:, np.newaxis]
+    at_edges = cumulative[i] + s * (q0[i] + 0.5 * slope * s)
+    return np.diff(at_edges, axis=0)
+
+
+def _group_reduce(ufunc, values, starts, present, n_groups):
+    """ufunc.reduceat over the non-empty groups, NaN for empty groups"""
+    out = np.full(n_groups, np.nan)
+    if len(starts):
+        out[present] = ufunc.reduceat(values, starts)
+    return out
+
+
+def daily_report(data, utc_offset=WIB_OFFSET, max_gap=MAX_GAP):
+    """Per-day volumes, mean and peak flows and TMA range of a reading series
+
+    ``data`` is a dict of arrays with ``waktu`` (epoch seconds), ``tma`` and
+    the KOMPONEN discharge columns, as returned by ReadingStore.query. Every
+    calendar day from the first to the last reading gets a row; days use
+    ``utc_offset`` seconds (WIB by default, 0 for local-time stamps).
+    """
+    order = np.argsort(data["waktu"], kind="stable")
+    waktu = np.asarray(data["waktu"], dtype=float)[order]
+    if len(waktu) == 0:
+        raise ValueError("tidak ada pembacaan untuk dilaporkan")
+    tma = np.asarray(data["tma"], dtype=float)[order]
+    debit = np.column_stack([np.asarray(data[column], dtype=float)[order] for _, column, _ in KOMPONEN])
+
+    day = np.floor((waktu + utc_offset) / 86400).astype(np.int64)
+    first_day = day[0]
+    n_days = int(day[-1] - first_day + 1)
+    edges = (first_day + np.arange(n_days + 1)) * 86400.0 - utc_offset
+    # kolom tambahan berisi 1: integralnya adalah lama data yang tercakup (detik)
+    volume = volumes_between(waktu, np.column_stack([debit, np.ones(len(waktu))]), edges, max_gap)
+    covered = volume[:, -1]
+
+    counts = np.bincount(day - first_day, minlength=n_days)
+    present = counts > 0
+    starts = np.searchsorted(day, first_day + np.flatnonzero(present))
+    harian = {
+        "tanggal": (first_day + np.arange(n_days)).astype("datetime64[D]"),
+        "n": counts,
+        "jam_data": covered / 3600,
+        "tma_min": _group_reduce(np.fmin, tma, starts, present, n_days),
+        "tma_maks": _group_reduce(np.fmax, tma, starts, present, n_days),
+    }
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for k, (name, _, _) in enumerate(KOMPONEN):
+            harian[f"volume_{name}"] = volume[:, k]
+            harian[f"rata_{name}"] = np.where(covered > 0, volume[:, k] / covered, np.nan)
+            harian[f"puncak_{name}"] = _group_reduce(np.fmax, debit[:, k], starts, present, n_days)
+    return harian
+
+
+def monthly_report(harian):
+    """Aggregate a daily_report to calendar months"""
+    month = harian["tanggal"].astype("datetime64[M]")
+    starts = np.flatnonzero(np.concatenate(([True], month[1:] != month[:-1])))
+    covered = np.add.reduceat(harian["jam_data"], starts)
+    bulanan = {
+        "bulan": month[starts],
+        "n": np.add.reduceat(harian["n"], starts),
+        "jam_data": covered,
+    }
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bulanan["tma_min"] = np.fmin.reduceat(harian["tma_min"], starts)
+        bulanan["tma_maks"] = np.fmax.reduceat(harian["tma_maks"], starts)
+        for name, _, _ in KOMPONEN:
+            volume = np.add.reduceat(harian[f"volume_{name}"], starts)
+            bulanan[f"volume_{name}"] = volume
+            bulanan[f"rata_{name}"] = np.where(covered > 0, volume / (covered * 3600), np.nan)
+            bulanan[f"puncak_{name}"] = np.fmax.reduceat(harian[f"puncak_{name}"], starts)
+    return bulanan
+
+
+def _angka(value, fmt):
+    return "-" if value != value else format(value, fmt)
+
+
+def _render(judul, i, columns):
+    """Summary lines of row ``i``; ``columns`` holds the report converted with tolist()"""
+    tma_min, tma_maks = columns["tma_min"][i], columns["tma_maks"][i]
+    lines = [judul, "Bendungan Ir.H.Djuanda",
+             "TMA Waduk : -" if tma_min != tma_min else f"TMA Waduk : {tma_min:.2f} - {tma_maks:.2f} mdpl"]
+    for name, _, label in KOMPONEN:
+        lines.append(f"Volume {label} : {columns[f'volume_{name}'][i] / 1e6:.3f} juta m³ "
+                     f"(rata-rata {_angka(columns[f'rata_{name}'][i], '.3f')} m³/s, "
+                     f"puncak {_angka(columns[f'puncak_{name}'][i], '.3f')} m³/s)")
+    lines.append(f"Data : {columns['jam_data'][i]:.1f} jam dari {columns['n'][i]} pembacaan")
+    return "\n".join(lines)
+
+
+def render_daily(harian):
+    """Indonesian summary text of every day of a daily_report"""
+    columns = {key: value.tolist() for key, value in harian.items()}
+    return [_render(format_tanggal(tanggal), i, columns) for i, tanggal in enumerate(columns["tanggal"])]
+
+
+def render_monthly(bulanan):
+    """Indonesian summary text of every month of a monthly_report"""
+    columns = {key: value.tolist() for key, value in bulanan.items()}
+    return [_render(f"Laporan Bulanan {_NAMA_BULAN[bulan.month - 1]} {bulan.year}", i, columns)
+            for i, bulan in enumerate(columns["bulan"])]
+
+
+def load_store(dari=None, sampai=None, store=None):
+    """Readings between two WIB dates (``sampai`` exclusive) from the reading store"""
+    bounds = [None if tanggal is None else
+              (np.datetime64(tanggal, "D") - np.datetime64(0, "D")).astype(np.int64) * 86400 - WIB_OFFSET
+              for tanggal in (dari, sampai)]
+    return (store or get_store()).query(*bounds, ["waktu", "tma"] + [column for _, column, _ in KOMPONEN])
+
+
+def load_csv(path, time_column, chunk_size=100_000, delimiter=","):
+    """(data, is_iso) from a reading log CSV, discharges computed when the columns are absent
+
+    ISO timestamps are taken as WIB wall-clock time (report with utc_offset 0).
+    """
+    debit_columns = [column for _, column, _ in KOMPONEN]
+    parts = []
+    iso = False
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader([f.readline()], delimiter=delimiter))
+        has_debit = all(name in header for name in ["tma"] + debit_columns)
+        needed = [time_column] + (["tma"] + debit_columns if has_debit else INPUT_COLUMNS)
+        missing = [name for name in needed if name not in header]
+        if missing:
+            raise ValueError(f"Kolom {missing} tidak ditemukan di {path}")
+        numeric = [header.index(name) for name in needed[1:]]
+        for lines in iter_chunks(f, chunk_size):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            texts = parse_dates(lines, header.index(time_column), delimiter)
+            waktu, iso = parse_times(texts)
+            values = parse_numeric(lines, numeric, delimiter)
+            if has_debit:
+                columns = dict(zip(["tma"] + debit_columns, values.T))
+            else:
+                columns = compute_chunk_by_date(values, texts) if iso else compute_chunk(values)
+                columns["tma"] = values[:, 0]
+            parts.append({"waktu": waktu, **{name: columns[name] for name in ["tma"] + debit_columns}})
+    if not parts:
+        raise ValueError(f"{path} tidak berisi pembacaan")
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}, iso
+
+
+def write_daily_csv(path, harian, precision=3):
+    """The daily_report as a CSV table (volumes in m³)"""
+    names = [key for key in harian if key != "tanggal"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(["tanggal"] + names) + "\n")
+        row_format = "%s," + ",".join("%d" if key == "n" else f"%.{precision}f" for key in names) + "\n"
+        matrix = np.column_stack([harian[key] for key in names])
+        f.writelines(row_format % (tanggal, *row)
+                     for tanggal, row in zip(np.datetime_as_string(harian["tanggal"]), matrix.tolist()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Buat laporan harian dan bulanan volume debit keluar")
+    parser.add_argument("output", help="file teks laporan")
+    parser.add_argument("--dari", help="tanggal awal WIB (YYYY-MM-DD), dari penyimpanan pembacaan")
+    parser.add_argument("--sampai", help="tanggal akhir WIB, tidak termasuk (YYYY-MM-DD)")
+    parser.add_argument("--input", help="CSV log pembacaan sebagai ganti penyimpanan server")
+    parser.add_argument("--kolom-waktu", default="waktu", help="kolom waktu CSV (detik epoch atau ISO WIB)")
+    parser.add_argument("--selang-maks", type=float, default=MAX_GAP / 3600,
+                        help="selang antar pembacaan (jam) yang masih diintegrasikan (default 6)")
+    parser.add_argument("--csv-harian", help="tulis juga tabel harian ke CSV ini")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.input:
+            data, iso = load_csv(args.input, args.kolom_waktu)
+        else:
+            data, iso = load_store(args.dari, args.sampai), False
+        harian = daily_report(data, 0 if iso else WIB_OFFSET, args.selang_maks * 3600)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    bulanan = monthly_report(harian)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(render_monthly(bulanan) + render_daily(harian)) + "\n")
+    if args.csv_harian:
+        write_daily_csv(args.csv_harian, harian)
+    print(f"{len(data['waktu']):,} pembacaan -> {len(bulanan['bulan'])} bulan, {len(harian['tanggal'])} hari "
+          f"({args.output})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
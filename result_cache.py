@@ -0,0 +1,186 @@
+"""Cache hasil perhitungan yang dipakai bersama oleh semua sesi.
+
+Streamlit menjalankan ulang seluruh skrip pada setiap perubahan widget,
+untuk setiap operator yang terhubung. Modul Python yang diimpor hanya
+dimuat sekali per proses, jadi cache di sini dipakai bersama oleh semua
+sesi: input yang sama (setelah dibulatkan) tidak dihitung ulang.
+"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+
+from ensemble import run_ensemble
+from routing import route_reservoir, simulate_single_step
+from sweep import sweep_outflow
+from tables import store
+
+# Semua cache yang dibuat lewat @cached, untuk ditampilkan statistiknya
+_registry = {}
+# Penanda array NumPy di dalam kunci cache
+_ARRAY = "__ndarray__"
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class _Keyed:
+    """Cache key of an immutable object with a ``cache_key()`` method (e.g. alerts.RuleSet)
+
+    The object is kept to be passed on to the cached function; equality and
+    hash use only its hashable ``cache_key()``.
+    """
+
+    __slots__ = ("value", "key")
+
+    def __init__(self, value):
+        self.value = value
+        self.key = value.cache_key()
+
+    def __eq__(self, other):
+        return isinstance(other, _Keyed) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+def normalize(value, decimals):
+    """Hashable, rounded version of an input value (None stays None)"""
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)  # jumlah skenario, langkah, dst. tetap bilangan bulat
+    if isinstance(value, (float, np.floating)):
+        value = round(float(value), decimals)
+        return 0.0 if value == 0 else value  # -0.0 dan 0.0 satu kunci
+    if isinstance(value, np.ndarray):
+        return (_ARRAY, value.shape, tuple(np.round(value.astype(float).ravel(), decimals).tolist()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v, decimals) for v in value)
+    if callable(getattr(value, "cache_key", None)):
+        return _Keyed(value)
+    raise TypeError(f"cannot use {type(value).__name__} as a cache key")
+
+
+def _denormalize(key):
+    """Rebuild call arguments from a normalized key so cached values match the key"""
+    if isinstance(key, _Keyed):
+        return key.value
+    if isinstance(key, tuple) and key and key[0] is _ARRAY:
+        return np.array(key[2], dtype=float).reshape(key[1])
+    if isinstance(key, tuple):
+        return [_denormalize(k) for k in key]
+    return key
+
+
+def _freeze(value):
+    """Make results safe to share between sessions"""
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        value.setflags(write=False)
+        return value
+    if isinstance(value, dict):
+        return {k: _freeze(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def cached(name, maxsize=1024, decimals=4):
+    """Memoize a calculation in a shared LRU cache keyed on rounded inputs
+
+    The function is called with the rounded inputs, so a cached result is
+    exactly what a fresh call with the same key would return. The key also
+    holds the current table version: looking it up rescans the table
+    directory (rate-limited), so a new version is never served from results
+    of the old one. Arrays in the result are made read-only because every
+    session shares them.
+    """
+    def decorator(func):
+        cache = LRUCache(maxsize)
+        _registry[name] = cache
+        missing = object()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (normalize(args, decimals), normalize(tuple(sorted(kwargs.items())), decimals), store.get().version)
+            result = cache.get(key, missing)
+            if result is missing:
+                call_args = _denormalize(key[0])
+                call_kwargs = {k: v for k, v in _denormalize(key[1])}
+                result = _freeze(func(*call_args, **call_kwargs))
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """Statistics of every registered cache, keyed by name"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+@store.on_reload
+def clear_caches():
+    """Empty every cache, also called when the tables change on disk"""
+    for cache in _registry.values():
+        cache.clear()
+
+
+# Perhitungan yang dipakai app_streamlit.py. TMA/beban/bukaan diisi dengan
+# 2 desimal, jadi pembulatan 4 desimal tidak mengubah hasil di layar. Debit
+# sesaat (tab Input Data) dihitung per node di graph.debit_graph per sesi.
+simulasi_harian = cached("simulasi_harian")(simulate_single_step)
+simulasi_bertahap = cached("simulasi_bertahap", maxsize=64)(route_reservoir)
+ensemble_tma = cached("ensemble", maxsize=16)(run_ensemble)
+# Amplop operasi per versi tabel (argumen versi), satu hasil bisa ~10 MB
+amplop_operasi = cached("amplop", maxsize=4)(sweep_outflow)
@@ -0,0 +1,144 @@
+"""Hitung balik: bukaan HCV, beban unit atau debit keluar untuk target tertentu.
+
+- solve_hcv_opening: bukaan HCV (%) untuk target debit HCV pada TMA tertentu
+- solve_unit_load / solve_total_load: beban (MW) untuk target debit turbin
+- solve_release_for_tma: debit keluar konstan supaya TMA mencapai target
+  setelah durasi tertentu (routing dengan limpasan spillway)
+
+Semua fungsi menerima skalar atau array sehingga banyak target bisa
+diselesaikan sekaligus.
+"""
+import numpy as np
+
+from debit_engine import EFFICIENCY_COEFFS, calculate_turbine_debit, current_tables
+from routing import route_reservoir
+
+
+def _monotone_r_range():
+    """Range of R where the L formula increases with load
+
+    L is proportional to R / poly(R). Just above the lower root of the
+    efficiency polynomial L blows up and then falls, so the usable branch
+    starts at the minimum of R / poly(R) and ends at the upper root.
+    """
+    poly = np.polynomial.Polynomial(EFFICIENCY_COEFFS)
+    roots = np.sort(poly.roots().real[np.abs(poly.roots().imag) < 1e-9])
+    positive = [(a, b) for a, b in zip(roots[:-1], roots[1:]) if poly((a + b) / 2) > 0]
+    r_lo, r_hi = positive[0]
+    # minimum R/poly: poly(R) - R*poly'(R) = 0 di dalam selang poly > 0
+    stationary = poly - np.polynomial.Polynomial([0, 1]) * poly.deriv()
+    candidates = [r.real for r in stationary.roots() if abs(r.imag) < 1e-9 and r_lo < r.real < r_hi]
+    return min(candidates), r_hi
+
+
+R_MIN, R_MAX = _monotone_r_range()
+
+
+def bisect(func, lo, hi, target, n_iter=60, increasing=True):
+    """Vectorized bisection for ``func(x) == target`` on [lo, hi]
+
+    ``func`` must be monotone on the bracket and accept arrays. Targets
+    outside [func(lo), func(hi)] give NaN.
+    """
+    lo, hi, target = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (lo, hi, target)))
+    lo = lo.copy()
+    hi = hi.copy()
+    f_lo = func(lo)
+    f_hi = func(hi)
+    sign = 1.0 if increasing else -1.0
+    reachable = (sign * (target - f_lo) >= 0) & (sign * (f_hi - target) >= 0)
+    for _ in range(n_iter):
+        mid = 0.5 * (lo + hi)
+        below = sign * (func(mid) - target) < 0
+        lo = np.where(below, mid, lo)
+        hi = np.where(below, hi, mid)
+    return np.where(reachable, 0.5 * (lo + hi), np.nan)
+
+
+def solve_hcv_opening(target_debit, res_level, rating=None):
+    """Bukaan HCV (%) for one valve to pass ``target_debit`` m³/det at ``res_level``
+
+    At a fixed TMA the rating is piecewise linear in the opening, so the
+    inverse is exact. Targets above the fully open discharge or TMA outside
+    the table give NaN.
+    """
+    rating = rating or current_tables().rating
+    target, level = np.broadcast_arrays(np.asarray(target_debit, dtype=float),
+                                        np.asarray(res_level, dtype=float))
+    shape = target.shape
+    target = target.ravel()
+    level = level.ravel()
+
+    axis = rating.level_axis
+    in_grid = (level >= axis.lo) & (level <= axis.hi)
+    i, t = axis.locate(np.where(in_grid, level, axis.lo))
+    # debit per bukaan pada TMA ini, (N, jumlah kolom)
+    profile = rating.values[i] * (1 - t)[:, None] + rating.values[i + 1] * t[:, None]
+
+    n_cols = profile.shape[1]
+    j = np.minimum((profile[:, 1:] < target[:, None]).sum(axis=1), n_cols - 2)
+    rows = np.arange(len(target))
+    q0 = profile[rows, j]
+    q1 = profile[rows, j + 1]
+    openings = rating.opening_axis.points
+    opening = openings[j] + (target - q0) / (q1 - q0) * (openings[j + 1] - openings[j])
+
+    valid = in_grid & (target >= profile[:, 0]) & (target <= profile[:, -1])
+    return np.where(valid, opening, np.nan).reshape(shape)
+
+
+def solve_unit_load(target_debit, tinggi_jatuh, n_iter=60):
+    """Beban (MW) for one unit to pass ``target_debit`` m³/det at the given head
+
+    Only the branch where discharge rises with load is searched (roughly
+    the normal operating band, not the low-load region where the form asks
+    for manual input). Unreachable targets give NaN.
+    """
+    target, head = np.broadcast_arrays(np.asarray(target_debit, dtype=float),
+                                       np.asarray(tinggi_jatuh, dtype=float))
+    denominator = -30857 + 1292.71*head - 8.9741*head**2 + 0.03682*head**3
+    # R = beban*100*1000/denominator, jadi batas R langsung menjadi batas beban
+    load_lo = R_MIN * denominator / 100_000
+    load_hi = R_MAX * (1 - 1e-9) * denominator / 100_000
+
+    def debit(load):
+        _, _, L = calculate_turbine_debit(head, load[..., np.newaxis])
+        return L[..., 0]
+
+    return bisect(debit, load_lo, load_hi, target, n_iter=n_iter)
+
+
+def solve_total_load(target_turbin_debit, tinggi_jatuh, n_units, n_iter=60):
+    """Total MW with the load split evenly over ``n_units`` running units"""
+    n_units = np.asarray(n_units, dtype=float)
+    per_unit = solve_unit_load(np.asarray(target_turbin_debit, dtype=float) / n_units, tinggi_jatuh, n_iter)
+    return per_unit * n_units
+
+
+def solve_release_for_tma(tma_awal, target_tma, inflow, dt_seconds=3600, n_iter=40, curve=None):
+    """Debit keluar terkendali konstan (turbin + HCV, m³/det) to reach ``target_tma``
+
+    ``inflow`` is the AM Total series (T,) over the horizon. Spillway
+    overflow above the crest is routed on top of the release. Scalars or
+    arrays of ``tma_awal``/``target_tma`` are solved together; targets
+    above the level reached with zero release give NaN.
+    """
+    curve = curve or current_tables().curve
+    inflow = np.atleast_1d(np.asarray(inflow, dtype=float))
+    tma_awal, target = np.broadcast_arrays(np.asarray(tma_awal, dtype=float),
+                                           np.asarray(target_tma, dtype=float))
+    shape = target.shape
+    tma_awal = tma_awal.ravel()
+    target = target.ravel()
+
+    seconds = inflow.size * dt_seconds
+    # tanpa limpasan, debit ini sudah cukup untuk turun ke target; limpasan hanya menambah debit keluar
+    storage_drop = np.abs(curve.el_to_cap(tma_awal) - curve.el_to_cap(target)) * 1_000_000
+    q_hi = inflow.max() + storage_drop / seconds + 1.0
+
+    def final_tma(release):
+        hasil = route_reservoir(tma_awal, inflow, dt_seconds, turbine=release[:, np.newaxis])
+        return hasil["tma"][:, -1]
+
+    release = bisect(final_tma, np.zeros_like(target), q_hi, target, n_iter=n_iter, increasing=False)
+    return release.reshape(shape)
@@ -0,0 +1,114 @@
+"""Laporan waktu impor saat start dingin (proses Python baru).
+
+Setiap kelompok modul diimpor di proses baru beberapa kali dan waktu
+tercepat dilaporkan, ditambah modul paling lambat menurut
+``python -X importtime``. Dipakai untuk memastikan modul perhitungan
+tidak lagi memuat scipy.
+
+Contoh:
+    python startup_time.py
+    python startup_time.py --repeat 5 --top 15
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_streamlit.py")
+
+_PROBE = """
+import sys, time
+t = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - t
+print(elapsed, int(any(m == "scipy" or m.startswith("scipy.") for m in sys.modules)))
+"""
+
+
+def app_modules(path=APP_PATH):
+    """Modules of this repository imported by app_streamlit.py, in import order
+
+    Read from the app's import statements, so a module added to the app is
+    measured too; streamlit and other installed packages are left out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    directory = os.path.dirname(path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name not in modules and os.path.exists(os.path.join(directory, name.split(".")[0] + ".py")):
+                modules.append(name)
+    return tuple(modules)
+
+
+def measure_import(modules, repeat=3):
+    """Fastest cold import time (s) of ``modules`` in a fresh interpreter
+
+    Returns ``(seconds, scipy_loaded, importtime_rows)`` where the rows are
+    ``(cumulative_us, module)`` from the fastest run, slowest first.
+    """
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE.format(modules=", ".join(modules))],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"impor {', '.join(modules)} gagal:\n{proc.stderr.strip()}")
+        elapsed, scipy_loaded = proc.stdout.split()
+        elapsed = float(elapsed)
+        if best is None or elapsed < best[0]:
+            best = (elapsed, scipy_loaded == "1", proc.stderr)
+
+    # modul yang sudah dimuat saat interpreter start (site, encodings, ...) tidak dihitung
+    startup = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    already_loaded = {name for _, name in _parse_importtime(startup.stderr)}
+    rows = [row for row in _parse_importtime(best[2]) if row[1] not in already_loaded]
+    rows.sort(reverse=True)
+    return best[0], best[1], rows
+
+
+def _parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        # format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Laporan waktu impor modul aplikasi saat start dingin")
+    parser.add_argument("--repeat", type=int, default=3, help="jumlah proses per pengukuran (diambil yang tercepat)")
+    parser.add_argument("--top", type=int, default=10, help="jumlah modul paling lambat yang ditampilkan")
+    parser.add_argument("--no-streamlit", action="store_true", help="lewati pengukuran impor streamlit")
+    args = parser.parse_args(argv)
+
+    groups = [("modul perhitungan", app_modules())]
+    if not args.no_streamlit:
+        groups.append(("streamlit", ("streamlit",)))
+    groups.append(("scipy.interpolate (hanya bila diminta)", ("scipy.interpolate",)))
+
+    try:
+        for label, modules in groups:
+            seconds, scipy_loaded, rows = measure_import(modules, args.repeat)
+            print(f"{label}: {seconds * 1000:.0f} ms{' (memuat scipy)' if scipy_loaded else ''}")
+            if label == "modul perhitungan":
+                for cumulative, name in rows[:args.top]:
+                    print(f"    {cumulative / 1000:8.1f} ms  {name}")
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
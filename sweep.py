@@ -0,0 +1,167 @@
+"""Amplop operasi: debit keluar total pada grid TMA x bukaan HCV x total MW.
+
+Debit total dipecah menjadi bagian yang hanya bergantung pada dua sumbu,
+lalu digabung dengan broadcasting menjadi array 3-D tanpa loop per titik:
+
+- debit HCV (tabel rating, TMA x bukaan) x jumlah HCV yang dibuka
+- debit turbin (rumus L6-L11, TMA x total MW)
+- debit limpasan (rumus L13, hanya TMA)
+
+Total MW dibagi rata ke unit yang jalan; jumlah unit adalah yang paling
+sedikit yang cukup untuk bebannya (kapasitas dispatch.UNIT_RATED_LOAD per
+unit), kecuali ``unit_aktif`` ditentukan. Titik yang beban per unitnya di
+luar rentang berlaku rumus pada tinggi jatuh itu (dispatch.load_limits)
+menghasilkan NaN.
+
+Grid dihitung per blok baris TMA sehingga array sementara tetap kecil;
+satu-satunya array besar adalah hasil 3-D itu sendiri.
+
+Contoh:
+    python sweep.py --trc 35 amplop.npz
+    python sweep.py --trc 35 --tma 100 108 161 --bukaan 0 100 101 --mw 0 187.5 126 amplop.npz
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from debit_engine import (
+    LOW_BEBAN_LIMIT,
+    N_UNITS,
+    calculate_hjv_debit_array,
+    calculate_spillway_debit,
+    calculate_turbine_debit,
+    current_tables,
+)
+from dispatch import UNIT_RATED_LOAD, load_limits
+
+# Jumlah titik 3-D per blok baris TMA (membatasi array sementara)
+CHUNK_POINTS = 1 << 18
+
+
+def default_axes(tables=None, n_tma=100, n_bukaan=101, n_mw=100):
+    """Axes covering the HCV rating grid and 0 .. full load of all units"""
+    tables = tables or current_tables()
+    tma = np.linspace(tables.hcv_levels[0], tables.hcv_levels[-1], n_tma)
+    bukaan = np.linspace(tables.hcv_openings[0], tables.hcv_openings[-1], n_bukaan)
+    beban_total = np.linspace(0.0, N_UNITS * UNIT_RATED_LOAD, n_mw)
+    return tma, bukaan, beban_total
+
+
+def units_for_load(beban_total, unit_aktif=None):
+    """Number of running units for each total load (at least 1 when loaded)"""
+    beban_total = np.asarray(beban_total, dtype=float)
+    if unit_aktif is not None:
+        return np.where(beban_total > 0, unit_aktif, 0)
+    units = np.ceil(beban_total / UNIT_RATED_LOAD - 1e-9)
+    return np.clip(units, 0, N_UNITS).astype(int)
+
+
+def load_per_unit(beban_total, unit_aktif=None):
+    """Load of each running unit (MW) when the total is split equally"""
+    beban_total = np.asarray(beban_total, dtype=float)
+    units = units_for_load(beban_total, unit_aktif)
+    return np.divide(beban_total, units, out=np.zeros(beban_total.shape), where=units > 0)
+
+
+def turbine_outflow(tma, trc, beban_total, unit_aktif=None):
+    """Debit turbin (m³/det) on the TMA x total MW grid, load split equally
+
+    NaN where the per-unit load is outside dispatch.load_limits at that head.
+    """
+    tma = np.asarray(tma, dtype=float)
+    units = units_for_load(beban_total, unit_aktif)
+    per_unit = load_per_unit(beban_total, unit_aktif)
+    # satu unit dihitung, debit turbin = jumlah unit x debit per unit
+    tinggi_jatuh = tma - trc
+    _, _, L = calculate_turbine_debit(tinggi_jatuh, np.broadcast_to(per_unit, (len(tma), len(per_unit))))
+    debit = L * units
+    lo, hi = load_limits(tinggi_jatuh[:, np.newaxis], max_load=None)
+    outside = (per_unit < lo - 1e-9) | (per_unit > np.minimum(hi, UNIT_RATED_LOAD) + 1e-9)
+    debit[outside & (units > 0)] = np.nan
+    return debit
+
+
+def sweep_outflow(tma, bukaan, beban_total, trc, jumlah_hcv=2, unit_aktif=None, versi=None):
+    """Total outflow on the 3-D grid tma x bukaan x beban_total
+
+    ``jumlah_hcv`` HCVs are opened by the same percentage; ``versi`` picks
+    the table version (default: the latest). Returns a dict with the axes,
+    ``debit_total`` of shape (len(tma), len(bukaan), len(beban_total)) and
+    the 1-D/2-D components it was built from.
+    """
+    tables = current_tables(versi)
+    tma = np.asarray(tma, dtype=float)
+    bukaan = np.asarray(bukaan, dtype=float)
+    beban_total = np.asarray(beban_total, dtype=float)
+
+    debit_total = np.empty((len(tma), len(bukaan), len(beban_total)))
+    debit_turbin = np.empty((len(tma), len(beban_total)))
+    debit_hjv = np.empty((len(tma), len(bukaan)))
+    debit_limpasan = calculate_spillway_debit(tma)
+    rows = max(1, CHUNK_POINTS // max(1, len(bukaan) * len(beban_total)))
+    for start in range(0, len(tma), rows):
+        block = slice(start, start + rows)
+        hjv = jumlah_hcv * calculate_hjv_debit_array(bukaan[np.newaxis, :], tma[block, np.newaxis],
+                                                     tables=tables)
+        turbin = turbine_outflow(tma[block], trc, beban_total, unit_aktif)
+        debit_hjv[block] = hjv
+        debit_turbin[block] = turbin
+        # (blok, bukaan, 1) + (blok, 1, MW) langsung ke array hasil
+        np.add(hjv[:, :, np.newaxis], (turbin + debit_limpasan[block, np.newaxis])[:, np.newaxis, :],
+               out=debit_total[block])
+
+    per_unit = load_per_unit(beban_total, unit_aktif)
+    return {
+        "tma": tma,
+        "bukaan": bukaan,
+        "beban_total": beban_total,
+        "unit_aktif": units_for_load(beban_total, unit_aktif),
+        "debit_total": debit_total,
+        "debit_turbin": debit_turbin,
+        "debit_hjv": debit_hjv,
+        "debit_limpasan": debit_limpasan,
+        # beban per unit di bawah LOW_BEBAN_LIMIT (rumus kurang teliti, seperti di form)
+        "beban_rendah": (per_unit > 0) & (per_unit < LOW_BEBAN_LIMIT),
+        "versi_tabel": tables.version,
+    }
+
+
+def _axis(values, name):
+    lo, hi, n = values
+    if n < 2 or hi <= lo:
+        raise ValueError(f"sumbu {name}: butuh awal < akhir dan minimal 2 titik")
+    return np.linspace(lo, hi, int(n))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hitung amplop operasi debit total (TMA x bukaan HCV x total MW)")
+    parser.add_argument("output", help="file .npz hasil")
+    parser.add_argument("--trc", type=float, required=True, help="elevasi tailrace (mdpl)")
+    parser.add_argument("--tma", type=float, nargs=3, metavar=("AWAL", "AKHIR", "N"))
+    parser.add_argument("--bukaan", type=float, nargs=3, metavar=("AWAL", "AKHIR", "N"))
+    parser.add_argument("--mw", type=float, nargs=3, metavar=("AWAL", "AKHIR", "N"))
+    parser.add_argument("--hcv", type=int, choices=(1, 2), default=2, help="jumlah HCV yang dibuka")
+    parser.add_argument("--unit", type=int, choices=range(1, N_UNITS + 1), help="jumlah unit jalan (default otomatis)")
+    parser.add_argument("--tanggal", help="versi tabel yang berlaku pada tanggal ini (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    try:
+        tma, bukaan, beban_total = default_axes(current_tables(args.tanggal))
+        if args.tma:
+            tma = _axis(args.tma, "tma")
+        if args.bukaan:
+            bukaan = _axis(args.bukaan, "bukaan")
+        if args.mw:
+            beban_total = _axis(args.mw, "mw")
+        hasil = sweep_outflow(tma, bukaan, beban_total, args.trc, args.hcv, args.unit, args.tanggal)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    np.savez(args.output, **hasil)
+    print(f"{hasil['debit_total'].size:,} titik (versi tabel {hasil['versi_tabel']}) disimpan ke {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Tabel rating HCV dan lengkung elevasi-kapasitas-luas dari file .npy.
+
+Setiap versi tabel disimpan di direktori ``tables/<berlaku_mulai>/``
+(tanggal ISO, misal ``tables/2026-01-01``) berisi:
+
+- hcv_levels.npy, hcv_openings.npy, hcv_debit.npy: grid TMA x bukaan
+- el.npy, cap.npy, area.npy: lengkung waduk (mdpl, juta m³, km²)
+
+File dibuka dengan ``mmap_mode="r"`` sehingga proses worker (ensemble,
+recompute) berbagi halaman memori yang sama dan tidak bisa mengubahnya.
+Perubahan file atau versi baru terdeteksi otomatis (mtime/ukuran), tabel
+dibangun ulang dan callback ``on_reload`` dipanggil untuk mengosongkan
+cache yang bergantung pada tabel.
+
+Contoh:
+    python tables.py daftar
+    python tables.py tambah 2026-01-01 --kurva survei_2026.csv
+    python tables.py tambah 2026-01-01 --hcv hcv_2026.csv --kurva survei_2026.csv
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from rating_table import HcvRatingTable, StorageCurve
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+HCV_FILES = ("hcv_levels", "hcv_openings", "hcv_debit")
+CURVE_FILES = ("el", "cap", "area")
+# Selang minimum (detik) antar pemeriksaan perubahan file
+CHECK_INTERVAL = 2.0
+
+
+def _as_date(tanggal):
+    """date from a date/datetime/ISO string (only the date part is used)"""
+    if isinstance(tanggal, datetime.datetime):
+        return tanggal.date()
+    if isinstance(tanggal, datetime.date):
+        return tanggal
+    return datetime.date.fromisoformat(str(tanggal).strip()[:10])
+
+
+class TableSet:
+    """One table version: memory-mapped arrays plus the objects built on them"""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = os.path.basename(path)
+        self.valid_from = _as_date(self.version)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                  for name in HCV_FILES + CURVE_FILES}
+        self.hcv_levels = arrays["hcv_levels"]
+        self.hcv_openings = arrays["hcv_openings"]
+        self.hcv_debit = arrays["hcv_debit"]
+        self.el = arrays["el"]
+        self.cap = arrays["cap"]
+        self.area = arrays["area"]
+        self.rating = HcvRatingTable(self.hcv_levels, self.hcv_openings, self.hcv_debit)
+        self.curve = StorageCurve(self.el, self.cap, self.area)
+
+    def __repr__(self):
+        return f"TableSet({self.version!r})"
+
+
+class TableStore:
+    """All table versions in a directory, reloaded when the files change"""
+
+    def __init__(self, directory=TABLE_DIR, check_interval=CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        # naik setiap kali tabel dimuat ulang
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._signature = None
+        self._checked_at = -np.inf
+        self._versions = []
+        self._tables = {}
+
+    def on_reload(self, callback):
+        """Call ``callback()`` after the tables were reloaded from disk"""
+        self._listeners.append(callback)
+        return callback
+
+    def _scan(self):
+        versions = []
+        signature = []
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                path = os.path.join(self.directory, name)
+                try:
+                    _as_date(name)
+                except ValueError:
+                    continue
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    stats = [os.stat(os.path.join(path, f"{file}.npy")) for file in HCV_FILES + CURVE_FILES]
+                except FileNotFoundError:
+                    # versi belum lengkap (misal sedang ditulis), diabaikan sampai lengkap
+                    continue
+                versions.append(name)
+                signature.extend((name, st.st_mtime_ns, st.st_size) for st in stats)
+        return versions, tuple(signature)
+
+    def refresh(self, force=False):
+        """Rescan the directory (at most every ``check_interval`` s); True if reloaded"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            versions, signature = self._scan()
+            if signature == self._signature:
+                return False
+            if not versions:
+                raise FileNotFoundError(f"tidak ada versi tabel di {self.directory}")
+            first_load = self._signature is None
+            self._signature = signature
+            self._versions = versions
+            self._tables = {}
+            self.generation += 1
+        if not first_load:
+            for callback in self._listeners:
+                callback()
+        return True
+
+    def versions(self):
+        self.refresh()
+        return list(self._versions)
+
+    def get(self, tanggal=None):
+        """Tables valid on ``tanggal`` (latest version when None)
+
+        Readings older than the first version use the first version.
+        """
+        self.refresh()
+        versions = self._versions
+        if tanggal is None:
+            version = versions[-1]
+        else:
+            tanggal = _as_date(tanggal)
+            valid = [v for v in versions if _as_date(v) <= tanggal]
+            version = valid[-1] if valid else versions[0]
+        tables = self._tables.get(version)
+        if tables is None:
+            with self._lock:
+                tables = self._tables.get(version)
+                if tables is None:
+                    tables = TableSet(os.path.join(self.directory, version))
+                    self._tables[version] = tables
+        return tables
+
+    def version_index(self, tanggal):
+        """Index into versions() for an array of ISO date strings (vectorized get)
+
+        Empty dates get the latest version, like ``get(None)``.
+        """
+        valid_from = np.array(self.versions())
+        tanggal = np.char.strip(np.asarray(tanggal, dtype=str)).astype("<U10")
+        # tanggal ISO bisa dibandingkan sebagai string
+        index = np.maximum(np.searchsorted(valid_from, tanggal, side="right") - 1, 0)
+        return np.where(tanggal == "", len(valid_from) - 1, index)
+
+
+def _save(path, array):
+    """Write a .npy file atomically so readers never see a half-written table"""
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array, dtype=float))
+    os.replace(tmp, path)
+
+
+def write_version(valid_from, hcv_levels, hcv_openings, hcv_debit, el, cap, area, directory=TABLE_DIR):
+    """Store one table version, checked by building the lookup objects first"""
+    version = _as_date(valid_from).isoformat()
+    HcvRatingTable(hcv_levels, hcv_openings, hcv_debit)
+    StorageCurve(el, cap, area)
+    path = os.path.join(directory, version)
+    os.makedirs(path, exist_ok=True)
+    arrays = dict(zip(HCV_FILES + CURVE_FILES, (hcv_levels, hcv_openings, hcv_debit, el, cap, area)))
+    for name, array in arrays.items():
+        _save(os.path.join(path, f"{name}.npy"), array)
+    return path
+
+
+def read_hcv_csv(path):
+    """HCV grid from CSV: header = 'tma' + openings, one row per TMA"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [row for row in csv.reader(f) if row]
+    openings = np.array(rows[0][1:], dtype=float)
+    body = np.array(rows[1:], dtype=float)
+    return body[:, 0], openings, body[:, 1:]
+
+
+def read_curve_csv(path):
+    """Elevation-capacity-area curve from CSV with columns el, cap, area"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    missing = {"el", "cap", "area"} - set(rows[0] if rows else ())
+    if missing:
+        raise ValueError(f"kolom {sorted(missing)} tidak ditemukan di {path}")
+    return tuple(np.array([float(row[name]) for row in rows]) for name in ("el", "cap", "area"))
+
+
+store = TableStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kelola versi tabel rating HCV dan lengkung waduk")
+    parser.add_argument("--dir", default=TABLE_DIR, help="direktori tabel")
+    sub = parser.add_subparsers(dest="perintah", required=True)
+    sub.add_parser("daftar", help="tampilkan versi tabel yang ada")
+    tambah = sub.add_parser("tambah", help="tambah versi baru, bagian yang tidak diberikan disalin dari versi sebelumnya")
+    tambah.add_argument("berlaku_mulai", help="tanggal mulai berlaku (YYYY-MM-DD)")
+    tambah.add_argument("--hcv", help="CSV grid HCV (header: tma, bukaan...)")
+    tambah.add_argument("--kurva", help="CSV lengkung waduk (kolom el, cap, area)")
+    args = parser.parse_args(argv)
+
+    tables_store = TableStore(args.dir)
+    try:
+        if args.perintah == "daftar":
+            for version in tables_store.versions():
+                tables = tables_store.get(version)
+                print(f"{version}: HCV {tables.hcv_debit.shape[0]}x{tables.hcv_debit.shape[1]}, "
+                      f"lengkung {len(tables.el)} titik ({tables.el[0]:.2f}-{tables.el[-1]:.2f} mdpl)")
+            return 0
+
+        base = tables_store.get(args.berlaku_mulai) if os.path.isdir(args.dir) and os.listdir(args.dir) else None
+        if (args.hcv is None or args.kurva is None) and base is None:
+            raise ValueError("belum ada versi sebelumnya, --hcv dan --kurva wajib diisi")
+        hcv = read_hcv_csv(args.hcv) if args.hcv else (base.hcv_levels, base.hcv_openings, base.hcv_debit)
+        curve = read_curve_csv(args.kurva) if args.kurva else (base.el, base.cap, base.area)
+        path = write_version(args.berlaku_mulai, *hcv, *curve, directory=args.dir)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Tabel versi {os.path.basename(path)} disimpan di {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Pemutaran ulang log lama lewat live_feed: rata-rata jendela mengikuti waktu sampel."""
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from live_feed import LiveFeed, parse_lines
+from recompute_debit import compute_chunk
+
+WIB = timezone(timedelta(hours=7))
+
+
+class _Lines:
+    def describe(self):
+        return "uji"
+
+
+def _replay_lines(start, n):
+    """One reading per minute from ``start`` (naive WIB), discharge rising with TMA"""
+    return [f"{(start + timedelta(minutes=i)).isoformat(sep=' ')},{100 + 0.05 * i:.2f},35,1.5,,"
+            f"120,120,{0 if i % 3 else 100},120,120,120"
+            for i in range(n)]
+
+
+def test_replay_keeps_window_means():
+    now = time.time()
+    # dua hari lalu, dibulatkan ke menit supaya satu sampel per ember 1 menit
+    start = datetime.fromtimestamp(now - 2 * 86400, WIB).replace(tzinfo=None, second=0, microsecond=0)
+    lines = _replay_lines(start, 120)
+    feed = LiveFeed(_Lines())
+    assert feed.ingest(lines) == 120
+
+    _, values, _ = parse_lines(lines, now)
+    debit_total = compute_chunk(values)["debit_total"]
+    ringkasan = feed.snapshot(now=time.time())
+    assert ringkasan["waktu_terakhir"] == (start + timedelta(minutes=119)).replace(tzinfo=WIB).timestamp()
+    assert math.isclose(ringkasan["rata_jam"]["debit_total"], debit_total[-60:].mean())
+    assert math.isclose(ringkasan["rata_hari"]["debit_total"], debit_total.mean())
+    assert math.isclose(ringkasan["rata_hari"]["tma"], values[:, 0].mean())
+
+    # umpan diam lebih lama dari jendela: rata-rata kedaluwarsa
+    sepi = feed.snapshot(now=time.time() + 2 * 3600)
+    assert np.isnan(sepi["rata_jam"]["debit_total"])
+    assert math.isclose(sepi["rata_hari"]["debit_total"], debit_total.mean())
+
+
+def test_naive_iso_is_wib():
+    now = time.time()
+    waktu = datetime.fromtimestamp(now, WIB).replace(tzinfo=None, microsecond=0)
+    times, _, rejected = parse_lines([f"{waktu.isoformat()},100,35,,,0,0,0,0,0,0",
+                                      f"{waktu.isoformat()}+00:00,100,35,,,0,0,0,0,0,0"], now)
+    assert rejected == 1
+    assert times == [waktu.replace(tzinfo=WIB).timestamp()]